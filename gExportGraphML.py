@@ -1,140 +1,74 @@
+# gExportGraphML.py
+#
+# Graph Stream Generator v1.0
+#
+# Usage: python gExportGraphML.py <input json file or output prefix> [exportFormat=GraphML] [-workers <n>]
+#
+# Converts GSG stream files to GraphML, GEXF or CSV (a node table and an edge list).
+# The input may be a stream file, in any format written by gsg.py (JSON array or JSON
+# Lines, plain, compressed or segmented), or the output file prefix of a run, in
+# which case all its stream files are converted in parallel, one per process.
+#
+# Stream files are read one item at a time, and converted by the exporters in
+# gsgExport.py, so memory use does not grow with the input size.
+
+import os
 import sys
+import argparse
+import multiprocessing
+from gsgOutput import ReadOutputItems, StreamFileNames
+from gsgExport import EXPORTERS
 
 
-def generateGraphML(inputFileName):
-
-    oneIndent = '   '
-    twoIndent = '       '
-    threeIndent = '         '
-    target = open(inputFileName + '.graphml' , 'w')
-
-    target.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-    target.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
-                 'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
-                 'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
-                 'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n')
-
-    target.write('<key id="label" for="node" attr.name="label" attr.type="string"/>\n')
-    target.write('<key id="type" for="node" attr.name="type" attr.type="string"/>\n')
-    target.write('<key id="timestamp" for="node" attr.name="timestamp" attr.type="string"/>\n')
-
-    target.write('<key id="label" for="edge" attr.name="label" attr.type="string"/>\n')
-    target.write('<key id="type" for="edge" attr.name="type" attr.type="string"/>\n')
-    target.write('<key id="timestamp" for="edge" attr.name="timestamp" attr.type="string"/>\n')
-    target.write('<key id="directed" for="edge" attr.name="directed" attr.type="string"/>\n')
-
-    target.write('<graph id="GSG_V1" edgedefault="directed">\n')
-
-    with open(inputFileName) as infile:
-        for line in infile:
-                if line.startswith('  {"vertex": {'):
-                    # write a node
-                    # use split instead of index+ substring because we
-                    idLine = next(infile) #     "id": "27",\n
-                    vid = idLine.split('"id": ')[1][:-2] # "27"
-                    target.write(oneIndent +'<node id=' + vid + '>\n')
-                    
-                    #Check for 'type' (optional)
-                    typeLine = next(infile) #    "type": "user",\n
-                    if typeLine.startswith('     "type":'):
-                        typeComponents = typeLine.split(' ')
-                        vType = typeComponents[-1][:-2]
-                        target.write(twoIndent +'<data key="type">' + vType + '</data>\n')
-                        attrLine = next(infile)
-                    else:
-                        attrLine = typeLine
-                    
-                    #Get Attributes
-                    #attrLine = next(infile) #    "attributes": {"label": "v8"},\n
-                    allAttrs = attrLine.split('"attributes": {')[1][:-3] # "label": "v8"
-                    allAttrArray = allAttrs.split(',')
-                    for attr in allAttrArray:
-                        key, val = attr.split(':') # [0]="label" [1]="v8" with '"'
-                        target.write(twoIndent +'<data key='+ key.strip() + '>' + val.strip() + '</data>\n')
-
-                    # Get Timestamp
-                    timestampLine = next(infile) #     "timestamp": "5"}},\n
-                    vTimestamp = timestampLine.split('"timestamp": ')[1][:-4]
-                    # Very last timestamp entry does not end with "," which make the subscript invalid
-                    if vTimestamp.endswith('"') == False:
-                        vTimestamp = vTimestamp + '"'
-                    target.write(twoIndent +'<data key="timestamp">' + vTimestamp + '</data>\n')
-                    target.write(oneIndent +'</node>\n')
-
-                elif line.startswith('  {"edge": {'):
-                    # Write an edge Node
-                    idLine = next(infile)
-                    eId = idLine.split('"id": ')[1][:-2]
-
-                    # Get Source
-                    srcLine = next(infile)
-                    src = srcLine.split('"source": ')[1][:-2]
-
-                    # Get Destination
-                    dstLine = next(infile)
-                    dst = dstLine.split('"target": ')[1][:-2]
-
-                    target.write(oneIndent +'<edge id='+ eId + ' source=' + src + ' target=' + dst + '>\n')
-
-                    #Check for 'type' (optional)
-                    typeLine = next(infile) #    "type": "user",\n
-                    if typeLine.startswith('     "type":'):
-                        typeComponents = typeLine.split(' ')
-                        eType = typeComponents[-1][:-2]
-                        target.write(twoIndent +'<data key="type">' + eType + '</data>\n')
-                        attrLine = next(infile)
-                    else:
-                        attrLine = typeLine
-                        
-                    # Get Attributes
-                    #attrLine = next(infile)  # {"foo": "bar", "label": "e89"},\n
-                    allAttrs = attrLine.split('"attributes": {')[1][:-3]  # "label": "v8", "label": "e89"
-                    allAttrArray = allAttrs.split(',')
-                    for attr in allAttrArray:
-                        key, val = attr.split(':')  # [0]="label" [1]="v8" with '"'
-                        target.write(twoIndent +'<data key=' + key.strip() + '>' + val.strip() + '</data>\n')
-
-                    # Get Direction
-                    edirLine = next(infile)
-                    eDir = edirLine.split('"directed": ')[1][:-2]
-                    target.write(twoIndent +'<data key="directed">' + eDir + '</data>\n')
-
-                    # Get Timestamp
-                    timestampLine = next(infile) #     "timestamp": "5"}},\n
-                    eTimestamp = timestampLine.split('"timestamp": ')[1][:-4]
-
-                    # Very last timestamp entry does not end with "," which make the subscript invalid
-                    if eTimestamp.endswith('"') == False:
-                        eTimestamp = eTimestamp + '"'
-                    target.write(twoIndent +'<data key="timestamp">' + eTimestamp + '</data>\n')
-
-                    # End of Edge
-                    target.write(oneIndent + '</edge>\n')
-
-                else:
-                    continue
-
-    target.write('</graph>\n')
-    target.write('</graphml>\n')
-    print("****Finish: Export " + inputFileName + " to Format = " + exportFormat + ". " +inputFileName + ".graphml generated \n")
-
-def main():
-
-    global exportFormat
-    exportFormat = "GraphML"
-
-    if len(sys.argv) < 2:
-        print("Usage: python gExportGraphML.py <input json file> [exportFormat=GraphMl]")
-
-    if len(sys.argv) > 1:
-        inputFileName = sys.argv[1]
-    if len(sys.argv) > 2:
-        exportFormat = sys.argv[2]
+# ----- Conversion -----
 
+# Convert stream file inputFileName to exportFormat, writing inputFileName plus the
+# format's extension
+def ExportFile(inputFileName, exportFormat):
     print("****Start: Export " + inputFileName + " to Format = " + exportFormat + "\n")
+    exporterClass = EXPORTERS[exportFormat]
+    exporter = exporterClass(inputFileName + exporterClass.EXTENSION)
+    try:
+        for item in ReadOutputItems(inputFileName):
+            if ('vertex' in item):
+                exporter.writeVertex(item['vertex'])
+            elif ('edge' in item):
+                exporter.writeEdge(item['edge'])
+    finally:
+        exporter.close()
+    print("****Finish: Export " + inputFileName + " to Format = " + exportFormat + ". " + exporter.outputFileName + " generated \n")
+
+def ExportFileWorker(args):
+    ExportFile(*args)
+
+# Convert the stream files to exportFormat, over numWorkers processes
+def ExportFiles(inputFileNames, exportFormat, numWorkers):
+    numWorkers = min(numWorkers, len(inputFileNames))
+    if (numWorkers <= 1):
+        for inputFileName in inputFileNames:
+            ExportFile(inputFileName, exportFormat)
+    else:
+        with multiprocessing.Pool(numWorkers) as pool:
+            pool.map(ExportFileWorker, [(inputFileName, exportFormat) for inputFileName in inputFileNames], chunksize=1)
+
+# Convert one stream file to GraphML
+def generateGraphML(inputFileName):
+    ExportFile(inputFileName, 'GraphML')
 
-    if exportFormat == "GraphML":
-        generateGraphML(inputFileName)
+def main():
+    parser = argparse.ArgumentParser(prog='gExportGraphML', description='Convert GSG stream files to GraphML, GEXF or CSV')
+    parser.add_argument('inputName', help='stream file, or output file prefix of a run to convert all its stream files')
+    parser.add_argument('exportFormat', nargs='?', default='GraphML', choices=list(EXPORTERS), help='output format (default GraphML)')
+    parser.add_argument('-workers', type=int, default=os.cpu_count(), help='number of files converted in parallel (default number of CPUs)')
+    args = parser.parse_args()
+    if (args.workers < 1):
+        parser.error('-workers must be positive')
+    try:
+        inputFileNames = StreamFileNames(args.inputName)
+    except FileNotFoundError as error:
+        print('Error: ' + str(error))
+        sys.exit()
+    ExportFiles(inputFileNames, args.exportFormat, args.workers)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+# gFuseStreams.py
+#
+# Graph Stream Generator v1.0
+#
+# Usage: python gFuseStreams.py <outputFilePrefix> [-output <file>] [-format json|jsonl] [-annotate]
+#
+# Fuses the stream files of a run into a single stream, using vertex ids as anchors.
+# The stream files are merged by timestamp (ties in stream order), reading one item
+# at a time from each, so the merge itself uses constant memory. A vertex that
+# appears in several streams is written only the first time it appears; edges are
+# always written, and always after their vertices. With -annotate, each vertex and
+# edge gets a "streamNum" property giving the stream it came from.
+#
+# The stream files may be in any output format except binary (see gsgOutput.py).
+# The fused stream is written to <outputFilePrefix>-fused by default, in the same
+# layout as a stream file (JSON array, or JSON Lines with -format jsonl).
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import sys
+import json
+import heapq
+import argparse
+from gsgOutput import ReadOutputItems, StreamFileNames, JSONArrayFile, JSONLinesFile, JSONString
+from gsgIdSet import IdSet
+
+
+# Return sort key of a timestamp string: a number for "units" or "seconds" time
+# formats, else the "YYYY-MM-DD HH:MM:SS" string itself, which sorts in time order
+def TimestampKey(timestamp):
+    if timestamp.isdigit():
+        return int(timestamp)
+    return timestamp
+
+# Yield (timestamp key, streamNum, item) for each vertex and edge item of a stream file
+def StreamItems(fileName, streamNum):
+    for item in ReadOutputItems(fileName):
+        properties = item.get('vertex') or item.get('edge')
+        yield TimestampKey(properties['timestamp']), streamNum, item
+
+# Return a vertex or edge item in the layout of a JSON stream file
+def ItemJSON(item):
+    kind = list(item)[0]
+    return ('  {' + JSONString(kind) + ': {\n'
+            + ',\n'.join(['     ' + JSONString(name) + ': ' + json.dumps(value, ensure_ascii=False) for name,value in item[kind].items()])
+            + '}}')
+
+# Return a vertex or edge item as a line of a JSON Lines stream file
+def ItemLineJSON(item):
+    return json.dumps(item, ensure_ascii=False)
+
+# Write the fused stream of the stream files to outputFile (a JSONArrayFile or
+# JSONLinesFile class object) using itemToJSON to render each item. Returns
+# (number of vertices written, number of duplicate vertices dropped, number of edges).
+def FuseStreams(streamFileNames, outputFile, itemToJSON, annotate = False):
+    numVertices = 0
+    numDuplicates = 0
+    numEdges = 0
+    vertexIds = IdSet() # vertex ids written
+    streams = [StreamItems(streamFileNames[streamIndex], streamIndex+1) for streamIndex in range(len(streamFileNames))]
+    for timestampKey,streamNum,item in heapq.merge(*streams, key=lambda streamItem: streamItem[0:2]):
+        if ('vertex' in item):
+            if (not vertexIds.add(item['vertex']['id'])):
+                numDuplicates += 1
+                continue
+            numVertices += 1
+        else:
+            numEdges += 1
+        if annotate:
+            kind = list(item)[0]
+            item = {kind: dict([('streamNum', str(streamNum))] + list(item[kind].items()))}
+        outputFile.writeItem(itemToJSON(item))
+    return numVertices, numDuplicates, numEdges
+
+def main():
+    parser = argparse.ArgumentParser(prog='gFuseStreams', description='Fuse the stream files of a GSG run into one time-ordered stream')
+    parser.add_argument('outputFilePrefix', help='output file prefix of the run')
+    parser.add_argument('-output', default=None, help='fused stream file (default <outputFilePrefix>-fused)')
+    parser.add_argument('-format', default='json', choices=['json', 'jsonl'], help='format of fused stream file (default json)')
+    parser.add_argument('-annotate', action='store_true', help='add the source stream number to each vertex and edge')
+    args = parser.parse_args()
+    try:
+        streamFileNames = StreamFileNames(args.outputFilePrefix)
+    except FileNotFoundError as error:
+        print('Error: ' + str(error))
+        sys.exit()
+    outputFileName = args.output
+    if (outputFileName is None):
+        outputFileName = args.outputFilePrefix + '-fused'
+    print('Fusing ' + ', '.join(streamFileNames) + ' into ' + outputFileName + '...')
+    if (args.format == 'jsonl'):
+        outputFile = JSONLinesFile(outputFileName)
+        itemToJSON = ItemLineJSON
+    else:
+        outputFile = JSONArrayFile(outputFileName)
+        itemToJSON = ItemJSON
+    try:
+        numVertices, numDuplicates, numEdges = FuseStreams(streamFileNames, outputFile, itemToJSON, args.annotate)
+    finally:
+        outputFile.close()
+    print('Wrote ' + str(numVertices) + ' vertices and ' + str(numEdges) + ' edges (' + str(numDuplicates) + ' duplicate vertices dropped)')
+
+
+if __name__ == '__main__':
+    main()
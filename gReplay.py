@@ -0,0 +1,285 @@
+# gReplay.py
+#
+# Graph Stream Generator v1.0
+#
+# Usage: python gReplay.py <input_file> [-files] [-seed <seed>] [-speed <factor>]
+#          [-tcp [<host>:]<port>] [-unix <path>] [-stdout] [-wait <n>] [-report <seconds>]
+#
+# Publishes the vertices and edges of the streams in real time, for load-testing
+# stream consumers. Events are generated by GraphStreamGenerator from the input
+# file or, with -files, read back from the stream files of an earlier run of the
+# input file (its outputFilePrefix). Each event is one JSON object per line, as
+# written by gsg.py -events.
+#
+# The events of time unit t are published (t - t0) * secondsPerUnitTime / speed
+# seconds after the replay starts, where t0 is the first time unit having events.
+# With -speed 0, events are published as fast as the subscribers can take them.
+#
+# Subscribers connect to the TCP and/or Unix socket server. Any number may be
+# connected at once. A subscriber first sends a line with a comma-separated list
+# of the stream numbers it wants, or "all" (or an empty line) for all streams, and
+# receives events from then on; it may send further such lines. Publishing
+# waits for every subscriber to take each time unit's events, so a consumer that
+# cannot keep up slows the replay. Every -report seconds, and at the end, the
+# achieved event rate is reported alongside the target rate of the schedule, and
+# how far the replay is behind it. With -stdout, or if no server is given, events
+# are also written to standard output, and other messages go to standard error.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import sys
+import json
+import asyncio
+import argparse
+import itertools
+import contextlib
+import heapq
+from gsgClasses import *
+from gsgGenerator import *
+from gsgOutput import ReadOutputItems, StreamFileNames
+from gsgVector import CreateGenerator
+from gsgMetrics import ConfigureLogging
+
+
+# ----- Event Sources -----
+
+# Return Event for a vertex or edge item read from stream streamNum
+def ItemEvent(item, streamNum, parameters):
+    if ('vertex' in item):
+        vertex = item['vertex']
+        return Event(TimeUnit(vertex['timestamp'], parameters), vertex['timestamp'], streamNum, "vertex", vertex['id'],
+                     None, None, vertex.get('type'), vertex['attributes'], False)
+    edge = item['edge']
+    return Event(TimeUnit(edge['timestamp'], parameters), edge['timestamp'], streamNum, "edge", edge['id'],
+                 edge['source'], edge['target'], edge.get('type'), edge['attributes'], (edge['directed'] == "true"))
+
+# Yield Event for each vertex and edge item of a stream file
+def StreamFileEvents(fileName, streamNum, parameters):
+    for item in ReadOutputItems(fileName):
+        yield ItemEvent(item, streamNum, parameters)
+
+# Yield (timeUnit, list of Events) for each time unit having events in the stream
+# files streamFileNames (of streams 1, 2, ...), merged in time order (ties in stream order)
+def FileEventsByTimeUnit(streamFileNames, parameters):
+    streams = [StreamFileEvents(streamFileNames[streamIndex], streamIndex+1, parameters) for streamIndex in range(len(streamFileNames))]
+    events = heapq.merge(*streams, key=lambda event: (event.timeUnit, event.streamNum))
+    for timeUnit,timeUnitEvents in itertools.groupby(events, key=lambda event: event.timeUnit):
+        yield timeUnit, list(timeUnitEvents)
+
+
+# ----- Replay Server -----
+
+class Subscriber:
+    __slots__ = ('writer', 'streamNums')
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.streamNums = None # None = all streams
+
+class ReplayServer:
+    def __init__(self, secondsPerUnitTime, speed, reportInterval, eventFile = None):
+        self.secondsPerUnitTime = secondsPerUnitTime
+        self.speed = speed
+        self.reportInterval = reportInterval
+        self.eventFile = eventFile
+        self.subscribers = set()
+        self.subscribed = asyncio.Condition()
+        self.servers = []
+        self.handlers = set()
+        self.numEvents = 0
+
+    async def startTCP(self, host, port):
+        self.servers.append(await asyncio.start_server(self.handleSubscriber, host, port))
+        print('Listening on ' + host + ':' + str(port), file=sys.stderr)
+
+    async def startUnix(self, path):
+        self.servers.append(await asyncio.start_unix_server(self.handleSubscriber, path))
+        print('Listening on ' + path, file=sys.stderr)
+
+    # Read subscription lines until the subscriber disconnects, adding the subscriber
+    # after its first line
+    async def handleSubscriber(self, reader, writer):
+        subscriber = Subscriber(writer)
+        self.handlers.add(asyncio.current_task())
+        try:
+            while True:
+                line = await reader.readline()
+                if (not line):
+                    break
+                line = line.decode('utf-8', 'replace').strip()
+                if (line and (line != 'all')):
+                    try:
+                        subscriber.streamNums = set(int(streamNum) for streamNum in line.split(','))
+                    except ValueError:
+                        writer.write(b'Error: expected "all" or comma-separated stream numbers\n')
+                        continue
+                else:
+                    subscriber.streamNums = None
+                if ((subscriber not in self.subscribers) and (not writer.is_closing())):
+                    async with self.subscribed:
+                        self.subscribers.add(subscriber)
+                        self.subscribed.notify_all()
+        except ConnectionError:
+            pass
+        finally:
+            self.removeSubscriber(subscriber)
+            writer.close()
+            self.handlers.discard(asyncio.current_task())
+
+    def removeSubscriber(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            subscriber.writer.close()
+
+    # Wait until at least numSubscribers are connected
+    async def waitForSubscribers(self, numSubscribers):
+        if (len(self.subscribers) < numSubscribers):
+            print('Waiting for ' + str(numSubscribers) + ' subscribers...', file=sys.stderr)
+        async with self.subscribed:
+            await self.subscribed.wait_for(lambda: len(self.subscribers) >= numSubscribers)
+
+    # Send events to standard output and the subscribers of their streams, waiting
+    # until each subscriber has taken them
+    async def publish(self, events):
+        lines = [(event.streamNum, (EventToJSON(event) + '\n').encode('utf-8')) for event in events]
+        allData = b''.join([line for streamNum,line in lines])
+        if self.eventFile:
+            self.eventFile.buffer.write(allData)
+            self.eventFile.flush()
+        subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            if (subscriber.streamNums is None):
+                data = allData
+            else:
+                data = b''.join([line for streamNum,line in lines if streamNum in subscriber.streamNums])
+            if data:
+                subscriber.writer.write(data)
+        results = await asyncio.gather(*[subscriber.writer.drain() for subscriber in subscribers], return_exceptions=True)
+        for subscriber,result in zip(subscribers, results):
+            if isinstance(result, Exception):
+                self.removeSubscriber(subscriber)
+        self.numEvents += len(events)
+
+    # Publish each (timeUnit, list of Events) of iterator eventsByTimeUnit on schedule.
+    # The iterator is advanced in another thread, so subscribers are served meanwhile.
+    async def replay(self, eventsByTimeUnit):
+        loop = asyncio.get_running_loop()
+        startTime = None
+        nextReportTime = None
+        while True:
+            timeUnitEvents = await loop.run_in_executor(None, next, eventsByTimeUnit, None)
+            if (timeUnitEvents is None):
+                break
+            timeUnit, events = timeUnitEvents
+            if (startTime is None):
+                startTime = loop.time()
+                nextReportTime = startTime + self.reportInterval
+                firstTimeUnit = timeUnit
+            scheduledTime = 0.0
+            if (self.speed > 0):
+                scheduledTime = (timeUnit - firstTimeUnit) * self.secondsPerUnitTime / self.speed
+                delay = startTime + scheduledTime - loop.time()
+                if (delay > 0):
+                    await asyncio.sleep(delay)
+            await self.publish(events)
+            if (loop.time() >= nextReportTime):
+                self.report(timeUnit, scheduledTime, loop.time() - startTime)
+                nextReportTime += self.reportInterval
+        if (startTime is not None):
+            self.report(timeUnit, scheduledTime, loop.time() - startTime, True)
+
+    # Print achieved and target event rates, the target being the rate at which the
+    # events published so far were scheduled
+    def report(self, timeUnit, scheduledTime, elapsedTime, final = False):
+        achievedRate = self.numEvents / max(elapsedTime, 1e-9)
+        message = 'Replayed ' if final else 'Replaying: '
+        message += 'time unit ' + str(timeUnit) + ', ' + str(self.numEvents) + ' events in ' + '{:.2f}'.format(elapsedTime) + ' seconds'
+        message += ', achieved ' + '{:.1f}'.format(achievedRate) + ' events/second'
+        if (self.speed > 0):
+            if (scheduledTime > 0):
+                message += ', target ' + '{:.1f}'.format(self.numEvents / scheduledTime) + ' events/second'
+            message += ', ' + '{:.2f}'.format(max(elapsedTime - scheduledTime, 0.0)) + ' seconds behind'
+        message += ', ' + str(len(self.subscribers)) + ' subscribers'
+        print(message, file=sys.stderr)
+
+    async def close(self):
+        for subscriber in list(self.subscribers):
+            with contextlib.suppress(ConnectionError):
+                await subscriber.writer.drain()
+            self.removeSubscriber(subscriber)
+        for server in self.servers:
+            server.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        for server in self.servers:
+            await server.wait_closed()
+
+
+# ----- Main -----
+
+def ParseArguments(argv):
+    parser = argparse.ArgumentParser(prog='gReplay', description='Publish GSG streams in real time for load-testing stream consumers')
+    parser.add_argument('inputFile', help='JSON input file of parameters and patterns')
+    parser.add_argument('-files', action='store_true', help='replay the stream files of an earlier run instead of generating')
+    parser.add_argument('-seed', type=int, default=None, help='random seed (overrides seed in input file)')
+    parser.add_argument('-speed', type=float, default=1.0, help='speed-up factor over secondsPerUnitTime, 0 for no pacing (default 1)')
+    parser.add_argument('-tcp', default=None, help='publish on TCP [host:]port (default host 127.0.0.1)')
+    parser.add_argument('-unix', default=None, help='publish on Unix socket path')
+    parser.add_argument('-stdout', action='store_true', help='also write events to standard output')
+    parser.add_argument('-wait', type=int, default=0, help='wait for this many subscribers before starting (default 0)')
+    parser.add_argument('-report', type=float, default=5.0, help='seconds between rate reports (default 5)')
+    args = parser.parse_args(argv)
+    if ((args.speed < 0) or (args.wait < 0) or (args.report <= 0)):
+        parser.error('-speed and -wait must not be negative, and -report must be positive')
+    if ((args.tcp is None) and (args.unix is None)):
+        if args.wait:
+            parser.error('-wait requires -tcp or -unix')
+        args.stdout = True
+    return args
+
+def main():
+    args = ParseArguments(sys.argv[1:])
+    eventFile = sys.stdout if args.stdout else None
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            asyncio.run(Replay(args, eventFile))
+        except KeyboardInterrupt:
+            pass
+
+# Replay streams for the command-line arguments
+async def Replay(args, eventFile):
+    ConfigureLogging()
+    with open(args.inputFile) as inputFile:
+        jsonData = json.load(inputFile)
+    parameters = Parameters()
+    parameters.parseFromJSON(jsonData)
+    if (args.seed is not None):
+        parameters.seed = args.seed
+    if args.files:
+        try:
+            streamFileNames = StreamFileNames(parameters.outputFilePrefix)
+        except FileNotFoundError as error:
+            print('Error: ' + str(error))
+            return
+        eventsByTimeUnit = FileEventsByTimeUnit(streamFileNames, parameters)
+    else:
+        patterns = ParsePatterns(jsonData['patterns'], parameters)
+        eventsByTimeUnit = CreateGenerator(parameters, patterns).eventsByTimeUnit()
+    server = ReplayServer(parameters.secondsPerUnitTime, args.speed, args.report, eventFile)
+    try:
+        if (args.tcp is not None):
+            host, _, port = args.tcp.rpartition(':')
+            await server.startTCP(host or '127.0.0.1', int(port))
+        if (args.unix is not None):
+            await server.startUnix(args.unix)
+        await server.waitForSubscribers(args.wait)
+        await server.replay(eventsByTimeUnit)
+    finally:
+        with contextlib.suppress(ValueError): # still running in another thread if interrupted
+            eventsByTimeUnit.close()
+        await server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# gScore.py
+#
+# Graph Stream Generator v1.0
+#
+# Usage: python gScore.py <store_file | outputFilePrefix> <detections_file> [-threshold <t>] [-output <file>]
+#
+# Scores a miner's detections against the ground truth of a run, reporting the
+# precision, recall and F1 score per pattern and over all patterns. The ground truth
+# is the SQLite store written by the "sqlite" output format (see gsgTruth.py), given
+# as the store file or as the outputFilePrefix of the run
+# (<outputFilePrefix>-insts.sqlite).
+#
+# The detections file holds one detection per item, in the layout of an instance in
+# the instances file: {"patternId": ..., "vertexIds": [...], "edgeIds": [...]}, with
+# patternId optional. It may be a JSON array or JSON Lines, and compressed (see
+# gsgOutput.ReadOutputItems); it is read one item at a time. A detection matches the
+# tracked instance most similar to it if their Jaccard similarity is at least
+# -threshold (default 0.5; 1 requires the same ids). With -output, the scores are
+# also written to the given JSON file.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import sys
+import os
+import json
+import argparse
+from gsgOutput import ReadOutputItems
+from gsgTruth import OpenTruthStore, ScoreDetections
+
+
+def ParseArguments(argv):
+    parser = argparse.ArgumentParser(prog='gScore', description='Score detections against the ground truth of a GSG run')
+    parser.add_argument('store', help='ground-truth store file, or outputFilePrefix of the run')
+    parser.add_argument('detectionsFile', help='JSON or JSON Lines file of detections')
+    parser.add_argument('-threshold', type=float, default=0.5, help='Jaccard similarity for a detection to match an instance (default 0.5)')
+    parser.add_argument('-output', default=None, help='also write the scores to this JSON file')
+    args = parser.parse_args(argv)
+    if (not (0.0 < args.threshold <= 1.0)):
+        parser.error('-threshold must be greater than 0 and at most 1')
+    return args
+
+def PrintScores(scores):
+    patternIds = sorted([patternId for patternId in scores if (patternId != "all")]) + ["all"]
+    header = ['pattern', 'instances', 'detections', 'truePositives', 'instancesFound', 'precision', 'recall', 'f1']
+    rows = []
+    for patternId in patternIds:
+        score = scores[patternId]
+        rows.append([patternId] + [str(score[key]) for key in header[1:5]] + ['{:.4f}'.format(score[key]) for key in header[5:]])
+    widths = [max([len(row[column]) for row in [header] + rows]) for column in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join([row[column].ljust(widths[column]) for column in range(len(row))]).rstrip())
+
+def main():
+    args = ParseArguments(sys.argv[1:])
+    storeFile = args.store
+    if (not os.path.isfile(storeFile)):
+        storeFile = args.store + '-insts.sqlite'
+    try:
+        connection = OpenTruthStore(storeFile)
+        with connection:
+            scores = ScoreDetections(connection, ReadOutputItems(args.detectionsFile), args.threshold)
+    except (FileNotFoundError, ValueError) as error:
+        print('Error: ' + str(error))
+        sys.exit()
+    PrintScores(scores)
+    if args.output:
+        with open(args.output, 'w') as outputFile:
+            json.dump(scores, outputFile, indent=2)
+            outputFile.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# gSweep.py
+#
+# Graph Stream Generator v1.0
+#
+# Usage: python gSweep.py <input_file> -set <name>=<values> [-set <name>=<values> ...]
+#          [-workers <n>] [-summary <file>]
+#
+# Generates one dataset for each combination of the values given by -set, each a
+# comma-separated list of values of a parameter of the input file (e.g., -set
+# duration=1000,2000 -set seed=1,2,3 makes six runs). The name may be any parameter
+# in SWEEP_PARAMETERS, "probability" to set the probability of every pattern, or
+# "probability:<pattern id>" to set that of one pattern. Output formats in a value
+# of outputFormat are joined by "+" (e.g., json+graphml).
+#
+# The input file and patterns are parsed and validated once, and the parameters of
+# every run checked, before any run starts. The runs are then generated over a pool
+# of -workers processes (by default, one per CPU), each given the compiled patterns
+# once when it starts. Run n writes its files with outputFilePrefix
+# <outputFilePrefix>-r<n>. Unless seed is swept, run n is seeded with the input
+# file's seed (or a random one) plus n, so runs differ but can be repeated by
+# gsg.py with that seed.
+#
+# A summary table, with a row per run giving its settings, seed, numbers of
+# instances and of vertices and edges written in all and to each stream, the peak
+# number pending, and its time and rate, is printed and written tab-separated to
+# <outputFilePrefix>-sweep.tsv (or the -summary file).
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import sys
+import os
+import copy
+import json
+import random
+import logging
+import argparse
+import itertools
+import multiprocessing
+from gsgClasses import *
+from gsgGenerator import *
+from gsgVector import CreateGenerator
+from gsgMetrics import logger, ConfigureLogging
+
+# Parameters of the input file that can be swept (outputFilePrefix is set per run)
+SWEEP_PARAMETERS = ("numStreams", "secondsPerUnitTime", "startTime", "duration", "outputTimeFormat",
+                    "oldVertexPoolSize", "oldVertexPoolPolicy", "triggerEngine", "instanceEngine", "seed",
+                    "outputThreads", "outputFormat", "outputCompression", "segmentSize", "segmentDuration",
+                    "compressionThreads", "checkpointInterval")
+
+
+# ----- Runs -----
+
+# One run of a sweep: its settings {name: value} from -set, parameters, and pattern
+# probabilities {pattern index: probability} differing from the input file's
+class SweepRun:
+    def __init__(self, runNum, settings, parameters, probabilities):
+        self.runNum = runNum
+        self.settings = settings
+        self.parameters = parameters
+        self.probabilities = probabilities
+
+# Return list of (name, list of values) for the -set arguments, exiting if any is malformed
+def ParseSettings(parser, sets, patterns):
+    patternIds = [pattern.id for pattern in patterns]
+    settings = []
+    for setting in sets:
+        name, separator, values = setting.partition('=')
+        name = name.strip()
+        if ((not separator) or (not values)):
+            parser.error('-set expects <name>=<values>, got "' + setting + '"')
+        if ((name not in SWEEP_PARAMETERS) and (name != 'probability') and
+            (not (name.startswith('probability:') and (name[len('probability:'):] in patternIds)))):
+            parser.error('-set cannot set "' + name + '"; names are probability, probability:<pattern id>, ' + ', '.join(SWEEP_PARAMETERS))
+        if name in [settingName for settingName,settingValues in settings]:
+            parser.error('-set given twice for "' + name + '"')
+        settings.append((name, [value.strip() for value in values.split(',')]))
+    return settings
+
+# Return list of SweepRun for each combination of the settings' values, checking
+# that each run's parameters are valid for the patterns
+def SweepRuns(jsonData, patterns, settings):
+    runs = []
+    seed = jsonData.get('seed')
+    baseSeed = int(seed) if (seed is not None) else random.SystemRandom().randrange(1 << 31)
+    names = [name for name,values in settings]
+    maxStreamNum = max([edge.streamNum for pattern in patterns for edge in pattern.edges] + [1])
+    for runNum,values in enumerate(itertools.product(*[values for name,values in settings]), 1):
+        runSettings = dict(zip(names, values))
+        runJSON = dict([(name, value) for name,value in jsonData.items() if (name != 'patterns')])
+        probabilities = {}
+        for name,value in runSettings.items():
+            if (name == 'probability'):
+                for patternIndex in range(len(patterns)):
+                    probabilities[patternIndex] = float(value)
+            elif name.startswith('probability:'):
+                for patternIndex in range(len(patterns)):
+                    if (patterns[patternIndex].id == name[len('probability:'):]):
+                        probabilities[patternIndex] = float(value)
+            elif (name == 'outputFormat'):
+                runJSON[name] = value.replace('+', ',')
+            else:
+                runJSON[name] = value
+        if ('seed' not in runSettings):
+            runJSON['seed'] = str(baseSeed + runNum)
+        runJSON['outputFilePrefix'] = jsonData['outputFilePrefix'] + '-r' + str(runNum)
+        parameters = Parameters()
+        parameters.parseFromJSON(runJSON)
+        for patternIndex,probability in probabilities.items():
+            if ((probability < 0.0) or (probability > 1.0)):
+                print("Error: probability out of range for pattern " + patterns[patternIndex].id + " in run " + str(runNum))
+                sys.exit()
+        if (maxStreamNum > parameters.numStreams):
+            print("Error: numStreams less than streamNum of a pattern edge in run " + str(runNum))
+            sys.exit()
+        runs.append(SweepRun(runNum, runSettings, parameters, probabilities))
+    return runs
+
+
+# ----- Workers -----
+
+sweepPatterns = None # compiled patterns of the sweep, set in each worker process
+
+def InitSweepWorker(patterns):
+    global sweepPatterns
+    sweepPatterns = patterns
+
+# Return the patterns of run, copies of the sweep's patterns sharing their compiled form
+def RunPatterns(run):
+    patterns = []
+    for patternIndex,pattern in enumerate(sweepPatterns):
+        if (patternIndex in run.probabilities):
+            pattern = copy.copy(pattern)
+            pattern.probability = run.probabilities[patternIndex]
+        patterns.append(pattern)
+    return patterns
+
+# Generate run, returning (runNum, metrics dictionary (see gsgMetrics.Metrics.toJSON)
+# or None, error message or None)
+def SweepRunWorker(run):
+    try:
+        generator = CreateGenerator(run.parameters, RunPatterns(run))
+        generator.logLevel = logging.DEBUG
+        generator.generate()
+        return run.runNum, generator.metrics.toJSON(), None
+    except Exception as error:
+        return run.runNum, None, error.__class__.__name__ + ': ' + str(error)
+
+
+# ----- Summary -----
+
+# Return (header, list of rows) of the summary table of runs and their results {runNum: (metrics, error)}
+def SummaryTable(runs, settings, results):
+    maxStreams = max([run.parameters.numStreams for run in runs])
+    names = [name for name,values in settings if (name != 'seed')] # seed has its own column
+    header = (['run'] + names + ['seed', 'outputFilePrefix', 'instances', 'events'] +
+              ['events:s' + str(streamNum) for streamNum in range(1, maxStreams+1)] +
+              ['maxPending', 'seconds', 'eventsPerSecond', 'error'])
+    rows = []
+    for run in runs:
+        metrics, error = results[run.runNum]
+        row = [str(run.runNum)] + [run.settings[name] for name in names]
+        row += [str(run.parameters.seed), run.parameters.outputFilePrefix]
+        if metrics:
+            row += [str(sum([counts["added"] for counts in metrics["instances"].values()])), str(metrics["events"])]
+            row += [str(metrics["streamEvents"].get(str(streamNum), '')) for streamNum in range(1, maxStreams+1)]
+            row += [str(metrics["pendingEvents"]["max"]), str(metrics["seconds"]), str(metrics["eventsPerSecond"]), '']
+        else:
+            row += [''] * (2 + maxStreams + 3) + [error]
+        rows.append(row)
+    return header, rows
+
+def PrintTable(header, rows):
+    widths = [max([len(row[column]) for row in [header] + rows]) for column in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join([row[column].ljust(widths[column]) for column in range(len(row))]).rstrip())
+
+def WriteTable(fileName, header, rows):
+    with open(fileName, 'w') as tableFile:
+        for row in [header] + rows:
+            tableFile.write('\t'.join(row) + '\n')
+
+
+# ----- Main -----
+
+def ParseArguments(argv):
+    parser = argparse.ArgumentParser(prog='gSweep', description='Generate a dataset for each combination of parameter values')
+    parser.add_argument('inputFile', help='JSON input file of parameters and patterns')
+    parser.add_argument('-set', action='append', default=[], help='<name>=<comma-separated values> of a parameter to sweep (may be repeated)')
+    parser.add_argument('-workers', type=int, default=None, help='number of worker processes (default one per CPU)')
+    parser.add_argument('-summary', default=None, help='file to which to write the summary table (default <outputFilePrefix>-sweep.tsv)')
+    args = parser.parse_args(argv)
+    if ((args.workers is not None) and (args.workers < 1)):
+        parser.error('-workers must be positive')
+    if (not args.set):
+        parser.error('at least one -set is required')
+    return args, parser
+
+def main():
+    args, parser = ParseArguments(sys.argv[1:])
+    ConfigureLogging()
+    with open(args.inputFile) as inputFile:
+        jsonData = json.load(inputFile)
+    parameters = Parameters()
+    parameters.parseFromJSON(jsonData)
+    patterns = ParsePatterns(jsonData['patterns'], parameters)
+    settings = ParseSettings(parser, args.set, patterns)
+    runs = SweepRuns(jsonData, patterns, settings)
+    numWorkers = min(args.workers or os.cpu_count() or 1, len(runs))
+    logger.info('Generating ' + str(len(runs)) + ' runs (' + str(numWorkers) + ' workers)...')
+    results = {}
+    with multiprocessing.Pool(numWorkers, InitSweepWorker, (patterns,)) as pool:
+        for runNum,metrics,error in pool.imap_unordered(SweepRunWorker, runs):
+            results[runNum] = (metrics, error)
+            if error:
+                logger.warning('Run ' + str(runNum) + ' failed: ' + error)
+            else:
+                logger.info('Run ' + str(runNum) + ': ' + str(metrics["events"]) + ' events in ' + '{:.2f}'.format(metrics["seconds"]) + ' seconds')
+    header, rows = SummaryTable(runs, settings, results)
+    PrintTable(header, rows)
+    summaryFile = args.summary or (jsonData['outputFilePrefix'] + '-sweep.tsv')
+    WriteTable(summaryFile, header, rows)
+    logger.info('Summary written to ' + summaryFile)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,40 @@
 #
 # Graph Stream Generator v1.0
 #
-# Usage: gsg <input_file>
+# Usage: gsg <input_file> [-seed <seed>] [-events [-files]] [-workers <n> [-shards <n>]] [-writers <n>] [-format <formats>]
+#            [-checkpoint <seconds>] [-resume | -extend <timeUnits>]
+#            [-log <level>] [-progress <seconds>] [-metrics <file>] [-profile <file>] [-dryrun [<timeUnits>]]
 #
-# See readme.txt for description of input and output files.
+# See README.md for description of input and output files. The generator itself
+# is the GraphStreamGenerator class in gsgGenerator.py.
+#
+# With -events, vertices and edges are written to standard output as they are
+# generated, one JSON object per line, instead of to the output files (unless
+# -files is also given). Other messages then go to standard error.
+#
+# With -workers, generation is split into shards run over a pool of worker
+# processes (see gsgParallel.py). The output depends on the seed and the number
+# of shards, but not on the number of workers.
+#
+# With -format, the output is written in each of the given comma-separated formats
+# (e.g., "json,graphml"), in place of the outputFormat in the input file.
+#
+# With -checkpoint, the generation state is saved every given number of seconds to
+# <outputFilePrefix>-checkpoint. -resume continues an interrupted run from there, and
+# -extend continues a run (interrupted or finished) for that many more time units.
+#
+# Messages are logged at the -log level: "info" (the default), "debug" to also log
+# each instance added, or "warning". With -progress, the rate of generation and the
+# time remaining are logged every given number of seconds. With -metrics, the metrics
+# of the run (see gsgMetrics.py) are written to the given JSON file at the end. With
+# -profile, generation is profiled with cProfile, and the profile written to the
+# given file.
+#
+# With -dryrun, nothing is generated. Instead, the number of events, the size of the
+# output in each format, the memory and the runtime of the run are estimated (see
+# gsgEstimate.py), calibrated by sample runs of the given number of time units (by
+# default, enough for some tens of thousands of events). -metrics then writes the
+# estimate to the given JSON file.
 #
 # Written by Larry Holder (holder@eecs.wsu.edu).
 #
@@ -12,386 +43,123 @@
 
 import sys
 import json
-from datetime import datetime
-from datetime import timedelta
-import random
+import argparse
+import contextlib
 from gsgClasses import *
+from gsgGenerator import *
+from gsgParallel import GenerateParallel
+from gsgVector import CreateGenerator
+from gsgMetrics import LOG_LEVELS, ConfigureLogging, Profiling
+from gsgEstimate import EstimateRun, PrintEstimate, WriteEstimate
+
+
+def ParseArguments(argv):
+    parser = argparse.ArgumentParser(prog='gsg', description='Graph Stream Generator')
+    parser.add_argument('inputFile', help='JSON input file of parameters and patterns')
+    parser.add_argument('-seed', type=int, default=None, help='random seed (overrides seed in input file)')
+    parser.add_argument('-events', action='store_true', help='stream events to standard output as JSON lines')
+    parser.add_argument('-files', action='store_true', help='with -events, also write the output files')
+    parser.add_argument('-workers', type=int, default=0, help='generate in parallel with this many worker processes')
+    parser.add_argument('-shards', type=int, default=16, help='number of shards for parallel generation (default 16)')
+    parser.add_argument('-writers', type=int, default=None, help='number of background threads writing output files (overrides outputThreads in input file)')
+    parser.add_argument('-format', default=None, help='comma-separated output formats, from ' + ', '.join(SINKS) + ' (overrides outputFormat in input file)')
+    parser.add_argument('-checkpoint', type=float, default=None, help='seconds between checkpoints (overrides checkpointInterval in input file)')
+    parser.add_argument('-resume', action='store_true', help='resume the run from its checkpoint')
+    parser.add_argument('-extend', type=int, default=None, help='resume the run from its checkpoint and extend its duration by this many time units')
+    parser.add_argument('-log', default='info', choices=list(LOG_LEVELS), help='level of messages logged (default info; debug logs each instance)')
+    parser.add_argument('-progress', type=float, default=None, help='seconds between progress messages (overrides progressInterval in input file)')
+    parser.add_argument('-metrics', default=None, help='write the metrics of the run to this JSON file')
+    parser.add_argument('-profile', default=None, help='profile generation with cProfile, writing the profile to this file')
+    parser.add_argument('-dryrun', type=int, nargs='?', const=0, default=None,
+                        help='estimate output size, memory and runtime instead of generating, from a sample run of this many time units (default automatic)')
+    args = parser.parse_args(argv)
+    if (args.workers and args.events):
+        parser.error('-events cannot be used with -workers')
+    if ((args.workers < 0) or (args.shards < 1) or ((args.writers is not None) and (args.writers < 0))):
+        parser.error('-workers and -writers must not be negative and -shards must be positive')
+    if ((args.checkpoint is not None) and (args.checkpoint < 0)):
+        parser.error('-checkpoint must not be negative')
+    if ((args.extend is not None) and (args.extend < 0)):
+        parser.error('-extend must not be negative')
+    if ((args.resume or (args.extend is not None)) and (args.events or args.workers)):
+        parser.error('-resume and -extend cannot be used with -events or -workers')
+    if ((args.progress is not None) and (args.progress < 0)):
+        parser.error('-progress must not be negative')
+    if (args.metrics and args.workers):
+        parser.error('-metrics cannot be used with -workers')
+    if ((args.dryrun is not None) and (args.events or args.workers or args.resume or (args.extend is not None))):
+        parser.error('-dryrun cannot be used with -events, -workers, -resume or -extend')
+    if ((args.dryrun is not None) and (args.dryrun < 0)):
+        parser.error('-dryrun must not be negative')
+    return args
+
+# Write generated events to eventFile, one JSON object per line, flushing after each time unit
+def StreamEvents(generator, eventFile, writeFiles):
+    for timeUnit,events in generator.eventsByTimeUnit(writeFiles):
+        eventFile.write(''.join([EventToJSON(event) + '\n' for event in events]))
+        eventFile.flush()
 
-
-# ----- Global variables -----
-
-global gParameters
-global gPatterns
-global gStreamFiles
-global gInstancesFile
-global gWroteAnInstance # True if wrote at least one instance already
-global gStreamVertices  # list where gStreamVertices[i] = list of vertices in stream i+1
-global gStreamSchedules # list of streams, where gStreamSchedules[i] = list of scheduled vertices and edges for stream i+1
-global gStreamWrittenTo # list of Booleans, where gStreamWrittenTo[i] = True if some vertex written to stream
-global gNumVertices     # total number of unique vertices written to streams
-global gNumEdges        # total number of edges written to streams
-
-
-# ----- Parsing Functions -----
-
-def ParseVertices(jsonData):
-    vertices = []
-    for jsonVertex in jsonData:
-        vertex = Vertex()
-        vertex.id = jsonVertex['id']
-        if 'type' in jsonVertex:
-            vertex.type = jsonVertex['type']
-        if (jsonVertex['new'] == "true"):
-            vertex.new = True
-            vertex.attributes = jsonVertex['attributes']
-        else:
-            vertex.new = False 
-            vertex.attributes = [] # attributes ignored if new=false, i.e., referring to old vertex (and will use its attributes)
-        vertices.append(vertex)
-    return vertices
-
-def ParseEdges(jsonData, vertices):
-    global gParameters
-    edges = []
-    for jsonEdge in jsonData:
-        edge = Edge()
-        edge.id = jsonEdge['id']
-        if 'type' in jsonEdge:
-            edge.type = jsonEdge['type']
-        edge.source = jsonEdge['source']
-        if (GetVertexById(edge.source, vertices) == None):
-            print("Error: Source vertex in edge " + edge.id + " not defined")
-            sys.exit()
-        edge.target = jsonEdge['target']
-        if (GetVertexById(edge.target, vertices) == None):
-            print("Error: Target vertex in edge " + edge.id + " not defined")
-            sys.exit()
-        if (jsonEdge['directed'] == "true"):
-            edge.directed = True
-        else:
-            edge.directed = False
-        edge.minOffset = int(jsonEdge['minOffset'])
-        edge.maxOffset = int(jsonEdge['maxOffset'])
-        if ((edge.minOffset < 0) or (edge.minOffset > edge.maxOffset)):
-            print("Error: Incorrect offsets in edge " + edge.id)
-            sys.exit()
-        edge.streamNum = int(jsonEdge['streamNum'])
-        if ((edge.streamNum < 1) or (edge.streamNum > gParameters.numStreams)):
-            print("Error: streamNum out of range in edge " + edge.id)
-            sys.exit()
-        edge.attributes = jsonEdge['attributes']
-        edges.append(edge)
-    return edges
-
-def ParsePatterns(jsonData):
-    print('Parsing patterns...')
-    global gPatterns
-    gPatterns = []
-    for jsonPattern in jsonData:
-        pattern = Pattern()
-        pattern.id = jsonPattern['id']
-        if (jsonPattern['track'] == "true"):
-            pattern.track = True
-        else:
-            pattern.track = False
-        pattern.probability = float(jsonPattern['probability'])
-        if ((pattern.probability < 0.0) or (pattern.probability > 1.0)):
-            print("Error: probability out of range for pattern " + pattern.id)
-            sys.exit()
-        pattern.vertices = ParseVertices(jsonPattern['vertices'])
-        pattern.edges = ParseEdges(jsonPattern['edges'], pattern.vertices)
-        if ValidPattern(pattern):
-            gPatterns.append(pattern)
-
-def ValidPattern(pattern):
-    # Check that all edges to an old vertex in same stream
-    for vertex in pattern.vertices:
-        if (not vertex.new):
-            oldVertexStreamNum = -1
-            for edge in pattern.edges:
-                if ((edge.source == vertex.id) or (edge.target == vertex.id)):
-                    if (oldVertexStreamNum == -1):
-                        oldVertexStreamNum = edge.streamNum # first edge using old vertex
-                    else:
-                        if (oldVertexStreamNum != edge.streamNum):
-                            print("Error: Invalid pattern " + pattern.id + ": two edges to same old vertex have different streams")
-                            sys.exit()
-    return True
-
-
-# ----- File I/O -----
-
-def OpenFiles():
-    global gStreamFiles
-    global gInstancesFile
-    global gWroteAnInstance
-    gStreamFiles = []
-    for streamNum in range(0,gParameters.numStreams):
-        outputFileName = gParameters.outputFilePrefix + '-s' + str(streamNum+1)
-        outputFile = open(outputFileName, 'w')
-        outputFile.write('[\n') # array of vertices and edges
-        gStreamFiles.append(outputFile)
-    instancesFileName = gParameters.outputFilePrefix + '-insts'
-    gInstancesFile = open(instancesFileName, 'w')
-    gInstancesFile.write('[\n') # array of pattern instances
-    gWroteAnInstance = False
-    
-def CloseFiles():
-    global gStreamFiles
-    global gInstancesFile
-    for streamFile in gStreamFiles:
-        streamFile.write('\n]\n')
-        streamFile.close()
-    gInstancesFile.write('\n]\n')
-    gInstancesFile.close()
-        
-    
-# ----- Main Functions -----
-
-def AddPatternInstance(pattern, timeUnit):
-    global gNumEdges
-    print("Adding instance of pattern " + pattern.id + " at time " + str(timeUnit))
-    vertexInstancesDict = {}
-    edgeInstances = []
-    patternCreated = True
-    for edge in pattern.edges:
-        edgeInstance = EdgeInstance()
-        edgeInstance.type = edge.type
-        edgeInstance.directed = edge.directed
-        edgeInstance.attributes = edge.attributes
-        edgeInstance.streamNum = edge.streamNum
-        edgeInstance.creationTime = timeUnit + random.randint(edge.minOffset, edge.maxOffset)
-        sourceVertex = GetVertexById(edge.source, pattern.vertices)
-        edgeInstance.source = GetVertexInstanceId(sourceVertex, edgeInstance, vertexInstancesDict)
-        targetVertex = GetVertexById(edge.target, pattern.vertices)
-        edgeInstance.target = GetVertexInstanceId(targetVertex, edgeInstance, vertexInstancesDict)
-        if ((edgeInstance.source == 0) or (edgeInstance.target == 0)):
-            patternCreated = False
-            break # break out of loop over pattern.edges
-        else:
-            gNumEdges += 1
-            edgeInstance.id = gNumEdges
-            edgeInstances.append(edgeInstance)
-    if patternCreated:
-        patternInstance = PatternInstance()
-        patternInstance.id = pattern.id
-        patternInstance.vertices = vertexInstancesDict.values()
-        patternInstance.edges = edgeInstances
-        # Write instance if pattern track'ed
-        if (pattern.track):
-            WritePatternInstance(patternInstance)
-        SchedulePatternInstance(patternInstance)   
-    else:
-        print("  Instance not added: not enough old vertices available in stream")
-
-# Add pattern instance's vertices and edges to appropriate stream schedules
-def SchedulePatternInstance(patternInstance):
-    global gStreamSchedules
-    for vertexInstance in patternInstance.vertices:
-        for streamNum in vertexInstance.streamCreationTimes.keys():
-            gStreamSchedules[streamNum-1].append(vertexInstance)
-    for edgeInstance in patternInstance.edges:
-        gStreamSchedules[edgeInstance.streamNum-1].append(edgeInstance)
-
-def WritePatternInstance(patternInstance):
-    global gWroteAnInstance
-    global gInstancesFile
-    global gWroteAnInstance
-    if gWroteAnInstance:
-        gInstancesFile.write(',\n')
-    else:
-        gWroteAnInstance = True
-    gInstancesFile.write('  {"patternId": "'+ patternInstance.id + '",\n')
-    gInstancesFile.write('   "vertexIds": [')
-    firstTime = True
-    for vertexInstance in patternInstance.vertices:
-        if firstTime:
-            firstTime = False
-        else:
-            gInstancesFile.write(', ')
-        gInstancesFile.write('"' + str(vertexInstance.id) + '"')
-    gInstancesFile.write('],\n')
-    gInstancesFile.write('   "edgeIds": [')
-    firstTime = True
-    for edgeInstance in patternInstance.edges:
-        if firstTime:
-            firstTime = False
-        else:
-            gInstancesFile.write(', ')
-        gInstancesFile.write('"' + str(edgeInstance.id) + '"')
-    gInstancesFile.write(']\n  }')
-
-# If returns 0, then it was unable to create vertex instance
-def GetVertexInstanceId(vertex, edgeInstance, vertexInstancesDict):
-    global gNumVertices
-    if (vertex.id in vertexInstancesDict):
-        # Vertex instance already created
-        vertexInstance = vertexInstancesDict[vertex.id]
-        if (vertex.new):
-            streamCreationTimes = vertexInstance.streamCreationTimes
-            # Make sure new vertex instance appears no later than any incident edges
-            if (edgeInstance.streamNum in streamCreationTimes):
-                if (edgeInstance.creationTime < streamCreationTimes[edgeInstance.streamNum]):
-                        streamCreationTimes[edgeInstance.streamNum] = edgeInstance.creationTime
-            else:
-                streamCreationTimes[edgeInstance.streamNum] = edgeInstance.creationTime
-        # else old vertex instance already exists and no need to change streamCreationTimes
-    else:
-        # Create new vertex instance
-        vertexInstance = VertexInstance()
-        vertexInstance.type = vertex.type
-        vertexInstance.attributes = vertex.attributes
-        if (vertex.new):
-            gNumVertices += 1
-            vertexInstance.id = gNumVertices
-            vertexInstance.streamCreationTimes[edgeInstance.streamNum] = edgeInstance.creationTime
-        else:
-            # Get random old vertex that has not already been used for a different old vertex in this pattern
-            usedVertexIds = [vi.id for vi in vertexInstancesDict.values()]
-            vertexInstance.id = GetRandomVertexIdOnStream(edgeInstance.streamNum, usedVertexIds)
-        vertexInstancesDict[vertex.id] = vertexInstance
-    return vertexInstance.id # If zero, then edge left hanging; should abort creating this pattern instance
-
-def GetVertexById(id, vertices):
-    for vertex in vertices:
-        if (vertex.id == id):
-            return vertex # Should always exist (unless incorrect input)
-    return None
-
-# Return id of random vertex already written to given stream number (and not already used).
-# Returns 0 if none exists.
-def GetRandomVertexIdOnStream(streamNum, usedVertexIds):
-    global gStreamVertices
-    streamVertices = gStreamVertices[streamNum-1]
-    numStreamVertices = len(streamVertices)
-    if (numStreamVertices > 0):
-        # Get a random starting point
-        randomVertexIndex = random.randint(0,numStreamVertices-1)
-        numTries = 0
-        while (numTries < numStreamVertices):
-            # Keep incrementing from random starting point until non-used vertex id found, or tried them all
-            randomVertexId = streamVertices[randomVertexIndex]
-            if (randomVertexId not in usedVertexIds):
-                return randomVertexId
-            randomVertexIndex += 1
-            if (randomVertexIndex == numStreamVertices):
-                randomVertexIndex = 0
-            numTries += 1
-    return 0
-    
-def GenerateStreams():
-    print('Generating streams...')
-    global gParameters
-    global gPatterns
-    global gNumVertices
-    global gNumEdges
-    global gStreamVertices
-    global gStreamSchedules
-    global gStreamWrittenTo
-    gNumVertices = 0
-    gNumEdges = 0
-    gStreamVertices = [[] for x in range(gParameters.numStreams)] # list of numStreams empty lists
-    gStreamSchedules = [[] for x in range(gParameters.numStreams)] # list of numStreams empty lists
-    gStreamWrittenTo = [False for x in range(gParameters.numStreams)]
-    for timeUnit in range(0,gParameters.duration):
-        for pattern in gPatterns:
-            if (pattern.probability >= random.uniform(0,1)):
-                AddPatternInstance(pattern, timeUnit)
-        ProcessStreamSchedules(timeUnit)
-    # Continue until all scheduled vertices and edges processed
-    timeUnit = gParameters.duration
-    while not SchedulesEmpty():
-        ProcessStreamSchedules(timeUnit)
-        timeUnit += 1
-
-def SchedulesEmpty():
-    global gStreamSchedules
-    for streamSchedule in gStreamSchedules:
-        if streamSchedule: # not empty
-            return False
-    return True
-
-# Write scheduled vertices and edges to streams for creationTime = timeUnit.
-# Add new vertices to gStreamVertices.
-def ProcessStreamSchedules(timeUnit):
-    global gParameters
-    global gStreamVertices
-    global gStreamSchedules
-    for streamIndex in range(0,gParameters.numStreams):
-        for item in list(gStreamSchedules[streamIndex]):
-            if isinstance(item, VertexInstance):
-                vertexInstance = item
-                if (vertexInstance.streamCreationTimes[streamIndex+1] == timeUnit):
-                    WriteVertexInstanceToStream(vertexInstance, streamIndex+1)
-                    gStreamVertices[streamIndex].append(vertexInstance.id)
-                    gStreamSchedules[streamIndex].remove(vertexInstance)
-            else: # item must be an edge instance
-                edgeInstance = item
-                if (edgeInstance.creationTime == timeUnit):
-                    WriteEdgeInstanceToStream(edgeInstance, streamIndex+1)
-                    gStreamSchedules[streamIndex].remove(edgeInstance)
-
-def WriteVertexInstanceToStream(vertexInstance, streamNum):
-    global gStreamFiles
-    global gStreamWrittenTo
-    streamFile = gStreamFiles[streamNum-1]
-    if gStreamWrittenTo[streamNum-1]:
-        streamFile.write(',\n')
-    else:
-        gStreamWrittenTo[streamNum-1] = True
-    streamFile.write('  {"vertex": {\n')
-    streamFile.write('     "id": "' + str(vertexInstance.id) + '",\n')
-    if vertexInstance.type:
-        streamFile.write('     "type": "' + vertexInstance.type + '",\n')
-    streamFile.write('     "attributes": ' + DictToJSONString(vertexInstance.attributes) + ',\n')
-    streamFile.write('     "timestamp": "' + TimeStr(vertexInstance.streamCreationTimes[streamNum]) + '"}}')
-
-def WriteEdgeInstanceToStream(edgeInstance, streamNum):
-    global gStreamFiles
-    global gStreamWrittenTo
-    streamFile = gStreamFiles[streamNum-1]
-    streamFile.write(',\n') # some vertices must have already been written
-    streamFile.write('  {"edge": {\n')
-    streamFile.write('     "id": "' + str(edgeInstance.id) + '",\n')
-    streamFile.write('     "source": "' + str(edgeInstance.source) + '",\n')
-    streamFile.write('     "target": "' + str(edgeInstance.target) + '",\n')
-    if edgeInstance.type:
-        streamFile.write('     "type": "' + edgeInstance.type + '",\n')
-    streamFile.write('     "attributes": ' + DictToJSONString(edgeInstance.attributes) + ',\n')
-    if edgeInstance.directed:
-        streamFile.write('     "directed": "true",\n')
+def main():
+    args = ParseArguments(sys.argv[1:])
+    if args.events:
+        eventFile = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            Run(args, eventFile)
     else:
-        streamFile.write('     "directed": "false",\n')
-    streamFile.write('     "timestamp": "' + TimeStr(edgeInstance.creationTime) + '"}}')
-
-# Convert timeUnit to string according to output time format
-def TimeStr(timeUnit):
-    global gParameters
-    result = str(timeUnit) # i.e., outputTimeFormat = "units"
-    if (gParameters.outputTimeFormat == "seconds"):
-        result = str(timeUnit * gParameters.secondsPerUnitTime)
-    if (gParameters.outputTimeFormat == "datetime"):
-        secs = timeUnit * gParameters.secondsPerUnitTime
-        dateTime = gParameters.startTime + timedelta(seconds=secs)
-        result = dateTime.strftime('%Y-%m-%d %H:%M:%S')
-    return result
+        Run(args, None)
 
-def main():
-    global gParameters
-    global gPatterns
-    inputFileName = sys.argv[1]
-    with open(inputFileName) as inputFile:
+# Generate streams for the command-line arguments, streaming events to eventFile if given
+def Run(args, eventFile):
+    ConfigureLogging(args.log)
+    with open(args.inputFile) as inputFile:
         jsonData = json.load(inputFile)
-    gParameters = Parameters()
-    gParameters.parseFromJSON(jsonData)
+    parameters = Parameters()
+    parameters.parseFromJSON(jsonData)
+    if (args.seed is not None):
+        parameters.seed = args.seed
+    if (args.writers is not None):
+        parameters.outputThreads = args.writers
+    if (args.format is not None):
+        parameters.setOutputFormats(args.format)
+    if (args.checkpoint is not None):
+        parameters.checkpointInterval = args.checkpoint
+    if (args.progress is not None):
+        parameters.progressInterval = args.progress
+    parameters.checkCheckpoints()
     print('Graph Stream Generator v1.0\n')
-    gParameters.prettyprint()
-    ParsePatterns(jsonData['patterns'])
-    for pattern in gPatterns:
+    parameters.prettyprint()
+    patterns = ParsePatterns(jsonData['patterns'], parameters)
+    for pattern in patterns:
         pattern.prettyprint()
-    OpenFiles()
-    GenerateStreams()
-    CloseFiles()
+    if ((parameters.instanceEngine == "vector") and (args.workers or args.resume or (args.extend is not None))):
+        print('Error: instanceEngine "vector" cannot be used with -workers, -resume or -extend')
+        sys.exit()
+    if (args.dryrun is not None):
+        estimate = EstimateRun(parameters, patterns, args.dryrun or None)
+        PrintEstimate(estimate)
+        if args.metrics:
+            WriteEstimate(estimate, args.metrics)
+        return
+    generator = CreateGenerator(parameters, patterns)
+    with Profiling(args.profile):
+        if eventFile:
+            StreamEvents(generator, eventFile, args.files)
+        elif (args.resume or (args.extend is not None)):
+            try:
+                generator.resume(args.extend or 0)
+            except (FileNotFoundError, ValueError) as error:
+                print('Error: ' + str(error))
+                sys.exit()
+        elif args.workers:
+            GenerateParallel(parameters, jsonData['patterns'], patterns, args.shards, args.workers)
+        else:
+            try:
+                generator.generate()
+            except (FileExistsError, TimeoutError) as error: # shared memory in use or not read (see gsgSharedMemory.py)
+                print('Error: ' + str(error))
+                sys.exit()
+    if args.metrics:
+        generator.metrics.write(args.metrics)
     
 if __name__ == "__main__":
     main()
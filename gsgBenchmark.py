@@ -0,0 +1,433 @@
+# gsgBenchmark.py
+#
+# Graph Stream Generator v1.0
+#
+# Benchmarks.
+#
+# Usage: gsgBenchmark.py memory [numInstances]
+#        gsgBenchmark.py vector [numInstances]
+#        gsgBenchmark.py suite [-workload <names>] [-patterns <n>] [-size <n>]
+#          [-probability <p>] [-spread <n>] [-old <fraction>] [-streams <n>]
+#          [-duration <n>] [-scale <factor>] [-triggerEngine <engine>]
+#          [-instanceEngine <engine>] [-format <formats>] [-repeat <n>] [-output <file>]
+#
+#   memory: Bytes per pending (scheduled but not yet written) vertex or edge,
+#           for the dict-backed instance objects used before and for the
+#           current instance classes.
+#   vector: Seconds to generate a run of about numInstances instances (default
+#           one million) with instanceEngine "scalar" and "vector" (requires
+#           NumPy), without output and with JSON stream files written to a
+#           temporary directory.
+#   suite:  Throughput, peak memory and time per phase of generation for each
+#           synthetic workload of SUITE (or those named by -workload), written as
+#           one JSON object per line to standard output and appended to -output,
+#           so that results can be compared across versions. Each option sets that
+#           workload field in every workload; a comma-separated list of values
+#           runs each workload once per value. See BenchmarkSuite.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import sys
+import os
+import io
+import time
+import random
+import json
+import argparse
+import itertools
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+import contextlib
+import multiprocessing
+from datetime import datetime
+from gsgClasses import *
+from gsgGenerator import *
+from gsgVector import CreateGenerator
+
+
+# ----- Workloads -----
+
+# Pattern with two new vertices joined by one edge in each of two streams, with a
+# large offset window so that instances stay pending.
+def MemoryPatternJSON():
+    vertices = [{"id": "v1", "new": "true", "type": "user", "attributes": {"label": "v1"}},
+                {"id": "v2", "new": "true", "attributes": {"label": "v2"}}]
+    edges = [{"id": "e1", "source": "v1", "target": "v2", "directed": "true", "minOffset": "0", "maxOffset": "1000000",
+              "streamNum": "1", "attributes": {"label": "e1"}},
+             {"id": "e2", "source": "v2", "target": "v1", "directed": "false", "minOffset": "0", "maxOffset": "1000000",
+              "streamNum": "2", "attributes": {"label": "e2"}}]
+    return {"id": "M", "track": "false", "probability": "1.0", "vertices": vertices, "edges": edges}
+
+# Patterns with new vertices only, so that all their instances can be vectorized,
+# triggered about once per time unit in all.
+def VectorPatternsJSON():
+    vertices = [{"id": "v1", "new": "true", "type": "user", "attributes": {"label": "v1"}},
+                {"id": "v2", "new": "true", "attributes": {"label": "v2"}},
+                {"id": "v3", "new": "true", "attributes": {"label": "v3"}}]
+    edges1 = [{"id": "e1", "source": "v1", "target": "v2", "directed": "true", "minOffset": "0", "maxOffset": "10",
+               "streamNum": "1", "attributes": {"label": "e1"}},
+              {"id": "e2", "source": "v2", "target": "v1", "directed": "false", "minOffset": "0", "maxOffset": "10",
+               "streamNum": "2", "attributes": {"label": "e2"}}]
+    edges2 = edges1 + [{"id": "e3", "source": "v2", "target": "v3", "directed": "true", "minOffset": "5", "maxOffset": "20",
+                        "streamNum": "1", "attributes": {"label": "e3"}}]
+    return [{"id": "A", "track": "true", "probability": "0.6", "vertices": vertices[:2], "edges": edges1},
+            {"id": "B", "track": "true", "probability": "0.4", "vertices": vertices, "edges": edges2}]
+
+# Synthetic workloads of the benchmark suite, scaled by their fields:
+#   patterns: number of patterns
+#   size: number of vertices per pattern, joined in a cycle by as many edges (one edge if 2)
+#   probability: probability of each pattern per time unit
+#   spread: maximum offset of each edge
+#   old: fraction of the patterns whose first vertex is old
+#   streams: number of streams, over which the edges of each pattern are spread
+#   duration: number of time units
+#   triggerEngine, instanceEngine: parameters of the run
+#   format: outputFormat of the run, with formats separated by + rather than commas
+SUITE = [{"name": "baseline", "patterns": 10, "size": 3, "probability": 0.1, "spread": 10, "old": 0.0, "streams": 2, "duration": 100000},
+         {"name": "old-vertices", "patterns": 10, "size": 3, "probability": 0.1, "spread": 10, "old": 0.5, "streams": 2, "duration": 100000},
+         {"name": "large-patterns", "patterns": 10, "size": 10, "probability": 0.03, "spread": 10, "old": 0.0, "streams": 2, "duration": 100000},
+         {"name": "long-offsets", "patterns": 10, "size": 3, "probability": 0.1, "spread": 10000, "old": 0.0, "streams": 2, "duration": 100000},
+         {"name": "many-streams", "patterns": 10, "size": 3, "probability": 0.1, "spread": 10, "old": 0.0, "streams": 8, "duration": 100000},
+         {"name": "many-patterns", "patterns": 1000, "size": 3, "probability": 0.001, "spread": 10, "old": 0.0, "streams": 2, "duration": 100000}]
+WORKLOAD_DEFAULTS = {"triggerEngine": "bernoulli", "instanceEngine": "scalar", "format": "json"}
+
+# Return input file JSON data of a synthetic workload (see SUITE)
+def WorkloadJSON(workload):
+    patterns = []
+    numOld = round(workload["old"] * workload["patterns"])
+    numStreams = workload["streams"]
+    size = max(workload["size"], 2)
+    for patternNum in range(workload["patterns"]):
+        vertices = [{"id": "v" + str(vertexNum), "new": "true", "type": "t" + str(vertexNum % 5),
+                     "attributes": {"label": "v" + str(vertexNum), "weight": str(vertexNum)}} for vertexNum in range(size)]
+        edgeEnds = [(vertexNum, (vertexNum + 1) % size) for vertexNum in range(size if (size > 2) else 1)]
+        edgeStreamNums = [((patternNum + edgeNum) % numStreams) + 1 for edgeNum in range(len(edgeEnds))]
+        if (patternNum < numOld):
+            # All edges to an old vertex must be in the same stream
+            vertices[0]["new"] = "false"
+            edgeStreamNums[-1] = edgeStreamNums[0]
+        edges = [{"id": "e" + str(edgeNum), "source": "v" + str(source), "target": "v" + str(target), "directed": "true",
+                  "minOffset": "0", "maxOffset": str(workload["spread"]), "streamNum": str(streamNum),
+                  "attributes": {"label": "e" + str(edgeNum)}}
+                 for edgeNum,(source,target),streamNum in zip(range(len(edgeEnds)), edgeEnds, edgeStreamNums)]
+        patterns.append({"id": "P" + str(patternNum), "track": "true", "probability": str(workload["probability"]),
+                         "vertices": vertices, "edges": edges})
+    return {"numStreams": str(numStreams), "secondsPerUnitTime": "1", "startTime": "2017-01-01 00:00:00",
+            "duration": str(workload["duration"]), "outputTimeFormat": "units", "outputFilePrefix": "suite",
+            "triggerEngine": workload["triggerEngine"], "instanceEngine": workload["instanceEngine"],
+            "outputFormat": workload["format"].replace('+', ','), "seed": "0", "patterns": patterns}
+
+
+# ----- Memory Benchmark -----
+
+# Instance classes as they were before __slots__, for comparison
+class DictVertexInstance:
+    def __init__(self):
+        self.id = 0
+        self.type = None
+        self.attributes = []
+        self.streamCreationTimes = {}
+
+class DictEdgeInstance:
+    def __init__(self):
+        self.id = 0
+        self.source = 0
+        self.target = 0
+        self.directed = False
+        self.type = None
+        self.attributes = []
+        self.streamNum = 0
+        self.creationTime = 0
+
+# Schedule numInstances instances of pattern the way AddPatternInstance did with
+# dict-backed instances, returning the list of pending items.
+def ScheduleDictInstances(pattern, numInstances):
+    schedule = []
+    vertexId = 0
+    edgeId = 0
+    for instanceNum in range(numInstances):
+        vertexInstances = {}
+        for edge in pattern.edges:
+            edgeInstance = DictEdgeInstance()
+            edgeInstance.type = edge.type
+            edgeInstance.directed = edge.directed
+            edgeInstance.attributes = edge.attributes
+            edgeInstance.streamNum = edge.streamNum
+            edgeInstance.creationTime = random.randint(edge.minOffset, edge.maxOffset)
+            for endpoint in (edge.source, edge.target):
+                if endpoint not in vertexInstances:
+                    vertex = [v for v in pattern.vertices if (v.id == endpoint)][0]
+                    vertexInstance = DictVertexInstance()
+                    vertexInstance.type = vertex.type
+                    vertexInstance.attributes = vertex.attributes
+                    vertexId += 1
+                    vertexInstance.id = vertexId
+                    vertexInstances[endpoint] = vertexInstance
+                streamCreationTimes = vertexInstances[endpoint].streamCreationTimes
+                if ((edge.streamNum not in streamCreationTimes) or (edgeInstance.creationTime < streamCreationTimes[edge.streamNum])):
+                    streamCreationTimes[edge.streamNum] = edgeInstance.creationTime
+            edgeInstance.source = vertexInstances[edge.source].id
+            edgeInstance.target = vertexInstances[edge.target].id
+            edgeId += 1
+            edgeInstance.id = edgeId
+            schedule.append(edgeInstance)
+        for vertexInstance in vertexInstances.values():
+            for streamNum in vertexInstance.streamCreationTimes:
+                schedule.append(vertexInstance)
+    return schedule
+
+# Schedule numInstances instances of pattern with the generator's addPatternInstance,
+# returning the number of pending items.
+def ScheduleInstances(generator, pattern, numInstances):
+    with contextlib.redirect_stdout(io.StringIO()):
+        for instanceNum in range(numInstances):
+            generator.addPatternInstance(pattern, 0)
+    return sum([len(bucket) for schedule in generator.streamSchedules for bucket in schedule.values()])
+
+# Return (bytes allocated by function(*args) and still held, result of function)
+def MeasureMemory(function, *args):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+def BenchmarkMemory(numInstances):
+    parameters = Parameters()
+    parameters.numStreams = 2
+    pattern = ParsePatterns([MemoryPatternJSON()], parameters)[0]
+    generator = GraphStreamGenerator(parameters, [pattern], 0)
+    random.seed(0)
+    dictBytes, schedule = MeasureMemory(ScheduleDictInstances, pattern, numInstances)
+    numDictItems = len(schedule)
+    del schedule
+    slotsBytes, numItems = MeasureMemory(ScheduleInstances, generator, pattern, numInstances)
+    print('Pending items = ' + str(numItems) + ' (' + str(numInstances) + ' instances)')
+    print('  Dict-backed instances: ' + str(round(dictBytes / numDictItems, 1)) + ' bytes per pending item')
+    print('  Slotted instances: ' + str(round(slotsBytes / numItems, 1)) + ' bytes per pending item')
+
+
+# ----- Vector Benchmark -----
+
+# Return seconds to generate the run with instanceEngine, writing JSON stream files to
+# outputDir if given
+def TimeGeneration(jsonData, instanceEngine, outputDir = None):
+    parameters = Parameters()
+    parameters.parseFromJSON(jsonData)
+    parameters.instanceEngine = instanceEngine
+    with contextlib.redirect_stdout(io.StringIO()):
+        patterns = ParsePatterns(jsonData['patterns'], parameters)
+        startTime = time.perf_counter()
+        generator = CreateGenerator(parameters, patterns)
+        if (outputDir is None):
+            for timeUnit in generator.steps():
+                pass
+        else:
+            parameters.outputFilePrefix = os.path.join(outputDir, instanceEngine)
+            generator.generate()
+    return time.perf_counter() - startTime
+
+# Return number of pattern instances in the instances file of a run
+def NumInstances(outputFilePrefix):
+    with open(outputFilePrefix + '-insts') as instancesFile:
+        return sum([1 for line in instancesFile if line.startswith('  {"patternId"')])
+
+def BenchmarkVector(numInstances):
+    jsonData = {"numStreams": "2", "secondsPerUnitTime": "1", "startTime": "2017-01-01 00:00:00", "duration": str(numInstances),
+                "outputTimeFormat": "units", "outputFilePrefix": "vector", "triggerEngine": "skip", "seed": "0",
+                "patterns": VectorPatternsJSON()}
+    print('Duration = ' + str(numInstances) + ' time units')
+    with tempfile.TemporaryDirectory() as outputDir:
+        for instanceEngine in ("scalar", "vector"):
+            generationSeconds = TimeGeneration(jsonData, instanceEngine)
+            outputSeconds = TimeGeneration(jsonData, instanceEngine, outputDir)
+            instances = NumInstances(os.path.join(outputDir, instanceEngine))
+            print('  ' + instanceEngine.capitalize() + ' engine: ' + str(instances) + ' instances')
+            print('    Generation only: ' + str(round(generationSeconds, 2)) + ' seconds ('
+                  + str(round(instances / generationSeconds)) + ' instances/second)')
+            print('    With JSON output: ' + str(round(outputSeconds, 2)) + ' seconds ('
+                  + str(round(instances / outputSeconds)) + ' instances/second)')
+            if (instanceEngine == "scalar"):
+                scalarSeconds = (generationSeconds, outputSeconds)
+    print('  Speedup = ' + str(round(scalarSeconds[0] / generationSeconds, 2)) + ' generation only, '
+          + str(round(scalarSeconds[1] / outputSeconds, 2)) + ' with JSON output')
+
+
+# ----- Benchmark Suite -----
+
+# Phase of generation timed for each generator method. The time of a method is its
+# own, excluding that of the timed methods it calls. Phase "parsing" is the time to
+# read the input JSON and parse the patterns, and "other" the rest of the generation
+# time, mostly drawing triggers.
+PHASE_METHODS = {"addPatternInstance": "instantiation", "startVector": "instantiation",
+                 "schedulePatternInstance": "scheduling", "processStreamSchedules": "scheduling",
+                 "openFiles": "serialization", "closeFiles": "serialization", "writePatternInstance": "serialization",
+                 "writeVertexInstanceToStream": "serialization", "writeEdgeInstanceToStream": "serialization",
+                 "writeVectorStream": "serialization", "writeVectorInstances": "serialization"}
+PHASES = ["parsing", "instantiation", "scheduling", "serialization", "other"]
+
+# Return subclass of generator class generatorClass that accumulates the time of each
+# phase in phaseTimes
+def PhaseTimingClass(generatorClass):
+    def timedMethod(methodName, phase):
+        method = getattr(generatorClass, methodName)
+        def timed(self, *args):
+            startTime = time.perf_counter()
+            outerTime = self.nestedTime
+            self.nestedTime = 0.0
+            try:
+                return method(self, *args)
+            finally:
+                elapsed = time.perf_counter() - startTime
+                self.phaseTimes[phase] += elapsed - self.nestedTime
+                self.nestedTime = outerTime + elapsed
+        return timed
+    def openFiles(self, sinkStates = None):
+        self.phaseTimes = dict([(phase, 0.0) for phase in PHASES])
+        self.nestedTime = 0.0
+        methods["openFiles"](self, sinkStates)
+    methods = dict([(methodName, timedMethod(methodName, phase)) for methodName,phase in PHASE_METHODS.items() if hasattr(generatorClass, methodName)])
+    return type('PhaseTiming' + generatorClass.__name__, (generatorClass,), dict(methods, openFiles=openFiles))
+
+# Return peak resident memory of this process in bytes, or None if not available
+def PeakMemory():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if (sys.platform == 'darwin') else peak * 1024
+
+# Return results of running a workload (see SUITE) repeat times, in a fresh process
+# (see BenchmarkSuite) so that its peak memory is its own
+def RunWorkload(workload, repeat):
+    jsonText = json.dumps(WorkloadJSON(workload))
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), tempfile.TemporaryDirectory() as outputDir:
+        startTime = time.perf_counter()
+        jsonData = json.loads(jsonText)
+        parameters = Parameters()
+        parameters.parseFromJSON(jsonData)
+        parameters.outputFilePrefix = os.path.join(outputDir, 'suite')
+        patterns = ParsePatterns(jsonData['patterns'], parameters)
+        parsingSeconds = time.perf_counter() - startTime
+        # Best of repeat uninstrumented runs, then one run timing each phase
+        seconds = None
+        for runNum in range(repeat):
+            startTime = time.perf_counter()
+            CreateGenerator(parameters, patterns).generate()
+            runSeconds = time.perf_counter() - startTime
+            seconds = runSeconds if (seconds is None) else min(seconds, runSeconds)
+        peakMemory = PeakMemory()
+        generator = PhaseTimingClass(type(CreateGenerator(parameters, patterns)))(parameters, patterns)
+        startTime = time.perf_counter()
+        generator.generate()
+        timedSeconds = time.perf_counter() - startTime
+    phaseTimes = generator.phaseTimes
+    phaseTimes["parsing"] = parsingSeconds
+    phaseTimes["other"] = max(timedSeconds - sum([phaseTimes[phase] for phase in PHASES if (phase not in ("parsing", "other"))]), 0.0)
+    metrics = generator.metrics
+    numEvents = metrics.numItems()
+    numInstances = sum([counts[0] for counts in metrics.patternInstances.values()])
+    return {"seconds": round(seconds, 4),
+            "eventsPerSecond": round(numEvents / seconds, 1),
+            "instancesPerSecond": round(numInstances / seconds, 1),
+            "peakMemoryBytes": peakMemory,
+            "events": numEvents, "instances": numInstances,
+            "maxPendingEvents": metrics.maxPendingItems,
+            "phaseSeconds": dict([(phase, round(phaseTimes[phase], 4)) for phase in PHASES])}
+
+def RunWorkloadTask(task):
+    return RunWorkload(*task)
+
+# Return description of the environment of the results: date, versions and platform
+def Environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count()}
+
+def ParseSuiteArguments(argv):
+    parser = argparse.ArgumentParser(prog='gsgBenchmark.py suite', description='Benchmark GSG on synthetic workloads')
+    parser.add_argument('-workload', default=None, help='comma-separated names of workloads of the suite to run (default all)')
+    for field,valueType in (("patterns", int), ("size", int), ("probability", float), ("spread", int), ("old", float),
+                            ("streams", int), ("duration", int), ("triggerEngine", str), ("instanceEngine", str)):
+        parser.add_argument('-' + field, default=None, type=lambda text, valueType=valueType: [valueType(value) for value in text.split(',')],
+                            help='comma-separated values of workload field ' + field)
+    parser.add_argument('-format', default=None, type=lambda text: text.split(','),
+                        help='comma-separated output formats, several written at once joined by + (default json)')
+    parser.add_argument('-scale', type=float, default=1.0, help='factor by which to scale the duration of each workload (default 1)')
+    parser.add_argument('-repeat', type=int, default=1, help='number of timed runs of each workload, the fastest being reported (default 1)')
+    parser.add_argument('-output', default=None, help='file to which to append the results')
+    args = parser.parse_args(argv)
+    if ((args.scale <= 0) or (args.repeat < 1)):
+        parser.error('-scale and -repeat must be positive')
+    return args
+
+# Return list of workloads for the suite arguments
+def SuiteWorkloads(args):
+    workloads = SUITE
+    if (args.workload is not None):
+        names = args.workload.split(',')
+        workloads = [workload for workload in SUITE if (workload["name"] in names)]
+        if (len(workloads) < len(names)):
+            print('Error: unknown workload; workloads are ' + ', '.join([workload["name"] for workload in SUITE]))
+            sys.exit()
+    fields = [field for field in ("patterns", "size", "probability", "spread", "old", "streams", "duration",
+                                  "triggerEngine", "instanceEngine", "format") if (getattr(args, field) is not None)]
+    suiteWorkloads = []
+    for workload in workloads:
+        for values in itertools.product(*[getattr(args, field) for field in fields]):
+            suiteWorkload = dict(workload)
+            for field,value in WORKLOAD_DEFAULTS.items():
+                suiteWorkload.setdefault(field, value)
+            suiteWorkload.update(zip(fields, values))
+            suiteWorkload["duration"] = max(int(suiteWorkload["duration"] * args.scale), 1)
+            suiteWorkloads.append(suiteWorkload)
+    return suiteWorkloads
+
+# Run each workload in its own worker process, writing each result as a line of JSON
+def BenchmarkSuite(argv):
+    args = ParseSuiteArguments(argv)
+    workloads = SuiteWorkloads(args)
+    environment = Environment()
+    outputFile = open(args.output, 'a') if args.output else None
+    try:
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            for workload,results in zip(workloads, pool.imap(RunWorkloadTask, [(workload, args.repeat) for workload in workloads])):
+                line = json.dumps({"workload": workload, "results": results, "environment": environment})
+                print(line, flush=True)
+                if outputFile:
+                    outputFile.write(line + '\n')
+                    outputFile.flush()
+    finally:
+        if outputFile:
+            outputFile.close()
+
+def main():
+    if ((len(sys.argv) < 2) or (sys.argv[1] not in ('memory', 'vector', 'suite'))):
+        print('Usage: gsgBenchmark.py memory|vector [numInstances]')
+        print('       gsgBenchmark.py suite [options] (see -h)')
+        sys.exit()
+    if (sys.argv[1] == 'suite'):
+        BenchmarkSuite(sys.argv[2:])
+    elif (sys.argv[1] == 'memory'):
+        numInstances = 100000
+        if (len(sys.argv) > 2):
+            numInstances = int(sys.argv[2])
+        BenchmarkMemory(numInstances)
+    else:
+        numInstances = 1000000
+        if (len(sys.argv) > 2):
+            numInstances = int(sys.argv[2])
+        BenchmarkVector(numInstances)
+
+if __name__ == "__main__":
+    main()
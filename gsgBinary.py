@@ -0,0 +1,356 @@
+# gsgBinary.py
+#
+# Graph Stream Generator v1.0
+#
+# Binary columnar output format, and memory-mapped readers for it.
+#
+# A binary output file is a directory named after the output file plus ".columns"
+# (e.g., "out-s1.columns"), holding one file per column of fixed-width integers in
+# native byte order, and "columns.json" describing the columns and holding the
+# dictionaries the columns refer to.
+#
+# Stream columns (one entry per vertex or edge, in the order written, so in time order):
+#   time: time unit (int64)
+#   kind: 0 = vertex, 1 = undirected edge, 2 = directed edge (int8)
+#   id, source, target: vertex or edge id, and edge source and target ids; -1 for vertices (int64)
+#   type: index in the "types" list, or -1 if no type (int32)
+#   attributes: index in the "attributes" list of distinct attribute objects (int32)
+#
+# Instances columns:
+#   pattern: index in the "patterns" list of pattern ids (int32, one per instance)
+#   vertexEnd, edgeEnd: end of each instance's ids in vertexIds and edgeIds (int64, one per instance)
+#   vertexIds, edgeIds: ids of all instances, concatenated (int64)
+#
+# The readers map the column files into memory and expose each column as a NumPy
+# array if NumPy is installed, or else as a memoryview. Slices of either are views
+# of the files, so reading a time range does not copy or parse anything.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import os
+import sys
+import json
+import mmap
+import bisect
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+COLUMNS_EXTENSION = '.columns'
+COLUMNS_METADATA = 'columns.json'
+BINARY_FORMAT_VERSION = 1
+BINARY_BATCH_SIZE = 65536 # entries per column buffered between disk writes
+
+STREAM_COLUMNS = [('time', 'q'), ('kind', 'b'), ('id', 'q'), ('source', 'q'), ('target', 'q'), ('type', 'i'), ('attributes', 'i')]
+INSTANCES_COLUMNS = [('pattern', 'i'), ('vertexEnd', 'q'), ('edgeEnd', 'q'), ('vertexIds', 'q'), ('edgeIds', 'q')]
+
+VERTEX_KIND = 0
+UNDIRECTED_EDGE_KIND = 1
+DIRECTED_EDGE_KIND = 2
+
+
+# ----- Writing -----
+
+# Return NumPy dtype string of values of an array typecode in native byte order
+def ColumnDType(typecode):
+    if (sys.byteorder == 'little'):
+        return '<i' + str(array(typecode).itemsize)
+    return '>i' + str(array(typecode).itemsize)
+
+# Columns written to a directory, buffered in arrays and appended to the column files
+# in batches. Subclasses add the dictionaries to the metadata written by close().
+# If state (returned by checkpoint) is given, the columns are reopened to continue
+# after the entries written when they were checkpointed.
+class BinaryColumnsFile:
+    def __init__(self, fileName, columns, metadata = None, state = None):
+        self.directory = fileName + COLUMNS_EXTENSION
+        os.makedirs(self.directory, exist_ok=True)
+        self.columnSpecs = columns # list of (name, typecode)
+        self.columns = [array(typecode) for name,typecode in columns]
+        self.metadata = dict(metadata or {})
+        self.numEntries = 0 # number of entries (vertices and edges, or instances) written
+        if (state is None):
+            self.files = [open(os.path.join(self.directory, name), 'wb') for name,typecode in columns]
+        else:
+            self.files = []
+            for (name,typecode),size in zip(columns, state['sizes']):
+                columnFile = open(os.path.join(self.directory, name), 'r+b')
+                columnFile.truncate(size)
+                columnFile.seek(size)
+                self.files.append(columnFile)
+            self.numEntries = state['numEntries']
+
+    # Append buffered column values to the column files
+    def flush(self):
+        for columnNum in range(len(self.columns)):
+            self.columns[columnNum].tofile(self.files[columnNum])
+            del self.columns[columnNum][:]
+
+    # Return state for reopening the columns after the entries written so far, which
+    # are first flushed to disk
+    def checkpoint(self):
+        self.flush()
+        sizes = []
+        for columnFile in self.files:
+            columnFile.flush()
+            os.fsync(columnFile.fileno())
+            sizes.append(columnFile.tell())
+        return {'sizes': sizes, 'numEntries': self.numEntries}
+
+    def close(self):
+        self.flush()
+        for columnFile in self.files:
+            columnFile.close()
+        self.metadata['format'] = 'gsg-columns'
+        self.metadata['version'] = BINARY_FORMAT_VERSION
+        self.metadata['byteorder'] = sys.byteorder
+        self.metadata['numEntries'] = self.numEntries
+        self.metadata['columns'] = [{'name': name, 'typecode': typecode, 'dtype': ColumnDType(typecode)}
+                                    for name,typecode in self.columnSpecs]
+        with open(os.path.join(self.directory, COLUMNS_METADATA), 'w') as metadataFile:
+            json.dump(self.metadata, metadataFile, indent=2, ensure_ascii=False)
+            metadataFile.write('\n')
+
+# Binary stream file. Types and attribute objects are dictionary-encoded; the codes of
+# each pattern vertex or edge are looked up once and then kept by element.
+class BinaryStreamFile(BinaryColumnsFile):
+    def __init__(self, fileName, metadata = None, state = None):
+        BinaryColumnsFile.__init__(self, fileName, STREAM_COLUMNS, metadata, state)
+        self.types = [] # list of distinct type strings
+        self.typeCodes = {} # {type: index in types}
+        self.attributes = [] # list of distinct attribute dictionaries
+        self.attributeCodes = {} # {attributes as JSON: index in attributes}
+        self.elementCodes = {} # {Vertex or Edge class object: (kind, type code, attributes code)}
+        if (state is not None):
+            self.types = list(state['types'])
+            self.typeCodes = {self.types[typeCode]: typeCode for typeCode in range(len(self.types))}
+            self.attributes = list(state['attributes'])
+            self.attributeCodes = {json.dumps(self.attributes[attributesCode], sort_keys=True): attributesCode for attributesCode in range(len(self.attributes))}
+
+    def writeVertex(self, timeUnit, vertexId, vertex):
+        codes = self.elementCodes.get(vertex)
+        if (codes is None):
+            codes = self.addElement(vertex, VERTEX_KIND)
+        self.writeEntry(timeUnit, codes, vertexId, -1, -1)
+
+    def writeEdge(self, timeUnit, edgeId, source, target, edge):
+        codes = self.elementCodes.get(edge)
+        if (codes is None):
+            if edge.directed:
+                codes = self.addElement(edge, DIRECTED_EDGE_KIND)
+            else:
+                codes = self.addElement(edge, UNDIRECTED_EDGE_KIND)
+        self.writeEntry(timeUnit, codes, edgeId, source, target)
+
+    def writeEntry(self, timeUnit, codes, itemId, source, target):
+        columns = self.columns
+        columns[0].append(timeUnit)
+        columns[1].append(codes[0])
+        columns[2].append(int(itemId))
+        columns[3].append(int(source))
+        columns[4].append(int(target))
+        columns[5].append(codes[1])
+        columns[6].append(codes[2])
+        self.numEntries += 1
+        if (len(columns[0]) >= BINARY_BATCH_SIZE):
+            self.flush()
+
+    # Return and remember (kind, type code, attributes code) of a pattern vertex or edge
+    def addElement(self, element, kind):
+        typeCode = -1
+        if element.type:
+            typeCode = self.typeCodes.setdefault(element.type, len(self.types))
+            if (typeCode == len(self.types)):
+                self.types.append(element.type)
+        attributesKey = json.dumps(element.attributes, sort_keys=True)
+        attributesCode = self.attributeCodes.setdefault(attributesKey, len(self.attributes))
+        if (attributesCode == len(self.attributes)):
+            self.attributes.append(element.attributes)
+        codes = (kind, typeCode, attributesCode)
+        self.elementCodes[element] = codes
+        return codes
+
+    def checkpoint(self):
+        state = BinaryColumnsFile.checkpoint(self)
+        state['types'] = list(self.types)
+        state['attributes'] = list(self.attributes)
+        return state
+
+    def close(self):
+        self.metadata['types'] = self.types
+        self.metadata['attributes'] = self.attributes
+        BinaryColumnsFile.close(self)
+
+# Binary instances file, with pattern ids dictionary-encoded
+class BinaryInstancesFile(BinaryColumnsFile):
+    def __init__(self, fileName, metadata = None, state = None):
+        BinaryColumnsFile.__init__(self, fileName, INSTANCES_COLUMNS, metadata, state)
+        self.patterns = [] # list of distinct pattern ids
+        self.patternCodes = {} # {pattern id: index in patterns}
+        self.numVertexIds = 0
+        self.numEdgeIds = 0
+        if (state is not None):
+            self.patterns = list(state['patterns'])
+            self.patternCodes = {self.patterns[patternCode]: patternCode for patternCode in range(len(self.patterns))}
+            self.numVertexIds = state['numVertexIds']
+            self.numEdgeIds = state['numEdgeIds']
+
+    def writeInstance(self, patternId, vertexIds, edgeIds):
+        patternCode = self.patternCodes.setdefault(patternId, len(self.patterns))
+        if (patternCode == len(self.patterns)):
+            self.patterns.append(patternId)
+        columns = self.columns
+        self.numVertexIds += len(vertexIds)
+        self.numEdgeIds += len(edgeIds)
+        columns[0].append(patternCode)
+        columns[1].append(self.numVertexIds)
+        columns[2].append(self.numEdgeIds)
+        columns[3].extend([int(vertexId) for vertexId in vertexIds])
+        columns[4].extend([int(edgeId) for edgeId in edgeIds])
+        self.numEntries += 1
+        if (len(columns[3]) >= BINARY_BATCH_SIZE):
+            self.flush()
+
+    def checkpoint(self):
+        state = BinaryColumnsFile.checkpoint(self)
+        state['patterns'] = list(self.patterns)
+        state['numVertexIds'] = self.numVertexIds
+        state['numEdgeIds'] = self.numEdgeIds
+        return state
+
+    def close(self):
+        self.metadata['patterns'] = self.patterns
+        BinaryColumnsFile.close(self)
+
+
+# ----- Reading -----
+
+# Columns of a binary output file mapped into memory. columns[name] is a NumPy array
+# if NumPy is installed, or else a memoryview (which requires native byte order).
+class BinaryColumns:
+    def __init__(self, fileName):
+        self.directory = fileName + COLUMNS_EXTENSION
+        with open(os.path.join(self.directory, COLUMNS_METADATA)) as metadataFile:
+            self.metadata = json.load(metadataFile)
+        if ((numpy is None) and (self.metadata['byteorder'] != sys.byteorder)):
+            raise ValueError(self.directory + ' has ' + self.metadata['byteorder'] + ' byte order; reading it requires NumPy')
+        self.columns = {}
+        for column in self.metadata['columns']:
+            self.columns[column['name']] = self.mapColumn(column)
+
+    def mapColumn(self, column):
+        with open(os.path.join(self.directory, column['name']), 'rb') as columnFile:
+            if (os.fstat(columnFile.fileno()).st_size == 0):
+                buffer = b'' # empty files cannot be mapped
+            else:
+                buffer = mmap.mmap(columnFile.fileno(), 0, access=mmap.ACCESS_READ)
+        if numpy is not None:
+            return numpy.frombuffer(buffer, dtype=column['dtype'])
+        return memoryview(buffer).cast(column['typecode'])
+
+    def __len__(self):
+        return self.metadata['numEntries']
+
+# Memory-mapped binary stream file, e.g., BinaryStream("out-s1")
+class BinaryStream(BinaryColumns):
+    def __init__(self, fileName):
+        BinaryColumns.__init__(self, fileName)
+        self.types = self.metadata['types']
+        self.attributes = self.metadata['attributes']
+
+    # Return slice of the entries with firstTimeUnit <= time <= lastTimeUnit
+    def timeRange(self, firstTimeUnit, lastTimeUnit):
+        time = self.columns['time']
+        if numpy is not None:
+            return slice(int(numpy.searchsorted(time, firstTimeUnit, 'left')), int(numpy.searchsorted(time, lastTimeUnit, 'right')))
+        return slice(bisect.bisect_left(time, firstTimeUnit), bisect.bisect_right(time, lastTimeUnit))
+
+    # Return {column name: view of column} for the entries with firstTimeUnit <= time <= lastTimeUnit
+    def columnsInTimeRange(self, firstTimeUnit, lastTimeUnit):
+        entries = self.timeRange(firstTimeUnit, lastTimeUnit)
+        return {name: column[entries] for name,column in self.columns.items()}
+
+    # Return entry as an item of a JSON stream file, with its time unit for the timestamp
+    def item(self, index):
+        columns = self.columns
+        kind = int(columns['kind'][index])
+        item = {'id': str(int(columns['id'][index]))}
+        if (kind != VERTEX_KIND):
+            item['source'] = str(int(columns['source'][index]))
+            item['target'] = str(int(columns['target'][index]))
+        typeCode = int(columns['type'][index])
+        if (typeCode >= 0):
+            item['type'] = self.types[typeCode]
+        item['attributes'] = self.attributes[int(columns['attributes'][index])]
+        if (kind == DIRECTED_EDGE_KIND):
+            item['directed'] = 'true'
+        elif (kind == UNDIRECTED_EDGE_KIND):
+            item['directed'] = 'false'
+        item['timestamp'] = int(columns['time'][index])
+        if (kind == VERTEX_KIND):
+            return {'vertex': item}
+        return {'edge': item}
+
+# Memory-mapped binary instances file, e.g., BinaryInstances("out-insts")
+class BinaryInstances(BinaryColumns):
+    def __init__(self, fileName):
+        BinaryColumns.__init__(self, fileName)
+        self.patterns = self.metadata['patterns']
+        self.patternCodes = {self.patterns[patternCode]: patternCode for patternCode in range(len(self.patterns))}
+        self.patternInstances = None # index of instances by pattern code, built when first used (see indexPatterns)
+
+    def patternId(self, index):
+        return self.patterns[int(self.columns['pattern'][index])]
+
+    # Return view of the vertex ids of an instance
+    def vertexIds(self, index):
+        return self.columns['vertexIds'][self.idsStart('vertexEnd', index):int(self.columns['vertexEnd'][index])]
+
+    # Return view of the edge ids of an instance
+    def edgeIds(self, index):
+        return self.columns['edgeIds'][self.idsStart('edgeEnd', index):int(self.columns['edgeEnd'][index])]
+
+    def idsStart(self, endColumn, index):
+        if (index == 0):
+            return 0
+        return int(self.columns[endColumn][index-1])
+
+    # Return list of indices of the instances of a pattern. The first call builds the
+    # index of every pattern's instances in a pass over the pattern column, taking time
+    # linear in the number of instances; each call then takes time linear in the number
+    # of instances returned. Instances are not indexed by vertex or edge id, so finding
+    # those having an id means scanning the id columns; the "sqlite" output format
+    # indexes them (see gsgTruth.py).
+    def instancesOfPattern(self, patternId):
+        patternCode = self.patternCodes.get(patternId)
+        if (patternCode is None):
+            return []
+        if (self.patternInstances is None):
+            self.patternInstances = self.indexPatterns()
+        return self.patternInstances[patternCode].tolist()
+
+    # Return list, by pattern code, of the indices of the pattern's instances in order (a
+    # NumPy array or array). With NumPy, these are views of a single array of the
+    # instance indices ordered by pattern, at the offsets given by the patterns' counts.
+    def indexPatterns(self):
+        patterns = self.columns['pattern']
+        if numpy is not None:
+            order = numpy.argsort(patterns, kind='stable')
+            ends = numpy.cumsum(numpy.bincount(patterns, minlength=len(self.patterns)))
+            starts = numpy.concatenate(([0], ends[:-1]))
+            return [order[starts[patternCode]:ends[patternCode]] for patternCode in range(len(self.patterns))]
+        patternInstances = [array('q') for patternCode in range(len(self.patterns))]
+        for index,patternCode in enumerate(patterns):
+            patternInstances[patternCode].append(index)
+        return patternInstances
+
+    # Return instance as an item of a JSON instances file
+    def instance(self, index):
+        return {'patternId': self.patternId(index),
+                'vertexIds': [str(int(vertexId)) for vertexId in self.vertexIds(index)],
+                'edgeIds': [str(int(edgeId)) for edgeId in self.edgeIds(index)]}
@@ -8,7 +8,13 @@
 #
 # Copyright (c) 2017, Washington State University.
 
+import sys
+import random
+import importlib.util
+from array import array
+from collections import namedtuple
 from datetime import datetime
+from gsgOutput import COMPRESSIONS, SINKS, JSONString
 
 class Parameters:
     def __init__(self):
@@ -18,6 +24,21 @@ class Parameters:
         self.duration = 100
         self.outputTimeFormat = "units"
         self.outputFilePrefix = "out"
+        self.oldVertexPoolSize = 0 # maximum old vertices kept per stream for reuse; 0 means unlimited
+        self.oldVertexPoolPolicy = "recent" # which vertices kept once pool full: "recent" or "reservoir"
+        self.triggerEngine = "bernoulli" # how pattern triggers are sampled: "bernoulli" (per time unit) or "skip" (gap to next trigger)
+        self.instanceEngine = "scalar" # how instances are generated: "scalar" (one at a time) or "vector" (with NumPy, see gsgVector.py)
+        self.seed = None # random seed; None means seeded from the operating system
+        self.outputThreads = 0 # number of background threads writing output files; 0 means written by generator
+        self.outputFormats = ["json"] # formats written, each a sink name in gsgOutput.SINKS: "json", "jsonl", "binary", "graphml", "gexf", "csv", "sqlite" or "shm"
+        self.outputCompression = "none" # compression of output files: "none" or a name in gsgOutput.COMPRESSIONS
+        self.segmentSize = 0 # start new stream file segment after this many characters; 0 means no limit
+        self.segmentDuration = 0 # start new stream file segment every this many time units; 0 means no limit
+        self.compressionThreads = 1 # number of threads compressing full segments
+        self.checkpointInterval = 0 # seconds between checkpoints of generation (see GraphStreamGenerator.saveCheckpoint); 0 means none
+        self.progressInterval = 0 # seconds between progress messages during generation (see gsgMetrics.py); 0 means none
+        self.ringSize = 65536 # records per stream of the shared-memory ring buffers of the "shm" output format (see gsgSharedMemory.py)
+        self.ringTimeout = 60 # seconds to wait for a consumer to attach to each ring buffer; 0 means forever
     
     def parseFromJSON(self,jsonData):
         self.numStreams = int(jsonData['numStreams'])
@@ -26,6 +47,105 @@ class Parameters:
         self.duration = int(jsonData['duration'])
         self.outputTimeFormat = jsonData['outputTimeFormat']
         self.outputFilePrefix = jsonData['outputFilePrefix']
+        if 'oldVertexPoolSize' in jsonData:
+            self.oldVertexPoolSize = int(jsonData['oldVertexPoolSize'])
+            if (self.oldVertexPoolSize < 0):
+                print("Error: oldVertexPoolSize must be non-negative")
+                sys.exit()
+        if 'oldVertexPoolPolicy' in jsonData:
+            self.oldVertexPoolPolicy = jsonData['oldVertexPoolPolicy']
+            if (self.oldVertexPoolPolicy not in ("recent", "reservoir")):
+                print("Error: oldVertexPoolPolicy must be \"recent\" or \"reservoir\"")
+                sys.exit()
+        if 'triggerEngine' in jsonData:
+            self.triggerEngine = jsonData['triggerEngine']
+            if (self.triggerEngine not in ("bernoulli", "skip")):
+                print("Error: triggerEngine must be \"bernoulli\" or \"skip\"")
+                sys.exit()
+        if 'instanceEngine' in jsonData:
+            self.instanceEngine = jsonData['instanceEngine']
+            if (self.instanceEngine not in ("scalar", "vector")):
+                print("Error: instanceEngine must be \"scalar\" or \"vector\"")
+                sys.exit()
+            if ((self.instanceEngine == "vector") and (importlib.util.find_spec("numpy") is None)):
+                print("Error: instanceEngine \"vector\" requires NumPy")
+                sys.exit()
+        if 'seed' in jsonData:
+            self.seed = int(jsonData['seed'])
+        if 'outputThreads' in jsonData:
+            self.outputThreads = int(jsonData['outputThreads'])
+            if (self.outputThreads < 0):
+                print("Error: outputThreads must be non-negative")
+                sys.exit()
+        if 'outputFormat' in jsonData:
+            self.setOutputFormats(jsonData['outputFormat'])
+        if 'outputCompression' in jsonData:
+            self.outputCompression = jsonData['outputCompression']
+            if ((self.outputCompression != "none") and (self.outputCompression not in COMPRESSIONS)):
+                print("Error: outputCompression must be \"none\" or one of " + ', '.join(['"' + name + '"' for name in COMPRESSIONS]))
+                sys.exit()
+        if 'segmentSize' in jsonData:
+            self.segmentSize = int(jsonData['segmentSize'])
+            if (self.segmentSize < 0):
+                print("Error: segmentSize must be non-negative")
+                sys.exit()
+        if 'segmentDuration' in jsonData:
+            self.segmentDuration = int(jsonData['segmentDuration'])
+            if (self.segmentDuration < 0):
+                print("Error: segmentDuration must be non-negative")
+                sys.exit()
+        if 'compressionThreads' in jsonData:
+            self.compressionThreads = int(jsonData['compressionThreads'])
+            if (self.compressionThreads < 1):
+                print("Error: compressionThreads must be positive")
+                sys.exit()
+        if 'checkpointInterval' in jsonData:
+            self.checkpointInterval = float(jsonData['checkpointInterval'])
+            if (self.checkpointInterval < 0):
+                print("Error: checkpointInterval must be non-negative")
+                sys.exit()
+        if 'progressInterval' in jsonData:
+            self.progressInterval = float(jsonData['progressInterval'])
+            if (self.progressInterval < 0):
+                print("Error: progressInterval must be non-negative")
+                sys.exit()
+        if 'ringSize' in jsonData:
+            self.ringSize = int(jsonData['ringSize'])
+            if (self.ringSize < 1):
+                print("Error: ringSize must be positive")
+                sys.exit()
+        if 'ringTimeout' in jsonData:
+            self.ringTimeout = float(jsonData['ringTimeout'])
+            if (self.ringTimeout < 0):
+                print("Error: ringTimeout must be non-negative")
+                sys.exit()
+        self.checkCheckpoints()
+    
+    # Set outputFormats from a list of format names, or a string of comma-separated names
+    def setOutputFormats(self, outputFormats):
+        if isinstance(outputFormats, str):
+            outputFormats = outputFormats.split(',')
+        self.outputFormats = [outputFormat.strip() for outputFormat in outputFormats]
+        for outputFormat in self.outputFormats:
+            if (outputFormat not in SINKS):
+                print("Error: outputFormat must be one or more of " + ', '.join(['"' + name + '"' for name in SINKS]))
+                sys.exit()
+        if ((not self.outputFormats) or (len(set(self.outputFormats)) < len(self.outputFormats))):
+            print("Error: outputFormat must name one or more different formats")
+            sys.exit()
+        if (("json" in self.outputFormats) and ("jsonl" in self.outputFormats)):
+            print("Error: outputFormat cannot include both \"json\" and \"jsonl\" (same file names)")
+            sys.exit()
+
+    # Exit if checkpoints are taken but an output format cannot be checkpointed
+    # (checked again once command-line options override the input file)
+    def checkCheckpoints(self):
+        if (self.checkpointInterval > 0):
+            for outputFormat in self.outputFormats:
+                if (not SINKS[outputFormat].CHECKPOINTS):
+                    print("Error: checkpointInterval requires output formats that can be checkpointed: " +
+                          ', '.join(['"' + name + '"' for name in SINKS if SINKS[name].CHECKPOINTS]))
+                    sys.exit()
     
     def prettyprint(self, tab = ''):
         print(tab + 'Parameters:')
@@ -34,6 +154,26 @@ class Parameters:
         print(tab + '  Start time = ' + self.startTime.strftime('%Y-%m-%d %H:%M:%S'))
         print(tab + '  Duration = ' + str(self.duration))
         print(tab + '  Output time format = ' + self.outputTimeFormat)
+        print(tab + '  Trigger engine = ' + self.triggerEngine)
+        if (self.instanceEngine != "scalar"):
+            print(tab + '  Instance engine = ' + self.instanceEngine)
+        if (self.seed is not None):
+            print(tab + '  Seed = ' + str(self.seed))
+        if (self.oldVertexPoolSize > 0):
+            print(tab + '  Old vertex pool = ' + str(self.oldVertexPoolSize) + ' (' + self.oldVertexPoolPolicy + ')')
+        if (self.outputFormats != ["json"]):
+            print(tab + '  Output format = ' + ','.join(self.outputFormats))
+        if (self.outputCompression != "none"):
+            print(tab + '  Output compression = ' + self.outputCompression)
+        if ((self.segmentSize > 0) or (self.segmentDuration > 0)):
+            print(tab + '  Segment size = ' + str(self.segmentSize) + ', segment duration = ' + str(self.segmentDuration))
+        if (self.checkpointInterval > 0):
+            print(tab + '  Checkpoint interval = ' + str(self.checkpointInterval) + ' seconds')
+        if (self.progressInterval > 0):
+            print(tab + '  Progress interval = ' + str(self.progressInterval) + ' seconds')
+        if ("shm" in self.outputFormats):
+            print(tab + '  Ring size = ' + str(self.ringSize))
+            print(tab + '  Ring timeout = ' + str(self.ringTimeout) + ' seconds')
         print(tab + '  Output file prefix = ' + self.outputFilePrefix + '\n')
 
 class Pattern:
@@ -43,6 +183,7 @@ class Pattern:
         self.probability = 0.0
         self.vertices = [] # list of Vertex class objects
         self.edges = [] # list of Edge class objects
+        self.compiled = None # CompiledPattern class object, set after parsing
     
     def prettyprint(self, tab = ''):
         print(tab + 'Pattern:')
@@ -67,6 +208,8 @@ class Vertex:
         self.new = True
         self.type = None
         self.attributes = {} # dictionary
+        self.streamJSON = "" # constant lines of an instance's JSON in stream files, set when compiled
+        self.streamLineJSON = "" # constant part of an instance's line in JSON Lines stream files, set when compiled
     
     def prettyprint(self, tab = ''):
         print(tab + 'Vertex:')
@@ -91,6 +234,8 @@ class Edge:
         self.maxOffset = 0
         self.streamNum = 1
         self.attributes = {} # dictionary
+        self.streamJSON = "" # constant lines of an instance's JSON in stream files, set when compiled
+        self.streamLineJSON = "" # constant part of an instance's line in JSON Lines stream files, set when compiled
     
     def prettyprint(self, tab = ''):
         print(tab + 'Edge:')
@@ -109,29 +254,124 @@ class Edge:
         attrStr = DictToString(self.attributes)
         print(tab + '  attributes = ' + attrStr)
 
+# Index-based form of a Pattern used when adding instances. Vertices are referred to
+# by their index in the pattern's vertex list, and edge e's properties are at index e
+# of the edge arrays.
+class CompiledPattern:
+    def __init__(self):
+        self.vertices = [] # list of Vertex class objects, in pattern order
+        self.vertexNew = [] # vertexNew[v] = True if vertex v is new
+        self.edges = [] # list of Edge class objects, in pattern order
+        self.edgeSources = [] # edgeSources[e] = index of source vertex of edge e
+        self.edgeTargets = [] # edgeTargets[e] = index of target vertex of edge e
+        self.edgeMinOffsets = []
+        self.edgeMaxOffsets = []
+        self.edgeStreamNums = []
+        self.streamVertices = {} # dictionary {streamNum: set of indices of vertices incident to an edge in stream}
+
+# Instances use __slots__ and refer to the pattern vertex or edge they came from for
+# type, attributes, etc., since many instances may be pending at once.
+
 class PatternInstance:
+    __slots__ = ('id', 'vertices', 'edges')
+    
     def __init__(self):
         self.id = ""
         self.vertices = [] # list of VertexInstance class objects
         self.edges = [] # list of EdgeInstance class objects
 
 class VertexInstance:
-    def __init__(self):
+    __slots__ = ('id', 'vertex', 'streamCreationTimes')
+    
+    def __init__(self, vertex = None):
         self.id = 0
-        self.type = None
-        self.attributes = []
-        self.streamCreationTimes = {} # dictionary with entries {streamNum: creationTime} in time units; one for each stream needing new vertex (empty means exists)
+        self.vertex = vertex # Vertex class object this is an instance of
+        self.streamCreationTimes = {} # dictionary with entries {streamNum: creationTime} in time units; one for each stream needing new vertex (empty means exists); None once scheduled
+    
+    @property
+    def type(self):
+        return self.vertex.type
+    
+    @property
+    def attributes(self):
+        return self.vertex.attributes
 
 class EdgeInstance:
-    def __init__(self):
+    __slots__ = ('id', 'edge', 'source', 'target', 'creationTime')
+    
+    def __init__(self, edge = None):
         self.id = 0
+        self.edge = edge # Edge class object this is an instance of
         self.source = 0
         self.target = 0
-        self.directed = False
-        self.type = None
-        self.attributes = []
-        self.streamNum = 0
         self.creationTime = 0 # in time units
+    
+    @property
+    def type(self):
+        return self.edge.type
+    
+    @property
+    def directed(self):
+        return self.edge.directed
+    
+    @property
+    def attributes(self):
+        return self.edge.attributes
+    
+    @property
+    def streamNum(self):
+        return self.edge.streamNum
+
+# A vertex or edge written to a stream. For vertices, source, target and directed are None.
+Event = namedtuple('Event', ['timeUnit', 'timestamp', 'streamNum', 'kind', 'id', 'source', 'target', 'type', 'attributes', 'directed'])
+
+# Ids of vertices already written to one stream, from which old vertices are drawn.
+# Ids are kept in a compact integer array. If maxSize > 0, the pool is bounded: the
+# "recent" policy keeps the last maxSize vertices written, and the "reservoir" policy
+# keeps a uniform random sample of all vertices written so far.
+class VertexPool:
+    def __init__(self, maxSize = 0, policy = "recent", rng = random):
+        self.ids = array('q')
+        self.maxSize = maxSize
+        self.policy = policy
+        self.rng = rng
+        self.numAdded = 0 # total vertices ever added
+        self.nextSlot = 0 # slot overwritten next by "recent" policy once full
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def add(self, vertexId):
+        self.numAdded += 1
+        if ((self.maxSize == 0) or (len(self.ids) < self.maxSize)):
+            self.ids.append(vertexId)
+        elif (self.policy == "reservoir"):
+            slot = self.rng.randint(0, self.numAdded-1)
+            if (slot < self.maxSize):
+                self.ids[slot] = vertexId
+        else:
+            self.ids[self.nextSlot] = vertexId
+            self.nextSlot += 1
+            if (self.nextSlot == self.maxSize):
+                self.nextSlot = 0
+    
+    # Return random vertex id not in the set excludeIds, or 0 if none exists.
+    # Ids in the pool are unique, so at most len(excludeIds)+1 slots are probed.
+    def sample(self, excludeIds):
+        ids = self.ids
+        numIds = len(ids)
+        if (numIds > 0):
+            # Get a random starting point
+            index = self.rng.randint(0,numIds-1)
+            for numTries in range(numIds):
+                # Keep incrementing from random starting point until non-used vertex id found, or tried them all
+                vertexId = ids[index]
+                if (vertexId not in excludeIds):
+                    return vertexId
+                index += 1
+                if (index == numIds):
+                    index = 0
+        return 0
         
         
 # ----- Class Utility Functions -----
@@ -158,6 +398,6 @@ def DictToJSONString(dict):
                 first = False
             else:
                 dictStr += ', '
-            dictStr += ('"' + str(key) + '": "' + str(value) + '"')
+            dictStr += (JSONString(key) + ': ' + JSONString(value))
     dictStr += '}'
     return dictStr
@@ -0,0 +1,373 @@
+# gsgEstimate.py
+#
+# Graph Stream Generator v1.0
+#
+# Dry-run estimates of a run's output volume, memory and runtime (gsg.py -dryrun).
+#
+# The expected number of vertices and edges written to each stream, and of instances
+# written to the instances file, follow from each pattern's probability: a pattern is
+# triggered probability * duration times, and each instance writes the pattern's
+# edges in their streams, and each new vertex once in each stream having one of its
+# edges. (Patterns with old vertices may add fewer instances early in the run, while
+# there are not yet enough old vertices.)
+#
+# The number of vertices and edges pending (scheduled but not yet written) is computed
+# from the offset windows: an edge is pending for its offset, and a new vertex for the
+# smallest offset of its edges in the stream, so an instance triggered a time units
+# ago still has X(a) items pending, where P(item pending) is the product of
+# P(offset > a) over the item's edges. Summing over the instances of the last
+# time units gives the expected number pending and its variance, from which the peak
+# over the run is estimated (see PendingItems).
+#
+# The bytes per vertex or edge of each output format, the bytes per pending item in
+# memory and the time per item are measured by short sample runs, written to a
+# temporary directory, with ids and timestamps offset to those in the middle of the
+# run so that they are as long as on average. The totals are these times the
+# expected numbers.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import os
+import json
+import math
+import time
+import copy
+import logging
+import tempfile
+import tracemalloc
+from gsgClasses import *
+from gsgGenerator import *
+from gsgOutput import SINKS
+from gsgVector import CreateGenerator, Vectorizable
+
+SAMPLE_ITEMS = 50000 # vertices and edges expected in the sample run timing generation, if duration allows
+SIZE_SAMPLE_ITEMS = 10000 # vertices and edges expected in the sample run of each output format
+MAX_SAMPLE_DURATION = 1000000 # time units
+MAX_PENDING_STEPS = 2000 # ages a at which pending items are summed; beyond, a is sampled evenly
+MEMORY_SAMPLE_INSTANCES = 200 # instances of each pattern scheduled to measure bytes per pending item
+VECTOR_ITEM_BYTES = 40 # bytes of the arrays per vectorized vertex or edge (see gsgVector.VectorInstances)
+POOL_ID_BYTES = 8 # bytes per vertex id in an old vertex pool (see gsgClasses.VertexPool)
+
+
+# ----- Expected Counts -----
+
+# Return list of (streamNum, set of edge indices) for each vertex and edge an instance
+# of a compiled pattern writes: an edge is written at its own offset, and a new vertex
+# in a stream at the smallest offset of its edges in the stream
+def InstanceItems(compiled):
+    items = [(streamNum, frozenset([edgeIndex])) for edgeIndex,streamNum in enumerate(compiled.edgeStreamNums)]
+    for streamNum,vertexIndices in sorted(compiled.streamVertices.items()):
+        for vertexIndex in sorted(vertexIndices):
+            if compiled.vertexNew[vertexIndex]:
+                items.append((streamNum, frozenset([edgeIndex for edgeIndex in range(len(compiled.edges))
+                                                    if ((compiled.edgeStreamNums[edgeIndex] == streamNum) and
+                                                        (vertexIndex in (compiled.edgeSources[edgeIndex], compiled.edgeTargets[edgeIndex])))])))
+    return items
+
+# Return list of expected number of vertices and edges written to each stream
+def ExpectedStreamItems(parameters, patterns):
+    streamItems = [0.0] * parameters.numStreams
+    for pattern in patterns:
+        for streamNum,edgeIndices in InstanceItems(pattern.compiled):
+            streamItems[streamNum-1] += pattern.probability * parameters.duration
+    return streamItems
+
+def ExpectedInstances(parameters, patterns):
+    return sum([pattern.probability * parameters.duration for pattern in patterns])
+
+
+# ----- Pending Items -----
+
+# Return P(offset > age) for an offset drawn uniformly from [minOffset, maxOffset]
+def OffsetSurvival(minOffset, maxOffset, age):
+    if (age < minOffset):
+        return 1.0
+    if (age >= maxOffset):
+        return 0.0
+    return (maxOffset - age) / (maxOffset - minOffset + 1)
+
+# Return (mean, variance) of the number of vertices and edges of pattern pending at a
+# time, once the run is longer than its offsets (or after duration time units)
+def PatternPending(pattern, duration):
+    compiled = pattern.compiled
+    probability = pattern.probability
+    # Items with the same edges are pending together, so count the distinct sets
+    itemSets = {} # {set of edge indices: number of items}
+    for streamNum,edgeIndices in InstanceItems(compiled):
+        itemSets[edgeIndices] = itemSets.get(edgeIndices, 0) + 1
+    pairSets = {} # {union of the edge sets of a pair of items: number of pairs}
+    for edgeIndices1,count1 in itemSets.items():
+        for edgeIndices2,count2 in itemSets.items():
+            union = edgeIndices1 | edgeIndices2
+            pairSets[union] = pairSets.get(union, 0) + count1 * count2
+    maxAge = min(max(compiled.edgeMaxOffsets + [0]), duration - 1)
+    step = max(1, math.ceil((maxAge + 1) / MAX_PENDING_STEPS))
+    mean = 0.0
+    variance = 0.0
+    for age in range(0, maxAge + 1, step):
+        survival = [OffsetSurvival(minOffset, maxOffset, age) for minOffset,maxOffset in zip(compiled.edgeMinOffsets, compiled.edgeMaxOffsets)]
+        pending = sum([count * math.prod([survival[edgeIndex] for edgeIndex in edgeIndices]) for edgeIndices,count in itemSets.items()])
+        pendingSquared = sum([count * math.prod([survival[edgeIndex] for edgeIndex in edgeIndices]) for edgeIndices,count in pairSets.items()])
+        mean += step * probability * pending
+        variance += step * (probability * pendingSquared - (probability * pending) ** 2)
+    return mean, max(variance, 0.0)
+
+# Return (mean, peak) number of vertices and edges pending in the stream schedules of a run
+def PendingItems(parameters, patterns):
+    mean = 0.0
+    variance = 0.0
+    for pattern in patterns:
+        patternMean, patternVariance = PatternPending(pattern, parameters.duration)
+        mean += patternMean
+        variance += patternVariance
+    if ((mean <= 0) or (variance <= 0)):
+        return mean, mean
+    # The peak is about the largest of duration / period roughly independent values,
+    # where the period is the average offset window, so about sqrt(2 ln(periods))
+    # standard deviations above the mean for normal values. The count is skewed to the
+    # right, so this is taken from the gamma distribution of the same mean and variance
+    # (by the Wilson-Hilferty approximation).
+    windows = [maxOffset + 1 for pattern in patterns for maxOffset in pattern.compiled.edgeMaxOffsets]
+    period = max(sum(windows) / max(len(windows), 1), 1.0)
+    periods = max(parameters.duration / period, 1.0)
+    deviations = math.sqrt(2.0 * math.log(periods))
+    shape = mean * mean / variance
+    peak = mean * (1.0 - 1.0 / (9.0 * shape) + deviations * math.sqrt(1.0 / (9.0 * shape))) ** 3
+    return mean, max(peak, mean)
+
+
+# ----- Sample Runs -----
+
+# Generator of sample runs, whose ids start at firstVertexId and firstEdgeId and whose
+# timestamps are those of timeOffset time units later
+class SampleGenerator(GraphStreamGenerator):
+    def __init__(self, parameters, patterns, seed, firstVertexId = 0, firstEdgeId = 0, timeOffset = 0):
+        self.firstVertexId = firstVertexId
+        self.firstEdgeId = firstEdgeId
+        self.timeOffset = timeOffset
+        GraphStreamGenerator.__init__(self, parameters, patterns, seed)
+        self.checkpointInterval = 0
+        self.progressInterval = 0
+        self.logLevel = logging.DEBUG
+
+    def reset(self):
+        GraphStreamGenerator.reset(self)
+        self.numVertices = self.firstVertexId
+        self.numEdges = self.firstEdgeId
+
+    def timeStr(self, timeUnit):
+        return GraphStreamGenerator.timeStr(self, timeUnit + self.timeOffset)
+
+# Return copy of parameters for a sample run of sampleDuration time units written to outputDir
+def SampleParameters(parameters, sampleDuration, outputDir, outputFormats = None):
+    sampleParameters = copy.copy(parameters)
+    sampleParameters.duration = sampleDuration
+    sampleParameters.outputFilePrefix = os.path.join(outputDir, 'sample')
+    sampleParameters.checkpointInterval = 0
+    sampleParameters.progressInterval = 0
+    if (outputFormats is not None):
+        sampleParameters.outputFormats = outputFormats
+    return sampleParameters
+
+# Return number of time units for a sample run expected to write about numItems vertices and edges
+def SampleDuration(parameters, patterns, numItems):
+    itemsPerTimeUnit = sum(ExpectedStreamItems(parameters, patterns)) / max(parameters.duration, 1)
+    if (itemsPerTimeUnit <= 0):
+        return min(parameters.duration, 100)
+    return max(1, min(parameters.duration, MAX_SAMPLE_DURATION, math.ceil(numItems / itemsPerTimeUnit)))
+
+# Return {'streams': [bytes of each stream's files], 'instances': bytes of instances
+# files} of the output files in outputDir of a sample run
+def SampleFileSizes(outputDir, numStreams):
+    sizes = {'streams': [0] * numStreams, 'instances': 0}
+    for entry in os.listdir(outputDir):
+        path = os.path.join(outputDir, entry)
+        if os.path.isdir(path):
+            size = sum([os.path.getsize(os.path.join(dirPath, fileName)) for dirPath,dirNames,fileNames in os.walk(path) for fileName in fileNames])
+        else:
+            size = os.path.getsize(path)
+        name = entry[len('sample-'):]
+        if name.startswith('insts'):
+            sizes['instances'] += size
+        elif name.startswith('s'):
+            streamNum = ''
+            for char in name[1:]:
+                if (not char.isdigit()):
+                    break
+                streamNum += char
+            if (streamNum and (1 <= int(streamNum) <= numStreams)):
+                sizes['streams'][int(streamNum)-1] += size
+    return sizes
+
+# Return (seconds, metrics) of a sample run of the run's generator (see gsgVector.CreateGenerator)
+def TimeSample(parameters, patterns, sampleDuration):
+    with tempfile.TemporaryDirectory() as outputDir:
+        outputFormats = [outputFormat for outputFormat in parameters.outputFormats if SINKS[outputFormat].FILES]
+        generator = CreateGenerator(SampleParameters(parameters, sampleDuration, outputDir, outputFormats), patterns)
+        generator.checkpointInterval = 0
+        generator.logLevel = logging.DEBUG
+        startTime = time.perf_counter()
+        generator.generate()
+        return time.perf_counter() - startTime, generator.metrics
+
+# Return ({outputFormat: bytes per vertex or edge of each stream}, {outputFormat: bytes
+# per instance}) measured by a sample run writing each output format
+def SampleItemBytes(parameters, patterns, sampleDuration, expectedVertices, expectedEdges):
+    streamBytes = {}
+    instanceBytes = {}
+    for outputFormat in [outputFormat for outputFormat in SINKS if SINKS[outputFormat].FILES]:
+        with tempfile.TemporaryDirectory() as outputDir:
+            sampleParameters = SampleParameters(parameters, sampleDuration, outputDir, [outputFormat])
+            generator = SampleGenerator(sampleParameters, patterns, parameters.seed, expectedVertices // 2, expectedEdges // 2,
+                                        parameters.duration // 2)
+            generator.generate()
+            sizes = SampleFileSizes(outputDir, parameters.numStreams)
+        metrics = generator.metrics
+        streamBytes[outputFormat] = [sizes['streams'][streamIndex] / max(metrics.streamItems[streamIndex], 1)
+                                     for streamIndex in range(parameters.numStreams)]
+        numTracked = sum([counts[0] for pattern,counts in metrics.patternInstances.items() if pattern.track])
+        instanceBytes[outputFormat] = sizes['instances'] / max(numTracked, 1)
+    return streamBytes, instanceBytes
+
+# Return bytes of memory per pending vertex or edge, measured by scheduling instances
+# of each pattern, averaged with weights {pattern: weight}
+def PendingItemBytes(parameters, patterns, weights, expectedVertices, expectedEdges):
+    totalBytes = 0.0
+    totalWeight = 0.0
+    for pattern in patterns:
+        if (weights.get(pattern, 0.0) <= 0.0):
+            continue
+        sampleParameters = copy.copy(parameters)
+        sampleParameters.oldVertexPoolSize = 0
+        generator = SampleGenerator(sampleParameters, [pattern], 0, expectedVertices // 2, expectedEdges // 2)
+        for streamVertices in generator.streamVertices:
+            for vertexId in range(1, len(pattern.vertices) + 2):
+                streamVertices.add(vertexId)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for instanceNum in range(MEMORY_SAMPLE_INSTANCES):
+            generator.addPatternInstance(pattern, 0)
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        numItems = generator.metrics.pendingItems
+        if (numItems > 0):
+            totalBytes += weights[pattern] * (after - before) / numItems
+            totalWeight += weights[pattern]
+    return (totalBytes / totalWeight) if (totalWeight > 0) else 0.0
+
+
+# ----- Estimate -----
+
+# Return dictionary of estimates for a run of parameters and patterns (see above),
+# calibrated by a sample run of sampleDuration time units (by default, long enough to
+# write about SAMPLE_ITEMS vertices and edges)
+def EstimateRun(parameters, patterns, sampleDuration = None):
+    for pattern in patterns:
+        if (pattern.compiled is None):
+            pattern.compiled = CompilePattern(pattern)
+    numStreams = parameters.numStreams
+    streamItems = ExpectedStreamItems(parameters, patterns)
+    numItems = sum(streamItems)
+    numInstances = ExpectedInstances(parameters, patterns)
+    numTracked = ExpectedInstances(parameters, [pattern for pattern in patterns if pattern.track])
+    numEdges = sum([pattern.probability * parameters.duration * len(pattern.edges) for pattern in patterns])
+    numVertices = sum([pattern.probability * parameters.duration * sum(pattern.compiled.vertexNew) for pattern in patterns])
+    # Memory: pending items of the patterns generated one instance at a time, vectorized items, and old vertex pools
+    scheduledPatterns = patterns
+    vectorItems = 0.0
+    if (parameters.instanceEngine == "vector"):
+        scheduledPatterns = [pattern for pattern in patterns if (not Vectorizable(pattern))]
+        vectorItems = numItems - sum(ExpectedStreamItems(parameters, scheduledPatterns))
+    meanPending, peakPending = PendingItems(parameters, scheduledPatterns)
+    weights = dict([(pattern, PatternPending(pattern, parameters.duration)[0]) for pattern in scheduledPatterns])
+    pendingItemBytes = PendingItemBytes(parameters, scheduledPatterns, weights, int(numVertices), int(numEdges))
+    poolIds = 0
+    if any([(not all(pattern.compiled.vertexNew)) for pattern in patterns]):
+        streamVertices = [0.0] * numStreams
+        for pattern in patterns:
+            for streamNum,vertexIndices in pattern.compiled.streamVertices.items():
+                streamVertices[streamNum-1] += pattern.probability * parameters.duration * sum([pattern.compiled.vertexNew[vertexIndex] for vertexIndex in vertexIndices])
+        if (parameters.oldVertexPoolSize > 0):
+            streamVertices = [min(numIds, parameters.oldVertexPoolSize) for numIds in streamVertices]
+        poolIds = sum(streamVertices)
+    # Sample runs: time per vertex or edge written, and bytes per item of each format
+    if (sampleDuration is None):
+        sampleDuration = SampleDuration(parameters, patterns, SAMPLE_ITEMS)
+    sampleDuration = min(sampleDuration, parameters.duration)
+    sampleSeconds, sampleMetrics = TimeSample(parameters, patterns, sampleDuration)
+    sampleItems = sampleMetrics.numItems()
+    if (sampleItems > 0):
+        seconds = sampleSeconds * numItems / sampleItems
+    else:
+        seconds = sampleSeconds * parameters.duration / max(sampleDuration, 1)
+    streamBytes, instanceBytes = SampleItemBytes(parameters, patterns, min(SampleDuration(parameters, patterns, SIZE_SAMPLE_ITEMS), sampleDuration),
+                                                 int(numVertices), int(numEdges))
+    outputBytes = {}
+    for outputFormat in streamBytes:
+        outputBytes[outputFormat] = {"streams": dict([(str(streamIndex+1), round(streamItems[streamIndex] * streamBytes[outputFormat][streamIndex]))
+                                                      for streamIndex in range(numStreams)]),
+                                     "instances": round(numTracked * instanceBytes[outputFormat])}
+        outputBytes[outputFormat]["total"] = sum(outputBytes[outputFormat]["streams"].values()) + outputBytes[outputFormat]["instances"]
+    return {"duration": parameters.duration,
+            "instances": round(numInstances),
+            "trackedInstances": round(numTracked),
+            "vertices": round(numVertices),
+            "edges": round(numEdges),
+            "events": round(numItems),
+            "streamEvents": dict([(str(streamIndex+1), round(streamItems[streamIndex])) for streamIndex in range(numStreams)]),
+            "outputFormats": list(parameters.outputFormats),
+            "outputCompression": parameters.outputCompression,
+            "outputBytes": outputBytes,
+            "pendingEvents": {"mean": round(meanPending), "peak": round(peakPending)},
+            "memoryBytes": {"pending": round(peakPending * pendingItemBytes),
+                            "vectorized": round(vectorItems * VECTOR_ITEM_BYTES),
+                            "oldVertexPools": round(poolIds * POOL_ID_BYTES)},
+            "sample": {"duration": sampleDuration, "seconds": round(sampleSeconds, 4), "events": sampleItems},
+            "seconds": round(seconds, 1)}
+
+# Return number of bytes as a string with a binary unit
+def BytesStr(numBytes):
+    for unit in ('bytes', 'KiB', 'MiB', 'GiB', 'TiB'):
+        if ((numBytes < 1024) or (unit == 'TiB')):
+            return (str(int(numBytes)) if (unit == 'bytes') else '{:.1f}'.format(numBytes)) + ' ' + unit
+        numBytes /= 1024.0
+
+# Return number of seconds as a string in seconds, minutes, hours or days
+def SecondsStr(seconds):
+    for unit,unitSeconds in (('days', 86400), ('hours', 3600), ('minutes', 60)):
+        if (seconds >= 2 * unitSeconds):
+            return '{:.1f}'.format(seconds / unitSeconds) + ' ' + unit
+    return '{:.1f}'.format(seconds) + ' seconds'
+
+def PrintEstimate(estimate):
+    print('Estimate for duration = ' + str(estimate['duration']) + ':')
+    print('  Instances = ' + str(estimate['instances']) + ' (' + str(estimate['trackedInstances']) + ' tracked)')
+    print('  Vertices = ' + str(estimate['vertices']) + ', edges = ' + str(estimate['edges']))
+    print('  Events = ' + str(estimate['events']) + ' (' + ', '.join(['stream ' + streamNum + ': ' + str(numItems)
+                                                                      for streamNum,numItems in estimate['streamEvents'].items()]) + ')')
+    print('  Output size (' + ('compressed with ' + estimate['outputCompression'] + ' where supported, ' if (estimate['outputCompression'] != "none") else '')
+          + '* = output formats of the run):')
+    for outputFormat,outputBytes in estimate['outputBytes'].items():
+        line = '    ' + ('* ' if (outputFormat in estimate['outputFormats']) else '  ') + outputFormat + ': ' + BytesStr(outputBytes['total'])
+        line += ' (' + ', '.join(['stream ' + streamNum + ': ' + BytesStr(numBytes) for streamNum,numBytes in outputBytes['streams'].items()])
+        if outputBytes['instances']:
+            line += ', instances: ' + BytesStr(outputBytes['instances'])
+        print(line + ')')
+    print('  Pending events = ' + str(estimate['pendingEvents']['mean']) + ' on average, ' + str(estimate['pendingEvents']['peak']) + ' at peak')
+    memory = estimate['memoryBytes']
+    line = '  Memory = ' + BytesStr(sum(memory.values())) + ' (pending events: ' + BytesStr(memory['pending'])
+    if memory['vectorized']:
+        line += ', vectorized events: ' + BytesStr(memory['vectorized'])
+    if memory['oldVertexPools']:
+        line += ', old vertex pools: ' + BytesStr(memory['oldVertexPools'])
+    print(line + ')')
+    sample = estimate['sample']
+    print('  Runtime = ' + SecondsStr(estimate['seconds']) + ' (sample of ' + str(sample['duration']) + ' time units: '
+          + str(sample['events']) + ' events in ' + '{:.2f}'.format(sample['seconds']) + ' seconds)')
+
+def WriteEstimate(estimate, fileName):
+    with open(fileName, 'w') as estimateFile:
+        json.dump(estimate, estimateFile, indent=2)
+        estimateFile.write('\n')
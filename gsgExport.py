@@ -0,0 +1,201 @@
+# gsgExport.py
+#
+# Graph Stream Generator v1.0
+#
+# Exporters converting vertices and edges of a stream to GraphML, GEXF or CSV (a
+# node table and an edge list). Used by gExportGraphML.py to convert stream files,
+# and by the export sinks (see gsgOutput.py) to write these formats directly during
+# generation.
+#
+# Vertices and edges are given as the items of a stream file (e.g., {"id": "1",
+# "type": "user", "attributes": {...}, "timestamp": "5"}). The converted nodes and
+# edges are written to temporary files until the exporter is closed, when the
+# attributes seen are known and can be declared. So memory use does not grow with
+# the size of the stream.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import os
+import csv
+import json
+import shutil
+import tempfile
+from xml.sax.saxutils import escape, quoteattr
+
+
+# ----- Exporters -----
+
+# Base class of exporters. Subclasses convert vertex and edge items of a stream file
+# (writeVertex, writeEdge) into nodeBody and edgeBody, temporary files next to the
+# output, and assemble the output file(s) from them in finish().
+class Exporter:
+    EXTENSION = ''
+
+    def __init__(self, outputFileName):
+        self.outputFileName = outputFileName
+        outputDir = os.path.dirname(os.path.abspath(outputFileName))
+        self.nodeBody = tempfile.TemporaryFile('w+', encoding='utf-8', dir=outputDir)
+        self.edgeBody = tempfile.TemporaryFile('w+', encoding='utf-8', dir=outputDir)
+        self.nodeKeys = {} # {data name: key id} of node data seen, in order seen
+        self.edgeKeys = {} # {data name: key id} of edge data seen, in order seen
+
+    # Return key id of node or edge data name, adding it if not seen before
+    def key(self, keys, prefix, name):
+        keyId = keys.get(name)
+        if (keyId is None):
+            keyId = prefix + str(len(keys))
+            keys[name] = keyId
+        return keyId
+
+    def close(self):
+        try:
+            self.finish()
+        finally:
+            self.nodeBody.close()
+            self.edgeBody.close()
+
+    # Copy temporary file to outputFile
+    def copyBody(self, body, outputFile):
+        body.seek(0)
+        shutil.copyfileobj(body, outputFile)
+
+# Return list of (name, value) of the data of a vertex or edge item: its type (if
+# any), its attributes and its timestamp
+def ItemData(item):
+    data = []
+    if ('type' in item):
+        data.append(('type', item['type']))
+    for name,value in item['attributes'].items():
+        data.append((name, value))
+    data.append(('timestamp', item['timestamp']))
+    return data
+
+class GraphMLExporter(Exporter):
+    EXTENSION = '.graphml'
+
+    def writeVertex(self, vertex):
+        self.nodeBody.write('   <node id=' + quoteattr(vertex['id']) + '>\n')
+        for name,value in ItemData(vertex):
+            self.nodeBody.write('       <data key="' + self.key(self.nodeKeys, 'v', name) + '">' + escape(str(value)) + '</data>\n')
+        self.nodeBody.write('   </node>\n')
+
+    def writeEdge(self, edge):
+        directed = ''
+        if (edge.get('directed') == 'false'):
+            directed = ' directed="false"'
+        self.edgeBody.write('   <edge id=' + quoteattr(edge['id']) + ' source=' + quoteattr(edge['source'])
+                            + ' target=' + quoteattr(edge['target']) + directed + '>\n')
+        for name,value in ItemData(edge):
+            self.edgeBody.write('       <data key="' + self.key(self.edgeKeys, 'e', name) + '">' + escape(str(value)) + '</data>\n')
+        self.edgeBody.write('   </edge>\n')
+
+    def finish(self):
+        with open(self.outputFileName, 'w', encoding='utf-8') as target:
+            target.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            target.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+                         'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                         'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+                         'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n')
+            for domain,keys in (('node', self.nodeKeys), ('edge', self.edgeKeys)):
+                for name,keyId in keys.items():
+                    target.write('<key id="' + keyId + '" for="' + domain + '" attr.name=' + quoteattr(name) + ' attr.type="string"/>\n')
+            target.write('<graph id="GSG_V1" edgedefault="directed">\n')
+            self.copyBody(self.nodeBody, target)
+            self.copyBody(self.edgeBody, target)
+            target.write('</graph>\n')
+            target.write('</graphml>\n')
+
+# GEXF 1.2 dynamic graph, with each node and edge starting at its timestamp
+class GEXFExporter(Exporter):
+    EXTENSION = '.gexf'
+
+    def __init__(self, outputFileName):
+        Exporter.__init__(self, outputFileName)
+        self.timeFormat = None # GEXF timeformat, from the first timestamp seen
+
+    # Return quoted GEXF start time of timestamp
+    def start(self, timestamp):
+        if (self.timeFormat is None):
+            if timestamp.isdigit():
+                self.timeFormat = 'integer'
+            else:
+                self.timeFormat = 'dateTime'
+        return quoteattr(timestamp.replace(' ', 'T'))
+
+    def writeAttValues(self, body, keys, prefix, item):
+        body.write('        <attvalues>\n')
+        for name,value in ItemData(item):
+            if (name != 'timestamp'):
+                body.write('          <attvalue for="' + self.key(keys, prefix, name) + '" value=' + quoteattr(str(value)) + '/>\n')
+        body.write('        </attvalues>\n')
+
+    def writeVertex(self, vertex):
+        self.nodeBody.write('      <node id=' + quoteattr(vertex['id']) + ' label=' + quoteattr(vertex['id'])
+                            + ' start=' + self.start(vertex['timestamp']) + '>\n')
+        self.writeAttValues(self.nodeBody, self.nodeKeys, 'v', vertex)
+        self.nodeBody.write('      </node>\n')
+
+    def writeEdge(self, edge):
+        edgeType = 'directed'
+        if (edge.get('directed') == 'false'):
+            edgeType = 'undirected'
+        self.edgeBody.write('      <edge id=' + quoteattr(edge['id']) + ' source=' + quoteattr(edge['source'])
+                            + ' target=' + quoteattr(edge['target']) + ' type="' + edgeType + '"'
+                            + ' start=' + self.start(edge['timestamp']) + '>\n')
+        self.writeAttValues(self.edgeBody, self.edgeKeys, 'e', edge)
+        self.edgeBody.write('      </edge>\n')
+
+    def finish(self):
+        with open(self.outputFileName, 'w', encoding='utf-8') as target:
+            target.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            target.write('<gexf xmlns="http://www.gexf.net/1.2draft" version="1.2">\n')
+            target.write('  <graph mode="dynamic" defaultedgetype="directed" timeformat="' + (self.timeFormat or 'integer') + '">\n')
+            for domain,keys in (('node', self.nodeKeys), ('edge', self.edgeKeys)):
+                target.write('    <attributes class="' + domain + '">\n')
+                for name,keyId in keys.items():
+                    target.write('      <attribute id="' + keyId + '" title=' + quoteattr(name) + ' type="string"/>\n')
+                target.write('    </attributes>\n')
+            target.write('    <nodes>\n')
+            self.copyBody(self.nodeBody, target)
+            target.write('    </nodes>\n')
+            target.write('    <edges>\n')
+            self.copyBody(self.edgeBody, target)
+            target.write('    </edges>\n')
+            target.write('  </graph>\n')
+            target.write('</gexf>\n')
+
+# CSV edge list (outputFileName) and node table (outputFileName with ".nodes.csv"
+# in place of ".csv"), with a column for each data name seen. Rows are kept as JSON
+# lines until the columns are known.
+class CSVExporter(Exporter):
+    EXTENSION = '.csv'
+
+    def writeRow(self, body, keys, row, item):
+        for name,value in ItemData(item):
+            self.key(keys, '', name)
+            row[name] = value
+        body.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def writeVertex(self, vertex):
+        self.writeRow(self.nodeBody, self.nodeKeys, {'id': vertex['id']}, vertex)
+
+    def writeEdge(self, edge):
+        self.writeRow(self.edgeBody, self.edgeKeys,
+                      {'id': edge['id'], 'source': edge['source'], 'target': edge['target'], 'directed': edge.get('directed', 'true')}, edge)
+
+    def finish(self):
+        nodesFileName = self.outputFileName[:-len(self.EXTENSION)] + '.nodes.csv'
+        self.writeCSV(nodesFileName, self.nodeBody, self.nodeKeys, ['id'])
+        self.writeCSV(self.outputFileName, self.edgeBody, self.edgeKeys, ['id', 'source', 'target', 'directed'])
+
+    def writeCSV(self, fileName, body, keys, columns):
+        with open(fileName, 'w', encoding='utf-8', newline='') as target:
+            writer = csv.DictWriter(target, columns + [name for name in keys if name not in columns])
+            writer.writeheader()
+            body.seek(0)
+            for line in body:
+                writer.writerow(json.loads(line))
+
+EXPORTERS = {'GraphML': GraphMLExporter, 'GEXF': GEXFExporter, 'CSV': CSVExporter}
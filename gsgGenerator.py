@@ -0,0 +1,769 @@
+# gsgGenerator.py
+#
+# Graph Stream Generator v1.0
+#
+# Pattern parsing and the GraphStreamGenerator class, which holds all the state of
+# one generation so that several can run in the same process.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import os
+import sys
+import json
+from datetime import datetime, timedelta
+import random
+import heapq
+import math
+import time
+import pickle
+import logging
+from gsgClasses import *
+from gsgOutput import WriteBehind, OpenSinks, CloseAll
+from gsgMetrics import logger, Metrics
+
+
+# ----- Parsing Functions -----
+
+def ParseVertices(jsonData):
+    vertices = []
+    for jsonVertex in jsonData:
+        vertex = Vertex()
+        vertex.id = jsonVertex['id']
+        if 'type' in jsonVertex:
+            vertex.type = jsonVertex['type']
+        if (jsonVertex['new'] == "true"):
+            vertex.new = True
+            vertex.attributes = jsonVertex['attributes']
+        else:
+            vertex.new = False
+            vertex.attributes = [] # attributes ignored if new=false, i.e., referring to old vertex (and will use its attributes)
+        vertices.append(vertex)
+    return vertices
+
+def ParseEdges(jsonData, vertices, parameters):
+    vertexIds = set([vertex.id for vertex in vertices])
+    edges = []
+    for jsonEdge in jsonData:
+        edge = Edge()
+        edge.id = jsonEdge['id']
+        if 'type' in jsonEdge:
+            edge.type = jsonEdge['type']
+        edge.source = jsonEdge['source']
+        if (edge.source not in vertexIds):
+            print("Error: Source vertex in edge " + edge.id + " not defined")
+            sys.exit()
+        edge.target = jsonEdge['target']
+        if (edge.target not in vertexIds):
+            print("Error: Target vertex in edge " + edge.id + " not defined")
+            sys.exit()
+        if (jsonEdge['directed'] == "true"):
+            edge.directed = True
+        else:
+            edge.directed = False
+        edge.minOffset = int(jsonEdge['minOffset'])
+        edge.maxOffset = int(jsonEdge['maxOffset'])
+        if ((edge.minOffset < 0) or (edge.minOffset > edge.maxOffset)):
+            print("Error: Incorrect offsets in edge " + edge.id)
+            sys.exit()
+        edge.streamNum = int(jsonEdge['streamNum'])
+        if ((edge.streamNum < 1) or (edge.streamNum > parameters.numStreams)):
+            print("Error: streamNum out of range in edge " + edge.id)
+            sys.exit()
+        edge.attributes = jsonEdge['attributes']
+        edges.append(edge)
+    return edges
+
+# Return list of valid, compiled patterns parsed from jsonData
+def ParsePatterns(jsonData, parameters):
+    print('Parsing patterns...')
+    patterns = []
+    for jsonPattern in jsonData:
+        pattern = Pattern()
+        pattern.id = jsonPattern['id']
+        if (jsonPattern['track'] == "true"):
+            pattern.track = True
+        else:
+            pattern.track = False
+        pattern.probability = float(jsonPattern['probability'])
+        if ((pattern.probability < 0.0) or (pattern.probability > 1.0)):
+            print("Error: probability out of range for pattern " + pattern.id)
+            sys.exit()
+        pattern.vertices = ParseVertices(jsonPattern['vertices'])
+        pattern.edges = ParseEdges(jsonPattern['edges'], pattern.vertices, parameters)
+        if ValidPattern(pattern):
+            patterns.append(pattern)
+    CompilePatterns(patterns)
+    return patterns
+
+def ValidPattern(pattern):
+    # Check that all edges to an old vertex in same stream
+    oldVertexIds = set([vertex.id for vertex in pattern.vertices if (not vertex.new)])
+    oldVertexStreamNums = {} # {vertex id: streamNum of first edge using old vertex}
+    for edge in pattern.edges:
+        for vertexId in (edge.source, edge.target):
+            if (vertexId in oldVertexIds):
+                if (oldVertexStreamNums.setdefault(vertexId, edge.streamNum) != edge.streamNum):
+                    print("Error: Invalid pattern " + pattern.id + ": two edges to same old vertex have different streams")
+                    sys.exit()
+    return True
+
+# Compile each parsed pattern into its index-based form (pattern.compiled)
+def CompilePatterns(patterns):
+    for pattern in patterns:
+        pattern.compiled = CompilePattern(pattern)
+
+def CompilePattern(pattern):
+    compiled = CompiledPattern()
+    vertexIndices = {} # {vertex id: index in pattern.vertices}
+    for vertex in pattern.vertices:
+        vertex.streamJSON = VertexStreamJSON(vertex)
+        vertex.streamLineJSON = VertexStreamLineJSON(vertex)
+        vertexIndices[vertex.id] = len(compiled.vertices)
+        compiled.vertices.append(vertex)
+        compiled.vertexNew.append(vertex.new)
+    for edge in pattern.edges:
+        sourceIndex = vertexIndices[edge.source]
+        targetIndex = vertexIndices[edge.target]
+        edge.streamJSON = EdgeStreamJSON(edge)
+        edge.streamLineJSON = EdgeStreamLineJSON(edge)
+        compiled.edges.append(edge)
+        compiled.edgeSources.append(sourceIndex)
+        compiled.edgeTargets.append(targetIndex)
+        compiled.edgeMinOffsets.append(edge.minOffset)
+        compiled.edgeMaxOffsets.append(edge.maxOffset)
+        compiled.edgeStreamNums.append(edge.streamNum)
+        streamVertices = compiled.streamVertices.setdefault(edge.streamNum, set())
+        streamVertices.add(sourceIndex)
+        streamVertices.add(targetIndex)
+    return compiled
+
+# Return lines of a vertex instance's JSON in a stream file that are the same for every instance
+def VertexStreamJSON(vertex):
+    result = ''
+    if vertex.type:
+        result += '     "type": ' + JSONString(vertex.type) + ',\n'
+    result += '     "attributes": ' + DictToJSONString(vertex.attributes) + ',\n'
+    return result
+
+# Return lines of an edge instance's JSON in a stream file that are the same for every instance
+def EdgeStreamJSON(edge):
+    result = ''
+    if edge.type:
+        result += '     "type": ' + JSONString(edge.type) + ',\n'
+    result += '     "attributes": ' + DictToJSONString(edge.attributes) + ',\n'
+    if edge.directed:
+        result += '     "directed": "true",\n'
+    else:
+        result += '     "directed": "false",\n'
+    return result
+
+# Return the part of a vertex instance's line in a JSON Lines stream file that is the
+# same for every instance (following the id)
+def VertexStreamLineJSON(vertex):
+    result = ''
+    if vertex.type:
+        result += ', "type": ' + JSONString(vertex.type)
+    result += ', "attributes": ' + DictToJSONString(vertex.attributes)
+    return result
+
+# Return the part of an edge instance's line in a JSON Lines stream file that is the
+# same for every instance (following the target)
+def EdgeStreamLineJSON(edge):
+    result = ''
+    if edge.type:
+        result += ', "type": ' + JSONString(edge.type)
+    result += ', "attributes": ' + DictToJSONString(edge.attributes)
+    if edge.directed:
+        result += ', "directed": "true"'
+    else:
+        result += ', "directed": "false"'
+    return result
+
+# Return event as a one-line JSON object
+def EventToJSON(event):
+    jsonEvent = {"streamNum": event.streamNum, "kind": event.kind, "id": str(event.id)}
+    if (event.kind == "edge"):
+        jsonEvent["source"] = str(event.source)
+        jsonEvent["target"] = str(event.target)
+        if event.directed:
+            jsonEvent["directed"] = "true"
+        else:
+            jsonEvent["directed"] = "false"
+    if event.type:
+        jsonEvent["type"] = event.type
+    jsonEvent["attributes"] = event.attributes
+    jsonEvent["timestamp"] = event.timestamp
+    return json.dumps(jsonEvent, ensure_ascii=False)
+
+# Convert timeUnit to string according to output time format
+def TimeStr(timeUnit, parameters):
+    result = str(timeUnit) # i.e., outputTimeFormat = "units"
+    if (parameters.outputTimeFormat == "seconds"):
+        result = str(timeUnit * parameters.secondsPerUnitTime)
+    if (parameters.outputTimeFormat == "datetime"):
+        secs = timeUnit * parameters.secondsPerUnitTime
+        dateTime = parameters.startTime + timedelta(seconds=secs)
+        result = dateTime.strftime('%Y-%m-%d %H:%M:%S')
+    return result
+
+# Convert timestamp string written according to output time format back to its time unit
+def TimeUnit(timestamp, parameters):
+    if (parameters.outputTimeFormat == "seconds"):
+        return int(timestamp) // parameters.secondsPerUnitTime
+    if (parameters.outputTimeFormat == "datetime"):
+        dateTime = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
+        return int((dateTime - parameters.startTime).total_seconds()) // parameters.secondsPerUnitTime
+    return int(timestamp) # i.e., outputTimeFormat = "units"
+
+# ----- Checkpoints -----
+
+CHECKPOINT_VERSION = 2
+
+# Name of the checkpoint file of a run
+def CheckpointFileName(parameters):
+    return parameters.outputFilePrefix + '-checkpoint'
+
+# Remove the checkpoint file of a run, if any, since it no longer matches the output files
+def RemoveCheckpoint(parameters):
+    if os.path.exists(CheckpointFileName(parameters)):
+        os.remove(CheckpointFileName(parameters))
+
+# Pickler writing pattern vertices and edges as references to them (see ElementKeys),
+# so that pending instances are restored referring to the patterns being generated
+class CheckpointPickler(pickle.Pickler):
+    def __init__(self, checkpointFile, patterns):
+        pickle.Pickler.__init__(self, checkpointFile, pickle.HIGHEST_PROTOCOL)
+        self.elementKeys = ElementKeys(patterns)
+
+    def persistent_id(self, obj):
+        return self.elementKeys.get(id(obj))
+
+class CheckpointUnpickler(pickle.Unpickler):
+    def __init__(self, checkpointFile, patterns):
+        pickle.Unpickler.__init__(self, checkpointFile)
+        self.patterns = patterns
+
+    def persistent_load(self, key):
+        kind, patternIndex, index = key
+        if (kind == 'vertex'):
+            return self.patterns[patternIndex].compiled.vertices[index]
+        return self.patterns[patternIndex].compiled.edges[index]
+
+# Return {id of pattern Vertex or Edge object: ("vertex" or "edge", pattern index, index in pattern)}
+def ElementKeys(patterns):
+    elementKeys = {}
+    for patternIndex in range(len(patterns)):
+        compiled = patterns[patternIndex].compiled
+        for index in range(len(compiled.vertices)):
+            elementKeys[id(compiled.vertices[index])] = ('vertex', patternIndex, index)
+        for index in range(len(compiled.edges)):
+            elementKeys[id(compiled.edges[index])] = ('edge', patternIndex, index)
+    return elementKeys
+
+# Return the parameters and patterns that must be the same to resume from a checkpoint
+def CheckpointSettings(parameters, patterns):
+    return {'numStreams': parameters.numStreams, 'secondsPerUnitTime': parameters.secondsPerUnitTime,
+            'startTime': parameters.startTime.strftime('%Y-%m-%d %H:%M:%S'), 'outputTimeFormat': parameters.outputTimeFormat,
+            'oldVertexPoolSize': parameters.oldVertexPoolSize, 'oldVertexPoolPolicy': parameters.oldVertexPoolPolicy,
+            'triggerEngine': parameters.triggerEngine, 'instanceEngine': parameters.instanceEngine,
+            'outputFormats': list(parameters.outputFormats),
+            'outputCompression': parameters.outputCompression, 'segmentSize': parameters.segmentSize,
+            'segmentDuration': parameters.segmentDuration,
+            'patterns': [PatternSettings(pattern) for pattern in patterns]}
+
+# Return a pattern as canonical JSON of everything its generation depends on
+def PatternSettings(pattern):
+    return json.dumps({'id': pattern.id, 'track': pattern.track, 'probability': pattern.probability,
+                       'vertices': [{'id': vertex.id, 'new': vertex.new, 'type': vertex.type, 'attributes': vertex.attributes}
+                                    for vertex in pattern.vertices],
+                       'edges': [{'id': edge.id, 'type': edge.type, 'source': edge.source, 'target': edge.target,
+                                  'directed': edge.directed, 'minOffset': edge.minOffset, 'maxOffset': edge.maxOffset,
+                                  'streamNum': edge.streamNum, 'attributes': edge.attributes}
+                                 for edge in pattern.edges]}, sort_keys=True)
+
+
+# Return number of time units skipped before a pattern with the given probability
+# is next triggered, i.e., a geometric random variable with P(gap >= k) = (1-p)^k.
+# Returns None if the pattern is never triggered.
+def NextTriggerGap(probability, rng):
+    if (probability >= 1.0):
+        return 0
+    if (probability <= 0.0):
+        return None
+    return int(math.log(1.0 - rng.random()) / math.log1p(-probability))
+
+
+# ----- Generator -----
+
+# Generates the graph streams for the given parameters and parsed patterns. All
+# generation state belongs to the object, and the same seed gives the same output.
+# Use generate() to write the stream and instances files, or events() to iterate
+# over the generated vertices and edges as they are generated, optionally also
+# writing the files.
+class GraphStreamGenerator:
+    def __init__(self, parameters, patterns, seed = None):
+        self.parameters = parameters
+        self.patterns = patterns # list of Pattern class objects
+        if (seed is None):
+            seed = parameters.seed
+        self.seed = seed # None means seeded from the operating system
+        for pattern in patterns:
+            if (pattern.compiled is None):
+                pattern.compiled = CompilePattern(pattern)
+        self.sinks = None # list of open sinks (see gsgOutput.Sink), or None if not writing files
+        self.writeBehind = None # WriteBehind class object while files open, if parameters.outputThreads > 0
+        self.eventBuffer = None # list of events generated since last yielded, or None if not iterating
+        self.externalVertices = None # iterator over vertices written by another generator (see setExternalVertices)
+        self.nextExternalVertex = None
+        self.checkpointInterval = parameters.checkpointInterval # seconds between checkpoints while writing files; 0 means none
+        self.nextCheckpointTime = 0.0
+        self.progressInterval = parameters.progressInterval # seconds between progress messages; 0 means none
+        self.nextProgressTime = 0.0
+        self.debugging = False # whether each instance is logged, set when generation starts
+        self.logLevel = logging.INFO # level of the messages starting and ending generation
+        self.reset()
+
+    # Start a new generation from the seed
+    def reset(self):
+        numStreams = self.parameters.numStreams
+        self.random = random.Random(self.seed)
+        self.numVertices = 0 # total number of unique vertices written to streams
+        self.numEdges = 0 # total number of edges written to streams
+        self.streamVertices = [VertexPool(self.parameters.oldVertexPoolSize, self.parameters.oldVertexPoolPolicy, self.random)
+                               for x in range(numStreams)] # streamVertices[i] = VertexPool of vertex ids in stream i+1
+        self.streamSchedules = [{} for x in range(numStreams)] # streamSchedules[i] = dictionary {creationTime: list of scheduled vertices and edges} for stream i+1
+        self.scheduleTimes = [] # heap of creation times having a non-empty bucket in some stream schedule (may contain duplicates)
+        self.nextTimeUnit = 0 # next time unit whose triggers are drawn by the "bernoulli" engine
+        self.triggers = None # heap of (timeUnit, patternIndex) of next triggers before duration, for the "skip" engine; None until drawn
+        self.laterTriggers = [] # next triggers at or after duration, for the "skip" engine, kept so that the run can be extended
+        self.timeStrCache = (-1, '') # (timeUnit, string) of the last timeStr result
+        self.metrics = Metrics(self.parameters, self.patterns)
+
+    # Generate streams, writing the stream and instances files
+    def generate(self):
+        self.openFiles()
+        try:
+            for timeUnit in self.steps():
+                pass
+        finally:
+            self.closeFiles()
+
+    # Continue generation from the run's checkpoint file (see saveCheckpoint), writing
+    # the same output as if the run had not been interrupted. If extraDuration > 0, the
+    # run is extended by that many time units, to the same output as if its duration
+    # had been that much longer.
+    def resume(self, extraDuration = 0):
+        sinkStates = self.loadCheckpoint(extraDuration)
+        self.openFiles(sinkStates)
+        try:
+            for timeUnit in self.steps(True):
+                pass
+        finally:
+            self.closeFiles()
+
+    # Generate streams, yielding an Event for each vertex and edge as it is written to
+    # its stream, in time order. Generation proceeds only as events are consumed, so
+    # only the events of one time unit are held at a time. If writeFiles, the stream
+    # and instances files are written too, and closed when iteration stops.
+    def events(self, writeFiles = False):
+        for timeUnit,events in self.eventsByTimeUnit(writeFiles):
+            for event in events:
+                yield event
+
+    # Same as events, but yield (timeUnit, list of Events) for each time unit having events
+    def eventsByTimeUnit(self, writeFiles = False):
+        self.eventBuffer = []
+        if writeFiles:
+            self.openFiles()
+        try:
+            for timeUnit in self.steps():
+                events = self.eventBuffer
+                if events:
+                    self.eventBuffer = []
+                    yield timeUnit, events
+        finally:
+            self.eventBuffer = None
+            if writeFiles:
+                self.closeFiles()
+
+    # Generate streams from the start, or if resuming from the restored state, yielding
+    # each time unit after its vertices and edges are written. If checkpointing, the
+    # state is checkpointed at the start, every checkpointInterval seconds, and once all
+    # triggers are drawn, so that the run can then be extended. Progress is logged
+    # every progressInterval seconds (see gsgMetrics.py).
+    def steps(self, resuming = False):
+        if resuming:
+            logger.log(self.logLevel, 'Resuming streams...')
+        else:
+            logger.log(self.logLevel, 'Generating streams...')
+            self.reset()
+        self.startMetrics()
+        self.checkpointIfDue(True)
+        if (self.parameters.triggerEngine == "skip"):
+            for timeUnit in self.stepsSkipAhead():
+                yield timeUnit
+                self.checkpointIfDue()
+                self.progressIfDue(timeUnit)
+        else:
+            for timeUnit in range(self.nextTimeUnit,self.parameters.duration):
+                for pattern in self.patterns:
+                    if (pattern.probability >= self.random.uniform(0,1)):
+                        self.addPatternInstance(pattern, timeUnit)
+                self.nextTimeUnit = timeUnit + 1
+                if self.processStreamSchedules(timeUnit):
+                    yield timeUnit
+                    self.checkpointIfDue()
+                    self.progressIfDue(timeUnit)
+        self.checkpointIfDue(True)
+        # Continue until all scheduled vertices and edges processed, jumping to each next non-empty time
+        while self.scheduleTimes:
+            timeUnit = self.scheduleTimes[0]
+            self.processStreamSchedules(timeUnit)
+            yield timeUnit
+            self.progressIfDue(timeUnit)
+        self.stopMetrics()
+
+    # Same trigger distribution as the per time unit loop in steps, but instead of one
+    # random draw per pattern per time unit, draw each pattern's gap to its next
+    # trigger, so the cost depends on the number of instances rather than patterns x duration.
+    # Patterns triggered at the same time unit are added in pattern order. The triggers
+    # are kept in self.triggers, so that generation can resume from a checkpoint.
+    def stepsSkipAhead(self):
+        duration = self.parameters.duration
+        if (self.triggers is None):
+            self.triggers = []
+            for patternIndex in range(len(self.patterns)):
+                timeUnit = NextTriggerGap(self.patterns[patternIndex].probability, self.random)
+                if (timeUnit is not None):
+                    self.laterTriggers.append((timeUnit, patternIndex))
+        # Move triggers now before duration (e.g., after extending the run) to the heap
+        triggers = self.triggers
+        triggers.extend([trigger for trigger in self.laterTriggers if (trigger[0] < duration)])
+        self.laterTriggers = [trigger for trigger in self.laterTriggers if (trigger[0] >= duration)]
+        heapq.heapify(triggers)
+        while triggers:
+            timeUnit = triggers[0][0]
+            # Write vertices and edges scheduled before this trigger time
+            while (self.scheduleTimes and (self.scheduleTimes[0] < timeUnit)):
+                scheduleTime = self.scheduleTimes[0]
+                self.processStreamSchedules(scheduleTime)
+                yield scheduleTime
+            while (triggers and (triggers[0][0] == timeUnit)):
+                pattern = self.patterns[triggers[0][1]]
+                self.addPatternInstance(pattern, timeUnit)
+                gap = NextTriggerGap(pattern.probability, self.random)
+                if ((gap is not None) and (timeUnit + 1 + gap < duration)):
+                    heapq.heapreplace(triggers, (timeUnit + 1 + gap, triggers[0][1]))
+                else:
+                    if (gap is not None):
+                        self.laterTriggers.append((timeUnit + 1 + gap, triggers[0][1]))
+                    heapq.heappop(triggers)
+            if self.processStreamSchedules(timeUnit):
+                yield timeUnit
+
+    # Vertices written to streams by other generators, as an iterator over
+    # (timeUnit, streamNum, vertexId) in time order, are added to the old vertex
+    # pools as if this generator had written them, those of a time unit ahead of its
+    # own vertices of that time unit. Used by gsgParallel.py.
+    def setExternalVertices(self, externalVertices):
+        self.externalVertices = iter(externalVertices)
+        self.nextExternalVertex = next(self.externalVertices, None)
+
+    # Add external vertices written before timeUnit to the old vertex pools
+    def addExternalVertices(self, timeUnit):
+        nextVertex = self.nextExternalVertex
+        while ((nextVertex is not None) and (nextVertex[0] < timeUnit)):
+            self.streamVertices[nextVertex[1]-1].add(nextVertex[2])
+            nextVertex = next(self.externalVertices, None)
+        self.nextExternalVertex = nextVertex
+
+    def addPatternInstance(self, pattern, timeUnit):
+        if self.debugging:
+            logger.debug("Adding instance of pattern " + pattern.id + " at time " + str(timeUnit))
+        if (self.nextExternalVertex is not None):
+            self.addExternalVertices(timeUnit)
+        compiled = pattern.compiled
+        vertexInstances = [None] * len(compiled.vertices) # vertexInstances[v] = instance of pattern vertex v
+        vertexInstanceList = [] # vertex instances in the order created
+        usedVertexIds = set() # ids of old vertices already used in this instance
+        edgeInstances = []
+        patternCreated = True
+        for edge,sourceIndex,targetIndex,minOffset,maxOffset,streamNum in zip(compiled.edges, compiled.edgeSources, compiled.edgeTargets,
+                                                                             compiled.edgeMinOffsets, compiled.edgeMaxOffsets, compiled.edgeStreamNums):
+            edgeInstance = EdgeInstance(edge)
+            creationTime = timeUnit + self.random.randint(minOffset, maxOffset)
+            edgeInstance.creationTime = creationTime
+            edgeInstance.source = self.getVertexInstanceId(compiled, sourceIndex, streamNum, creationTime, vertexInstances, vertexInstanceList, usedVertexIds)
+            edgeInstance.target = self.getVertexInstanceId(compiled, targetIndex, streamNum, creationTime, vertexInstances, vertexInstanceList, usedVertexIds)
+            if ((edgeInstance.source == 0) or (edgeInstance.target == 0)):
+                patternCreated = False
+                break # break out of loop over pattern.edges
+            else:
+                self.numEdges += 1
+                edgeInstance.id = self.numEdges
+                edgeInstances.append(edgeInstance)
+        if patternCreated:
+            patternInstance = PatternInstance()
+            patternInstance.id = pattern.id
+            patternInstance.vertices = vertexInstanceList
+            patternInstance.edges = edgeInstances
+            # Write instance if pattern track'ed
+            if (pattern.track and self.sinks):
+                if self.writeBehind:
+                    self.writeBehind.call(0, self.writePatternInstance, patternInstance)
+                else:
+                    self.writePatternInstance(patternInstance)
+            self.schedulePatternInstance(patternInstance)
+            self.metrics.patternInstances[pattern][0] += 1
+        else:
+            self.metrics.patternInstances[pattern][1] += 1
+            if self.debugging:
+                logger.debug("  Instance not added: not enough old vertices available in stream")
+
+    # Return id of instance of vertex vertexIndex of compiled pattern, creating it if needed.
+    # If returns 0, then it was unable to create vertex instance
+    def getVertexInstanceId(self, compiled, vertexIndex, streamNum, creationTime, vertexInstances, vertexInstanceList, usedVertexIds):
+        vertexInstance = vertexInstances[vertexIndex]
+        if (vertexInstance is not None):
+            # Vertex instance already created
+            if compiled.vertexNew[vertexIndex]:
+                streamCreationTimes = vertexInstance.streamCreationTimes
+                # Make sure new vertex instance appears no later than any incident edges
+                if (streamNum in streamCreationTimes):
+                    if (creationTime < streamCreationTimes[streamNum]):
+                            streamCreationTimes[streamNum] = creationTime
+                else:
+                    streamCreationTimes[streamNum] = creationTime
+            # else old vertex instance already exists and no need to change streamCreationTimes
+        else:
+            # Create new vertex instance
+            vertex = compiled.vertices[vertexIndex]
+            vertexInstance = VertexInstance(vertex)
+            if (vertex.new):
+                self.numVertices += 1
+                vertexInstance.id = self.numVertices
+                vertexInstance.streamCreationTimes[streamNum] = creationTime
+            else:
+                # Get random old vertex that has not already been used for a different old vertex in this pattern
+                vertexInstance.id = self.streamVertices[streamNum-1].sample(usedVertexIds)
+                usedVertexIds.add(vertexInstance.id)
+            vertexInstances[vertexIndex] = vertexInstance
+            vertexInstanceList.append(vertexInstance)
+        return vertexInstance.id # If zero, then edge left hanging; should abort creating this pattern instance
+
+    # Add pattern instance's vertices and edges to appropriate stream schedules.
+    # A vertex's creation time in a stream is then given by its schedule bucket, so
+    # its streamCreationTimes dictionary is released.
+    def schedulePatternInstance(self, patternInstance):
+        numItems = len(patternInstance.edges)
+        for vertexInstance in patternInstance.vertices:
+            for streamNum,creationTime in vertexInstance.streamCreationTimes.items():
+                self.scheduleItem(vertexInstance, streamNum, creationTime)
+                numItems += 1
+            vertexInstance.streamCreationTimes = None
+        for edgeInstance in patternInstance.edges:
+            self.scheduleItem(edgeInstance, edgeInstance.streamNum, edgeInstance.creationTime)
+        metrics = self.metrics
+        metrics.pendingItems += numItems
+        if (metrics.pendingItems > metrics.maxPendingItems):
+            metrics.maxPendingItems = metrics.pendingItems
+
+    # Append item to the bucket for creationTime in the schedule of the given stream.
+    # Items in a bucket keep their scheduling order, which is the order they are written.
+    def scheduleItem(self, item, streamNum, creationTime):
+        streamSchedule = self.streamSchedules[streamNum-1]
+        bucket = streamSchedule.get(creationTime)
+        if bucket is None:
+            streamSchedule[creationTime] = [item]
+            heapq.heappush(self.scheduleTimes, creationTime)
+        else:
+            bucket.append(item)
+
+    # Write scheduled vertices and edges to streams for creationTime = timeUnit.
+    # Add new vertices to streamVertices. Returns False if nothing was scheduled.
+    def processStreamSchedules(self, timeUnit):
+        scheduleTimes = self.scheduleTimes
+        if ((not scheduleTimes) or (scheduleTimes[0] > timeUnit)):
+            return False # nothing scheduled for this time
+        if (self.nextExternalVertex is not None):
+            self.addExternalVertices(timeUnit + 1) # external vertices up to timeUnit come before this generator's own
+        startTime = time.perf_counter()
+        metrics = self.metrics
+        for streamIndex in range(0,self.parameters.numStreams):
+            bucket = self.streamSchedules[streamIndex].pop(timeUnit, None)
+            if bucket:
+                metrics.streamItems[streamIndex] += len(bucket)
+                metrics.pendingItems -= len(bucket)
+                for item in bucket:
+                    if isinstance(item, VertexInstance):
+                        self.writeVertexInstance(item, streamIndex+1, timeUnit)
+                        self.streamVertices[streamIndex].add(item.id)
+                    else: # item must be an edge instance
+                        self.writeEdgeInstance(item, streamIndex+1)
+        # Discard this time from the heap (once per stream whose bucket was created for it)
+        while (scheduleTimes and (scheduleTimes[0] <= timeUnit)):
+            heapq.heappop(scheduleTimes)
+        metrics.outputSeconds += time.perf_counter() - startTime
+        return True
+
+    def writeVertexInstance(self, vertexInstance, streamNum, timeUnit):
+        if self.writeBehind:
+            self.writeBehind.call(streamNum, self.writeVertexInstanceToStream, vertexInstance, streamNum, timeUnit)
+        elif self.sinks:
+            self.writeVertexInstanceToStream(vertexInstance, streamNum, timeUnit)
+        if (self.eventBuffer is not None):
+            vertex = vertexInstance.vertex
+            self.eventBuffer.append(Event(timeUnit, self.timeStr(timeUnit), streamNum, "vertex", vertexInstance.id,
+                                          None, None, vertex.type, vertex.attributes, None))
+
+    def writeEdgeInstance(self, edgeInstance, streamNum):
+        if self.writeBehind:
+            self.writeBehind.call(streamNum, self.writeEdgeInstanceToStream, edgeInstance, streamNum)
+        elif self.sinks:
+            self.writeEdgeInstanceToStream(edgeInstance, streamNum)
+        if (self.eventBuffer is not None):
+            edge = edgeInstance.edge
+            timeUnit = edgeInstance.creationTime
+            self.eventBuffer.append(Event(timeUnit, self.timeStr(timeUnit), streamNum, "edge", edgeInstance.id,
+                                          edgeInstance.source, edgeInstance.target, edge.type, edge.attributes, edge.directed))
+
+    # ----- File I/O -----
+
+    # Open the sinks for parameters.outputFormats (see gsgOutput.OpenSinks), which
+    # write the stream and instances files. If parameters.outputThreads > 0, the sinks
+    # are written by that many background threads (stream i+1 by thread (i+1) mod
+    # outputThreads, and instances by thread 0). The sinks resume from sinkStates if
+    # given; otherwise any checkpoint of earlier output is removed.
+    def openFiles(self, sinkStates = None):
+        if (sinkStates is None):
+            RemoveCheckpoint(self.parameters)
+        self.sinks = OpenSinks(self.parameters, None, True, sinkStates)
+        if (self.parameters.outputThreads > 0):
+            self.writeBehind = WriteBehind(self.parameters.outputThreads)
+
+    # Close the sinks, after finishing any queued writes. The sinks are always closed
+    # so that files hold valid JSON, even if generation or writing failed.
+    def closeFiles(self):
+        writeBehind = self.writeBehind
+        self.writeBehind = None
+        try:
+            if writeBehind:
+                writeBehind.close()
+        finally:
+            sinks = self.sinks
+            self.sinks = None
+            CloseAll(sinks)
+
+    def writePatternInstance(self, patternInstance):
+        vertexIds = [vertexInstance.id for vertexInstance in patternInstance.vertices]
+        edgeIds = [edgeInstance.id for edgeInstance in patternInstance.edges]
+        for sink in self.sinks:
+            sink.writeInstance(patternInstance.id, vertexIds, edgeIds)
+
+    def writeVertexInstanceToStream(self, vertexInstance, streamNum, timeUnit):
+        timestamp = self.timeStr(timeUnit)
+        for sink in self.sinks:
+            sink.writeVertex(streamNum, timeUnit, timestamp, vertexInstance.id, vertexInstance.vertex)
+
+    def writeEdgeInstanceToStream(self, edgeInstance, streamNum):
+        timeUnit = edgeInstance.creationTime
+        timestamp = self.timeStr(timeUnit)
+        for sink in self.sinks:
+            sink.writeEdge(streamNum, timeUnit, timestamp, edgeInstance.id, edgeInstance.source, edgeInstance.target, edgeInstance.edge)
+
+    # ----- Checkpoints -----
+
+    # Save a checkpoint if checkpointing and writing files, and checkpointInterval
+    # seconds have passed since the last one (or if force)
+    def checkpointIfDue(self, force = False):
+        if ((self.checkpointInterval > 0) and self.sinks and (force or (time.monotonic() >= self.nextCheckpointTime))):
+            startTime = time.monotonic()
+            self.saveCheckpoint()
+            endTime = time.monotonic()
+            self.metrics.checkpointSeconds += endTime - startTime
+            self.nextCheckpointTime = endTime + self.checkpointInterval
+
+    # Write the generation state (random number generator, vertex and edge counts, old
+    # vertex pools, stream schedules and triggers) and the sinks' states (output file
+    # offsets) to the checkpoint file. Queued writes are finished first, and the
+    # previous checkpoint is replaced only once the new one is complete.
+    def saveCheckpoint(self):
+        if self.writeBehind:
+            self.writeBehind.sync()
+        checkpoint = {'version': CHECKPOINT_VERSION,
+                      'settings': CheckpointSettings(self.parameters, self.patterns),
+                      'duration': self.parameters.duration,
+                      'sinks': [sink.checkpoint() for sink in self.sinks],
+                      'random': self.random,
+                      'numVertices': self.numVertices,
+                      'numEdges': self.numEdges,
+                      'streamVertices': self.streamVertices,
+                      'streamSchedules': self.streamSchedules,
+                      'scheduleTimes': self.scheduleTimes,
+                      'nextTimeUnit': self.nextTimeUnit,
+                      'triggers': self.triggers,
+                      'laterTriggers': self.laterTriggers}
+        fileName = CheckpointFileName(self.parameters)
+        with open(fileName + '.tmp', 'wb') as checkpointFile:
+            CheckpointPickler(checkpointFile, self.patterns).dump(checkpoint)
+            checkpointFile.flush()
+            os.fsync(checkpointFile.fileno())
+        os.replace(fileName + '.tmp', fileName)
+
+    # Restore the generation state from the checkpoint file, setting the duration to
+    # the checkpointed run's plus extraDuration. Returns the sinks' states. Raises
+    # ValueError if the checkpoint was written with different settings or patterns.
+    def loadCheckpoint(self, extraDuration = 0):
+        with open(CheckpointFileName(self.parameters), 'rb') as checkpointFile:
+            checkpoint = CheckpointUnpickler(checkpointFile, self.patterns).load()
+        if (checkpoint['version'] != CHECKPOINT_VERSION):
+            raise ValueError('Checkpoint version ' + str(checkpoint['version']) + ' not supported')
+        settings = CheckpointSettings(self.parameters, self.patterns)
+        changed = [name for name in settings if (settings[name] != checkpoint['settings'].get(name))]
+        if changed:
+            raise ValueError('Checkpoint was written with different ' + ', '.join(changed))
+        self.parameters.duration = checkpoint['duration'] + extraDuration
+        self.random = checkpoint['random']
+        self.numVertices = checkpoint['numVertices']
+        self.numEdges = checkpoint['numEdges']
+        self.streamVertices = checkpoint['streamVertices']
+        self.streamSchedules = checkpoint['streamSchedules']
+        self.scheduleTimes = checkpoint['scheduleTimes']
+        self.nextTimeUnit = checkpoint['nextTimeUnit']
+        self.triggers = checkpoint['triggers']
+        self.laterTriggers = checkpoint['laterTriggers']
+        self.timeStrCache = (-1, '')
+        self.metrics = Metrics(self.parameters, self.patterns)
+        self.metrics.pendingItems = sum([len(bucket) for streamSchedule in self.streamSchedules for bucket in streamSchedule.values()])
+        self.metrics.maxPendingItems = self.metrics.pendingItems
+        return checkpoint['sinks']
+
+    # ----- Metrics -----
+
+    # Start timing the generation, and the progress messages
+    def startMetrics(self):
+        self.debugging = logger.isEnabledFor(logging.DEBUG)
+        self.metrics.start()
+        self.nextProgressTime = time.monotonic() + self.progressInterval
+
+    def stopMetrics(self):
+        self.metrics.stop()
+        self.metrics.logSummary(self.logLevel)
+
+    # Log progress at timeUnit if progressInterval seconds have passed since last logged
+    def progressIfDue(self, timeUnit):
+        if ((self.progressInterval > 0) and (time.monotonic() >= self.nextProgressTime)):
+            self.metrics.logProgress(timeUnit)
+            self.nextProgressTime = time.monotonic() + self.progressInterval
+
+    # Convert timeUnit to string according to output time format.
+    # Items are written in time order, so the last result is cached.
+    def timeStr(self, timeUnit):
+        timeStrCache = self.timeStrCache # one read, since writer threads may also call this
+        if (timeUnit == timeStrCache[0]):
+            return timeStrCache[1]
+        result = TimeStr(timeUnit, self.parameters)
+        self.timeStrCache = (timeUnit, result)
+        return result
@@ -0,0 +1,36 @@
+# gsgIdSet.py
+#
+# Graph Stream Generator v1.0
+#
+# Compact set of the ids seen of vertices, edges or instances, used by gFuseStreams.py
+# to drop repeated vertices and by gsgTruth.py to count the instances found. GSG ids
+# are consecutive integers from 1, so they are kept as bits, using one byte per eight
+# ids, grown by doubling; other ids are kept in a set.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+
+class IdSet:
+    def __init__(self):
+        self.bits = bytearray()
+        self.otherIds = set()
+
+    # Add id (an integer or string), returning True if not already in the set
+    def add(self, itemId):
+        if isinstance(itemId, str):
+            if (not itemId.isdigit()):
+                if itemId in self.otherIds:
+                    return False
+                self.otherIds.add(itemId)
+                return True
+            itemId = int(itemId)
+        byteNum = itemId >> 3
+        mask = 1 << (itemId & 7)
+        if (byteNum >= len(self.bits)):
+            self.bits.extend(bytearray(max(byteNum + 1 - len(self.bits), len(self.bits))))
+        if (self.bits[byteNum] & mask):
+            return False
+        self.bits[byteNum] |= mask
+        return True
@@ -0,0 +1,129 @@
+# gsgMetrics.py
+#
+# Graph Stream Generator v1.0
+#
+# Logging and metrics of generation.
+#
+# Messages are logged to the "gsg" logger: progress at level INFO, and each instance
+# added (or not, for want of old vertices) at level DEBUG, which is off by default,
+# as formatting a message per instance costs more than generating it. Instead, each
+# GraphStreamGenerator keeps a Metrics object counting the instances added and
+# aborted per pattern, the vertices and edges written per stream, the number of
+# vertices and edges scheduled but not yet written, and the time spent writing
+# output and checkpoints. If its progressInterval is greater than 0, the rate of
+# generation and an estimate of the time remaining are logged every progressInterval
+# seconds. The metrics can be written to a JSON file at the end of a run.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import sys
+import json
+import time
+import logging
+import cProfile
+import pstats
+import contextlib
+
+logger = logging.getLogger('gsg')
+
+LOG_LEVELS = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+# Log messages of the given level name (see LOG_LEVELS) and above to standard output,
+# as printed messages are
+def ConfigureLogging(levelName = "info"):
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.handlers = [handler]
+    logger.setLevel(LOG_LEVELS[levelName])
+    logger.propagate = False
+
+# Profile the code run in the context with cProfile if fileName is given, writing the
+# profile to fileName (see pstats) and logging the functions taking the most time
+@contextlib.contextmanager
+def Profiling(fileName, numFunctions = 20):
+    if (fileName is None):
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(fileName)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('Profile written to ' + fileName + ', functions taking the most time:')
+            pstats.Stats(profiler, stream=sys.stdout).sort_stats('tottime').print_stats(numFunctions)
+
+# Metrics of one generation (see above). Counters are updated by the generator.
+class Metrics:
+    def __init__(self, parameters, patterns):
+        self.duration = parameters.duration
+        self.patternInstances = dict([(pattern, [0, 0]) for pattern in patterns]) # {Pattern object: [instances added, aborted]}
+        self.streamItems = [0] * parameters.numStreams # streamItems[i] = vertices and edges written to stream i+1
+        self.pendingItems = 0 # vertices and edges scheduled but not yet written
+        self.maxPendingItems = 0
+        self.outputSeconds = 0.0 # time writing vertices and edges (or queuing them for writer threads)
+        self.checkpointSeconds = 0.0
+        self.startTime = time.monotonic()
+        self.endTime = None
+
+    def start(self):
+        self.startTime = time.monotonic()
+        self.endTime = None
+
+    def stop(self):
+        self.endTime = time.monotonic()
+
+    def elapsedSeconds(self):
+        return (self.endTime if (self.endTime is not None) else time.monotonic()) - self.startTime
+
+    def numItems(self):
+        return sum(self.streamItems)
+
+    # Log progress at time unit timeUnit: the rate of writing vertices and edges, and
+    # the time remaining assuming that it continues at the same rate
+    def logProgress(self, timeUnit):
+        elapsed = self.elapsedSeconds()
+        numItems = self.numItems()
+        message = 'Time unit ' + str(timeUnit) + ' of ' + str(self.duration)
+        message += ', ' + str(numItems) + ' events (' + '{:.1f}'.format(numItems / max(elapsed, 1e-9)) + ' events/second)'
+        message += ', ' + str(self.pendingItems) + ' pending'
+        if (0 < timeUnit < self.duration):
+            message += ', about ' + '{:.0f}'.format(elapsed * (self.duration - timeUnit) / timeUnit) + ' seconds remaining'
+        elif (timeUnit >= self.duration):
+            message += ', writing pending vertices and edges'
+        logger.info(message)
+
+    def logSummary(self, level = logging.INFO):
+        elapsed = self.elapsedSeconds()
+        numItems = self.numItems()
+        logger.log(level, 'Generated ' + str(numItems) + ' events in ' + '{:.2f}'.format(elapsed) + ' seconds ('
+                    + '{:.1f}'.format(numItems / max(elapsed, 1e-9)) + ' events/second)')
+
+    # Return the metrics as a dictionary for JSON
+    def toJSON(self):
+        elapsed = self.elapsedSeconds()
+        numItems = self.numItems()
+        patterns = {}
+        for pattern,(numAdded,numAborted) in self.patternInstances.items():
+            counts = patterns.setdefault(pattern.id, {"added": 0, "aborted": 0})
+            counts["added"] += numAdded
+            counts["aborted"] += numAborted
+        return {"duration": self.duration,
+                "seconds": round(elapsed, 4),
+                "events": numItems,
+                "eventsPerSecond": round(numItems / max(elapsed, 1e-9), 1),
+                "streamEvents": dict([(str(streamIndex+1), self.streamItems[streamIndex]) for streamIndex in range(len(self.streamItems))]),
+                "instances": patterns,
+                "pendingEvents": {"final": self.pendingItems, "max": self.maxPendingItems},
+                "phaseSeconds": {"instances": round(max(elapsed - self.outputSeconds - self.checkpointSeconds, 0.0), 4),
+                                 "output": round(self.outputSeconds, 4),
+                                 "checkpoints": round(self.checkpointSeconds, 4)}}
+
+    def write(self, fileName):
+        with open(fileName, 'w') as metricsFile:
+            json.dump(self.toJSON(), metricsFile, indent=2)
+            metricsFile.write('\n')
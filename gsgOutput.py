@@ -0,0 +1,798 @@
+# gsgOutput.py
+#
+# Graph Stream Generator v1.0
+#
+# Output pipeline support: background writer threads, compressed and segmented
+# output files, and reading them back.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import os
+import bz2
+import gzip
+import itertools
+import json
+import lzma
+import queue
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from gsgBinary import BinaryStreamFile, BinaryInstancesFile
+from gsgExport import GraphMLExporter, GEXFExporter, CSVExporter
+from gsgTruth import TruthStoreFile
+from gsgSharedMemory import RingWriter
+
+OUTPUT_BUFFER_SIZE = 1 << 20 # bytes buffered per output file between disk writes
+
+
+# ----- Write Behind -----
+
+# Runs write calls on background writer threads, so that generation does not wait
+# on disk writes. Calls are collected into batches, and full batches are put on a
+# bounded queue per thread; when a queue is full, the generator blocks until the
+# writer catches up. Calls with the same key (e.g., stream number) always go to the
+# same thread, so they run in the order made. If a write fails, the error is raised
+# in the generating thread by the next call or by close().
+class WriteBehind:
+    def __init__(self, numThreads = 1, queueSize = 16, batchSize = 4096):
+        self.batchSize = batchSize
+        self.queues = [queue.Queue(queueSize) for threadNum in range(numThreads)]
+        self.batches = [[] for threadNum in range(numThreads)] # batches[i] = list of (function, args) not yet queued for thread i
+        self.error = None # first exception raised by a write, if any
+        self.threads = []
+        for threadNum in range(numThreads):
+            thread = threading.Thread(target=self.run, args=(self.queues[threadNum],), name='gsg-writer-' + str(threadNum), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    # Run function(*args) on the writer thread for key
+    def call(self, key, function, *args):
+        threadNum = key % len(self.threads)
+        batch = self.batches[threadNum]
+        batch.append((function, args))
+        if (len(batch) >= self.batchSize):
+            self.queueBatch(threadNum)
+
+    def queueBatch(self, threadNum):
+        if (self.error is not None):
+            raise self.error
+        self.queues[threadNum].put(self.batches[threadNum]) # blocks while queue full
+        self.batches[threadNum] = []
+
+    # Queue all pending calls
+    def flush(self):
+        for threadNum in range(len(self.threads)):
+            if self.batches[threadNum]:
+                self.queueBatch(threadNum)
+
+    # Wait for all calls made so far to finish, e.g., before checkpointing the output
+    def sync(self):
+        self.flush()
+        for batchQueue in self.queues:
+            batchQueue.join()
+        if (self.error is not None):
+            raise self.error
+
+    # Wait for all calls to finish and stop the writer threads. Pending calls are
+    # run even if an error is being raised in the generating thread.
+    def close(self):
+        for threadNum in range(len(self.threads)):
+            self.queues[threadNum].put(self.batches[threadNum])
+            self.batches[threadNum] = []
+            self.queues[threadNum].put(None)
+        for thread in self.threads:
+            thread.join()
+        if (self.error is not None):
+            raise self.error
+
+    # Writer thread: run batches of calls until None received. After an error,
+    # remaining batches are discarded so that the generator never blocks.
+    def run(self, batchQueue):
+        while True:
+            batch = batchQueue.get()
+            if (batch is None):
+                batchQueue.task_done()
+                break
+            if (self.error is None):
+                try:
+                    for function,args in batch:
+                        function(*args)
+                except BaseException as error:
+                    self.error = error
+            batchQueue.task_done()
+
+
+# ----- Compression -----
+
+# {name: (file extension, function opening a file for text I/O given fileName and mode)}
+COMPRESSIONS = {'gzip': ('.gz', lambda fileName, mode: gzip.open(fileName, mode, encoding='utf-8')),
+                'bz2': ('.bz2', lambda fileName, mode: bz2.open(fileName, mode, encoding='utf-8')),
+                'lzma': ('.xz', lambda fileName, mode: lzma.open(fileName, mode, encoding='utf-8'))}
+
+# Add a compression format, given its file extension and a function opening a file
+# for text I/O like gzip.open(fileName, mode)
+def RegisterCompression(name, extension, opener):
+    COMPRESSIONS[name] = (extension, opener)
+
+# Return extension of files with the given compression
+def CompressionExtension(compression):
+    if (compression == 'none'):
+        return ''
+    return COMPRESSIONS[compression][0]
+
+# Open fileName for writing text, compressed if compression is not "none". If append,
+# text is written after the file's contents, in a new compressed stream if compressed.
+def OpenOutput(fileName, compression = 'none', append = False):
+    if (compression == 'none'):
+        return open(fileName, 'a' if append else 'w', buffering=OUTPUT_BUFFER_SIZE, encoding='utf-8')
+    return COMPRESSIONS[compression][1](fileName, 'at' if append else 'wt')
+
+# Reopen output file fileName for writing text after its first offset bytes, discarding the rest
+def ReopenOutput(fileName, offset, compression = 'none'):
+    with open(fileName, 'r+b') as outputFile:
+        outputFile.truncate(offset)
+    return OpenOutput(fileName, compression, True)
+
+# Compress fileName into fileName plus the compression's extension, then remove fileName
+def CompressFile(fileName, compression):
+    with open(fileName, 'r', encoding='utf-8') as inputFile:
+        with COMPRESSIONS[compression][1](fileName + COMPRESSIONS[compression][0], 'wt') as outputFile:
+            shutil.copyfileobj(inputFile, outputFile, OUTPUT_BUFFER_SIZE)
+    os.remove(fileName)
+
+# Decompress fileName plus the compression's extension into fileName, then remove the compressed file
+def DecompressFile(fileName, compression):
+    with COMPRESSIONS[compression][1](fileName + COMPRESSIONS[compression][0], 'rt') as inputFile:
+        with open(fileName, 'w', encoding='utf-8') as outputFile:
+            shutil.copyfileobj(inputFile, outputFile, OUTPUT_BUFFER_SIZE)
+    os.remove(fileName + COMPRESSIONS[compression][0])
+
+
+# ----- Output Files -----
+
+# An output file holding a JSON array written one item at a time, as
+#   [
+#   item,
+#   item
+#   ]
+# optionally compressed. If segmentSize > 0 (characters) or segmentDuration > 0
+# (time units), the file is instead written as numbered segment files, each its own
+# JSON array, starting a new segment when the current one reaches segmentSize or
+# an item's time unit falls in the next window of segmentDuration time units. Full
+# segments are compressed by segmentCompressor (an executor), if given, so that
+# compression runs alongside generation. The segments are listed with their time
+# ranges in a manifest file, fileName + ".manifest", written by close().
+#
+# If state (returned by checkpoint) is given, the file is reopened to continue after
+# the items written when it was checkpointed. A file being written compressed is
+# continued after each checkpoint in a new compressed stream, e.g., a new gzip member,
+# which readers of the format read as part of the same file.
+class JSONArrayFile:
+    HEADER = '[\n' # written at start of file or segment
+    SEPARATOR = ',\n' # written between items
+    TERMINATOR = '' # written after each item
+    FOOTER = '\n]\n' # written at end of file or segment
+
+    def __init__(self, fileName, compression = 'none', segmentSize = 0, segmentDuration = 0, segmentCompressor = None, state = None):
+        self.fileName = fileName
+        self.compression = compression
+        self.segmentSize = segmentSize
+        self.segmentDuration = segmentDuration
+        self.segmentCompressor = segmentCompressor
+        self.segmented = ((segmentSize > 0) or (segmentDuration > 0))
+        self.segments = [] # list of manifest entries of segments, including current one
+        self.compressions = [] # futures of segment compressions
+        self.file = None
+        self.separator = ''
+        self.size = 0 # characters written to current segment
+        if (state is not None):
+            self.resume(state)
+        elif (not self.segmented):
+            self.file = OpenOutput(fileName + CompressionExtension(compression), compression)
+            self.file.write(self.HEADER)
+
+    def writeItem(self, text, timeUnit = 0):
+        if self.segmented:
+            if ((self.file is not None) and
+                (((self.segmentSize > 0) and (self.size >= self.segmentSize)) or
+                 ((self.segmentDuration > 0) and ((timeUnit // self.segmentDuration) != (self.segments[-1]['firstTimeUnit'] // self.segmentDuration))))):
+                self.endSegment()
+            if (self.file is None):
+                self.startSegment(timeUnit)
+            segment = self.segments[-1]
+            segment['lastTimeUnit'] = timeUnit
+            segment['numItems'] += 1
+            self.size += len(self.separator) + len(text) + len(self.TERMINATOR)
+        self.file.write(self.separator + text + self.TERMINATOR)
+        self.separator = self.SEPARATOR
+
+    # Return name of segment file segmentNum (from 1), before any compression
+    def segmentFileName(self, segmentNum):
+        return self.fileName + '.' + str(segmentNum).zfill(6)
+
+    def startSegment(self, timeUnit):
+        segmentFileName = self.segmentFileName(len(self.segments)+1)
+        self.segments.append({'file': os.path.basename(segmentFileName), 'firstTimeUnit': timeUnit, 'lastTimeUnit': timeUnit, 'numItems': 0})
+        if (self.segmentCompressor is None):
+            self.segments[-1]['file'] += CompressionExtension(self.compression)
+            self.file = OpenOutput(segmentFileName + CompressionExtension(self.compression), self.compression)
+        else:
+            self.file = OpenOutput(segmentFileName) # compressed when full
+        self.file.write(self.HEADER)
+        self.separator = ''
+        self.size = 0
+
+    def endSegment(self):
+        self.file.write(self.FOOTER)
+        self.file.close()
+        self.file = None
+        if ((self.segmentCompressor is not None) and (self.compression != 'none')):
+            segment = self.segments[-1]
+            segmentFileName = os.path.join(os.path.dirname(self.fileName), segment['file'])
+            self.compressions.append(self.segmentCompressor.submit(CompressFile, segmentFileName, self.compression))
+            segment['file'] += CompressionExtension(self.compression)
+
+    # End the array (or last segment) and, if segmented, wait for segment compression
+    # and write the manifest
+    def close(self):
+        if (not self.segmented):
+            self.file.write(self.FOOTER)
+            self.file.close()
+            return
+        if ((self.file is None) and (not self.segments)):
+            self.startSegment(0) # so that readers find an empty array
+        if (self.file is not None):
+            self.endSegment()
+        for compression in self.compressions:
+            compression.result()
+        manifest = {'compression': self.compression, 'segmentSize': self.segmentSize,
+                    'segmentDuration': self.segmentDuration, 'segments': self.segments}
+        with open(self.fileName + '.manifest', 'w') as manifestFile:
+            json.dump(manifest, manifestFile, indent=2)
+            manifestFile.write('\n')
+
+    # Return name and compression of the file or segment being written
+    def currentFile(self):
+        if (not self.segmented):
+            return self.fileName + CompressionExtension(self.compression), self.compression
+        if (self.segmentCompressor is None):
+            return self.segmentFileName(len(self.segments)) + CompressionExtension(self.compression), self.compression
+        return self.segmentFileName(len(self.segments)), 'none' # compressed when full
+
+    # Return state for reopening the file after the items written so far (see
+    # resume), which are first flushed to disk
+    def checkpoint(self):
+        offset = 0
+        if (self.file is not None):
+            fileName, compression = self.currentFile()
+            if (compression == 'none'):
+                self.file.flush()
+            else:
+                self.file.close() # ends the compressed stream
+            offset = os.path.getsize(fileName)
+            with open(fileName, 'ab') as syncFile:
+                os.fsync(syncFile.fileno())
+            if (compression != 'none'):
+                self.file = OpenOutput(fileName, compression, True)
+        return {'open': (self.file is not None), 'offset': offset, 'separator': self.separator, 'size': self.size,
+                'segments': [dict(segment) for segment in self.segments]}
+
+    # Reopen the file as it was when state was checkpointed, discarding items written
+    # since. Segments whose compression did not finish are compressed again, segments
+    # started after the checkpoint are removed, and the segment being written at the
+    # checkpoint is decompressed if it has since been compressed.
+    def resume(self, state):
+        self.separator = state['separator']
+        self.size = state['size']
+        self.segments = [dict(segment) for segment in state['segments']]
+        if (not self.segmented):
+            fileName, compression = self.currentFile()
+            self.file = ReopenOutput(fileName, state['offset'], compression)
+            return
+        extension = CompressionExtension(self.compression)
+        numClosed = len(self.segments)
+        if state['open']:
+            numClosed -= 1
+        if ((self.segmentCompressor is not None) and (self.compression != 'none')):
+            for segmentNum in range(1, numClosed+1):
+                if os.path.exists(self.segmentFileName(segmentNum)):
+                    self.compressions.append(self.segmentCompressor.submit(CompressFile, self.segmentFileName(segmentNum), self.compression))
+        segmentNum = len(self.segments) + 1
+        while (os.path.exists(self.segmentFileName(segmentNum)) or os.path.exists(self.segmentFileName(segmentNum) + extension)):
+            for fileName in (self.segmentFileName(segmentNum), self.segmentFileName(segmentNum) + extension):
+                if os.path.exists(fileName):
+                    os.remove(fileName)
+            segmentNum += 1
+        if state['open']:
+            fileName, compression = self.currentFile()
+            if ((self.segmentCompressor is not None) and (self.compression != 'none') and (not os.path.exists(fileName))):
+                DecompressFile(fileName, self.compression)
+            self.file = ReopenOutput(fileName, state['offset'], compression)
+
+# An output file in JSON Lines format, with each item on one line and no framing, so
+# that the file can be split at any line and every line written is complete. Items
+# must be written without newlines. Compressed and segmented like JSONArrayFile.
+class JSONLinesFile(JSONArrayFile):
+    HEADER = ''
+    SEPARATOR = ''
+    TERMINATOR = '\n'
+    FOOTER = ''
+
+# Open JSON output files (fileClass class objects) according to parameters. Keeps one
+# pool of threads that compress full segments (compression libraries release the
+# interpreter lock).
+class OutputFiles:
+    def __init__(self, parameters, fileClass = JSONArrayFile):
+        self.parameters = parameters
+        self.fileClass = fileClass
+        self.segmentCompressor = None
+        if ((parameters.outputCompression != 'none') and ((parameters.segmentSize > 0) or (parameters.segmentDuration > 0))):
+            self.segmentCompressor = ThreadPoolExecutor(max(1, parameters.compressionThreads), thread_name_prefix='gsg-compress')
+
+    # Open stream file, which is segmented if so configured, resuming it from state if given
+    def openStreamFile(self, fileName, state = None):
+        parameters = self.parameters
+        return self.fileClass(fileName, parameters.outputCompression, parameters.segmentSize, parameters.segmentDuration, self.segmentCompressor, state)
+
+    # Open file that is never segmented, e.g., the instances file, resuming it from state if given
+    def openFile(self, fileName, state = None):
+        return self.fileClass(fileName, self.parameters.outputCompression, state=state)
+
+    # Close files, then stop the compression threads
+    def close(self, files):
+        try:
+            for outputFile in files:
+                outputFile.close()
+        finally:
+            if self.segmentCompressor:
+                self.segmentCompressor.shutdown()
+
+
+# ----- Sinks -----
+
+# A sink receives the generated vertices, edges and tracked pattern instances and
+# writes them out in some format. The generator writes to every sink named in
+# parameters.outputFormats (see OpenSinks). A sink is opened for some of the streams
+# (streamNums, or all if None) and optionally the instances, so that streams can be
+# written by separate processes (see gsgParallel.py). Vertices and edges of a stream
+# are written in time order, and by a single thread at a time.
+#
+# A sink that can be checkpointed sets CHECKPOINTS, returns its state from
+# checkpoint(), and takes it as the state argument of its constructor to continue
+# after what it had written.
+class Sink:
+    FILES = True # whether the sink writes files (rather than, e.g., sending to another process)
+    CHECKPOINTS = False # whether the sink can be checkpointed
+
+    def __init__(self, parameters, streamNums = None, instances = True):
+        self.parameters = parameters
+        if (streamNums is None):
+            streamNums = range(1, parameters.numStreams+1)
+        self.streamNums = list(streamNums)
+        self.instances = instances
+
+    # Name of output file for stream streamNum
+    def streamFileName(self, streamNum):
+        return self.parameters.outputFilePrefix + '-s' + str(streamNum)
+
+    # Name of instances output file
+    def instancesFileName(self):
+        return self.parameters.outputFilePrefix + '-insts'
+
+    # Write vertex (a pattern's Vertex class object) with id vertexId to stream
+    # streamNum at timeUnit, whose output time is timestamp
+    def writeVertex(self, streamNum, timeUnit, timestamp, vertexId, vertex):
+        pass
+
+    # Write edge (a pattern's Edge class object) with id edgeId between vertex ids
+    # source and target to stream streamNum at timeUnit, whose output time is timestamp
+    def writeEdge(self, streamNum, timeUnit, timestamp, edgeId, source, target, edge):
+        pass
+
+    # Write an instance of the pattern with id patternId having the given vertex and edge ids
+    def writeInstance(self, patternId, vertexIds, edgeIds):
+        pass
+
+    # Return state of the output for resuming it after everything written so far,
+    # flushing it to disk. Raises ValueError if the output cannot be resumed.
+    def checkpoint(self):
+        raise ValueError('Cannot checkpoint ' + self.__class__.__name__ + ' output')
+
+    # End the output. Called once, even if generation failed, so files should be left valid.
+    def close(self):
+        pass
+
+# The stream and instances files as JSON arrays (see README.md), compressed and
+# segmented according to parameters
+class JSONSink(Sink):
+    FILE_CLASS = JSONArrayFile
+    CHECKPOINTS = True
+
+    def __init__(self, parameters, streamNums = None, instances = True, state = None):
+        Sink.__init__(self, parameters, streamNums, instances)
+        if (state is None):
+            state = {'streams': {}, 'instances': None}
+        self.outputFiles = OutputFiles(parameters, self.FILE_CLASS)
+        self.streamFiles = {} # {streamNum: JSONArrayFile class object}
+        for streamNum in self.streamNums:
+            self.streamFiles[streamNum] = self.outputFiles.openStreamFile(self.streamFileName(streamNum), state['streams'].get(streamNum)) # array of vertices and edges
+        self.instancesFile = None
+        if instances:
+            self.instancesFile = self.outputFiles.openFile(self.instancesFileName(), state['instances']) # array of pattern instances
+
+    def writeVertex(self, streamNum, timeUnit, timestamp, vertexId, vertex):
+        self.streamFiles[streamNum].writeItem('  {"vertex": {\n'
+                                              + '     "id": "' + str(vertexId) + '",\n'
+                                              + vertex.streamJSON
+                                              + '     "timestamp": "' + timestamp + '"}}', timeUnit)
+
+    def writeEdge(self, streamNum, timeUnit, timestamp, edgeId, source, target, edge):
+        self.streamFiles[streamNum].writeItem('  {"edge": {\n'
+                                              + '     "id": "' + str(edgeId) + '",\n'
+                                              + '     "source": "' + str(source) + '",\n'
+                                              + '     "target": "' + str(target) + '",\n'
+                                              + edge.streamJSON
+                                              + '     "timestamp": "' + timestamp + '"}}', timeUnit)
+
+    def writeInstance(self, patternId, vertexIds, edgeIds):
+        self.instancesFile.writeItem('  {"patternId": ' + JSONString(patternId) + ',\n'
+                                     + '   "vertexIds": [' + ', '.join(['"' + str(vertexId) + '"' for vertexId in vertexIds]) + '],\n'
+                                     + '   "edgeIds": [' + ', '.join(['"' + str(edgeId) + '"' for edgeId in edgeIds]) + ']\n  }')
+
+    def checkpoint(self):
+        return CheckpointFiles(self.streamFiles, self.instancesFile)
+
+    def close(self):
+        files = list(self.streamFiles.values())
+        if self.instancesFile:
+            files.append(self.instancesFile)
+        self.outputFiles.close(files)
+
+# The stream and instances files in JSON Lines format, one object per line
+class JSONLinesSink(JSONSink):
+    FILE_CLASS = JSONLinesFile
+
+    def writeVertex(self, streamNum, timeUnit, timestamp, vertexId, vertex):
+        self.streamFiles[streamNum].writeItem('{"vertex": {"id": "' + str(vertexId) + '"' + vertex.streamLineJSON
+                                              + ', "timestamp": "' + timestamp + '"}}', timeUnit)
+
+    def writeEdge(self, streamNum, timeUnit, timestamp, edgeId, source, target, edge):
+        self.streamFiles[streamNum].writeItem('{"edge": {"id": "' + str(edgeId) + '", "source": "' + str(source) + '", "target": "' + str(target) + '"'
+                                              + edge.streamLineJSON + ', "timestamp": "' + timestamp + '"}}', timeUnit)
+
+    def writeInstance(self, patternId, vertexIds, edgeIds):
+        self.instancesFile.writeItem('{"patternId": ' + JSONString(patternId)
+                                     + ', "vertexIds": [' + ', '.join(['"' + str(vertexId) + '"' for vertexId in vertexIds])
+                                     + '], "edgeIds": [' + ', '.join(['"' + str(edgeId) + '"' for edgeId in edgeIds]) + ']}')
+
+# The stream and instances files in binary columnar format (see gsgBinary.py)
+class BinarySink(Sink):
+    CHECKPOINTS = True
+
+    def __init__(self, parameters, streamNums = None, instances = True, state = None):
+        Sink.__init__(self, parameters, streamNums, instances)
+        if (state is None):
+            state = {'streams': {}, 'instances': None}
+        metadata = {'outputTimeFormat': parameters.outputTimeFormat, 'secondsPerUnitTime': parameters.secondsPerUnitTime,
+                    'startTime': parameters.startTime.strftime('%Y-%m-%d %H:%M:%S')} # for converting time units
+        self.streamFiles = {} # {streamNum: BinaryStreamFile class object}
+        for streamNum in self.streamNums:
+            self.streamFiles[streamNum] = BinaryStreamFile(self.streamFileName(streamNum), metadata, state['streams'].get(streamNum))
+        self.instancesFile = None
+        if instances:
+            self.instancesFile = BinaryInstancesFile(self.instancesFileName(), metadata, state['instances'])
+
+    def writeVertex(self, streamNum, timeUnit, timestamp, vertexId, vertex):
+        self.streamFiles[streamNum].writeVertex(timeUnit, vertexId, vertex)
+
+    def writeEdge(self, streamNum, timeUnit, timestamp, edgeId, source, target, edge):
+        self.streamFiles[streamNum].writeEdge(timeUnit, edgeId, source, target, edge)
+
+    def writeInstance(self, patternId, vertexIds, edgeIds):
+        self.instancesFile.writeInstance(patternId, vertexIds, edgeIds)
+
+    def checkpoint(self):
+        return CheckpointFiles(self.streamFiles, self.instancesFile)
+
+    def close(self):
+        files = list(self.streamFiles.values())
+        if self.instancesFile:
+            files.append(self.instancesFile)
+        CloseAll(files)
+
+# Each stream converted by an exporter (EXPORTER, see gsgExport.py), written to the
+# stream file name plus the exporter's extension. Instances are not written.
+class ExportSink(Sink):
+    EXPORTER = None
+
+    def __init__(self, parameters, streamNums = None, instances = True):
+        Sink.__init__(self, parameters, streamNums, instances)
+        self.exporters = {} # {streamNum: exporter}
+        for streamNum in self.streamNums:
+            self.exporters[streamNum] = self.EXPORTER(self.streamFileName(streamNum) + self.EXPORTER.EXTENSION)
+
+    def writeVertex(self, streamNum, timeUnit, timestamp, vertexId, vertex):
+        item = {'id': str(vertexId)}
+        if vertex.type:
+            item['type'] = vertex.type
+        item['attributes'] = vertex.attributes
+        item['timestamp'] = timestamp
+        self.exporters[streamNum].writeVertex(item)
+
+    def writeEdge(self, streamNum, timeUnit, timestamp, edgeId, source, target, edge):
+        item = {'id': str(edgeId), 'source': str(source), 'target': str(target)}
+        if edge.type:
+            item['type'] = edge.type
+        item['attributes'] = edge.attributes
+        if edge.directed:
+            item['directed'] = 'true'
+        else:
+            item['directed'] = 'false'
+        item['timestamp'] = timestamp
+        self.exporters[streamNum].writeEdge(item)
+
+    def close(self):
+        CloseAll(list(self.exporters.values()))
+
+class GraphMLSink(ExportSink):
+    EXPORTER = GraphMLExporter
+
+class GEXFSink(ExportSink):
+    EXPORTER = GEXFExporter
+
+class CSVSink(ExportSink):
+    EXPORTER = CSVExporter
+
+# The instances as an indexed SQLite ground-truth store (see gsgTruth.py), written to
+# the instances file name plus ".sqlite". Streams are not written.
+class SQLiteSink(Sink):
+    CHECKPOINTS = True
+
+    def __init__(self, parameters, streamNums = None, instances = True, state = None):
+        Sink.__init__(self, parameters, streamNums, instances)
+        self.storeFile = None
+        if instances:
+            self.storeFile = TruthStoreFile(self.instancesFileName() + '.sqlite', state)
+
+    def writeInstance(self, patternId, vertexIds, edgeIds):
+        self.storeFile.writeInstance(patternId, vertexIds, edgeIds)
+
+    def checkpoint(self):
+        if self.storeFile:
+            return self.storeFile.checkpoint()
+        return None
+
+    def close(self):
+        if self.storeFile:
+            self.storeFile.close()
+
+# Each stream written to a shared-memory ring buffer (see gsgSharedMemory.py) named
+# after the stream file name without its directory, of parameters.ringSize records,
+# for a consumer process on the same host, waiting up to parameters.ringTimeout
+# seconds for it to attach. No files are written.
+class SharedMemorySink(Sink):
+    FILES = False
+
+    def __init__(self, parameters, streamNums = None, instances = True):
+        Sink.__init__(self, parameters, streamNums, instances)
+        metadata = {'outputTimeFormat': parameters.outputTimeFormat, 'secondsPerUnitTime': parameters.secondsPerUnitTime,
+                    'startTime': parameters.startTime.strftime('%Y-%m-%d %H:%M:%S')} # for converting time units
+        self.rings = {} # {streamNum: RingWriter class object}
+        try:
+            for streamNum in self.streamNums:
+                self.rings[streamNum] = RingWriter(os.path.basename(self.streamFileName(streamNum)), parameters.ringSize,
+                                                   dict(metadata, streamNum=streamNum), parameters.ringTimeout)
+        except BaseException:
+            CloseAll(list(self.rings.values()))
+            raise
+
+    def writeVertex(self, streamNum, timeUnit, timestamp, vertexId, vertex):
+        self.rings[streamNum].writeVertex(timeUnit, vertexId, vertex)
+
+    def writeEdge(self, streamNum, timeUnit, timestamp, edgeId, source, target, edge):
+        self.rings[streamNum].writeEdge(timeUnit, edgeId, source, target, edge)
+
+    def close(self):
+        if any([ring.abandoned for ring in self.rings.values()]):
+            for ring in self.rings.values():
+                ring.abandoned = True # generation failed for want of a consumer, so wait for no others
+        CloseAll(list(self.rings.values()))
+
+# {output format name: Sink subclass}
+SINKS = {'json': JSONSink, 'jsonl': JSONLinesSink, 'binary': BinarySink,
+         'graphml': GraphMLSink, 'gexf': GEXFSink, 'csv': CSVSink, 'sqlite': SQLiteSink, 'shm': SharedMemorySink}
+
+# Add an output format written by sinkClass, a subclass of Sink
+def RegisterSink(name, sinkClass):
+    SINKS[name] = sinkClass
+
+# Return list of sinks for parameters.outputFormats, for streams streamNums (all if
+# None) and, if instances is True, the instances. If states is given, states[i] is
+# the checkpointed state from which to resume the sink of the i'th format.
+def OpenSinks(parameters, streamNums = None, instances = True, states = None):
+    sinks = []
+    try:
+        for formatNum in range(len(parameters.outputFormats)):
+            sinkClass = SINKS[parameters.outputFormats[formatNum]]
+            if (states is None):
+                sinks.append(sinkClass(parameters, streamNums, instances))
+            else:
+                sinks.append(sinkClass(parameters, streamNums, instances, states[formatNum]))
+    except BaseException:
+        CloseAll(sinks)
+        raise
+    return sinks
+
+# Close each of objects (sinks or files), even if closing another fails, then raise
+# the first error, if any
+def CloseAll(objects):
+    error = None
+    for closeable in objects:
+        try:
+            closeable.close()
+        except BaseException as closeError:
+            if (error is None):
+                error = closeError
+    if (error is not None):
+        raise error
+
+# Return checkpoint states of a sink's stream files ({streamNum: file}) and instances
+# file (or None), as the sink's state
+def CheckpointFiles(streamFiles, instancesFile):
+    state = {'streams': {}, 'instances': None}
+    for streamNum,streamFile in streamFiles.items():
+        state['streams'][streamNum] = streamFile.checkpoint()
+    if instancesFile:
+        state['instances'] = instancesFile.checkpoint()
+    return state
+
+# Return value as a quoted JSON string, escaping quotes, backslashes and control characters
+def JSONString(value):
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+# ----- Reading Output -----
+
+# Return list of the physical files holding output file fileName (e.g., "out-s1"),
+# which may have been written compressed or as segments listed in a manifest
+def OutputFileParts(fileName):
+    if os.path.exists(fileName + '.manifest'):
+        with open(fileName + '.manifest') as manifestFile:
+            manifest = json.load(manifestFile)
+        directory = os.path.dirname(fileName)
+        return [os.path.join(directory, segment['file']) for segment in manifest['segments']]
+    if os.path.exists(fileName):
+        return [fileName]
+    for compression,(extension,opener) in COMPRESSIONS.items():
+        if os.path.exists(fileName + extension):
+            return [fileName + extension]
+    raise FileNotFoundError('No output file ' + fileName)
+
+# Return True if output file fileName exists in some form (see OutputFileParts)
+def OutputFileExists(fileName):
+    try:
+        OutputFileParts(fileName)
+    except FileNotFoundError:
+        return False
+    return True
+
+# Return list of stream files named by inputName: the file itself, or the stream
+# files of the run with output file prefix inputName
+def StreamFileNames(inputName):
+    if OutputFileExists(inputName):
+        return [inputName]
+    fileNames = []
+    while OutputFileExists(inputName + '-s' + str(len(fileNames)+1)):
+        fileNames.append(inputName + '-s' + str(len(fileNames)+1))
+    if (not fileNames):
+        raise FileNotFoundError('No stream file or output prefix ' + inputName)
+    return fileNames
+
+# Open one physical output file for reading text, decompressing according to its extension
+def OpenOutputPart(fileName):
+    for compression,(extension,opener) in COMPRESSIONS.items():
+        if fileName.endswith(extension):
+            return opener(fileName, 'rt')
+    return open(fileName, encoding='utf-8')
+
+# Yield the lines of output file fileName across all its parts. Each segment is a
+# complete JSON array (or JSON Lines file), so readers that skip the "[" and "]"
+# lines see one sequence.
+def ReadOutputLines(fileName):
+    for partName in OutputFileParts(fileName):
+        with OpenOutputPart(partName) as partFile:
+            for line in partFile:
+                yield line
+
+# Yield the items of output file fileName across all its parts, which may hold JSON
+# arrays or JSON Lines. Items are parsed one at a time, so memory use does not grow
+# with the size of the file.
+def ReadOutputItems(fileName):
+    for partName in OutputFileParts(fileName):
+        with OpenOutputPart(partName) as partFile:
+            firstLine = partFile.readline()
+            if firstLine.lstrip().startswith('['):
+                for item in ReadJSONArrayItems(partFile, firstLine):
+                    yield item
+            else:
+                for line in itertools.chain([firstLine], partFile):
+                    if line.strip():
+                        yield json.loads(line)
+
+# Yield the items of the JSON array in textFile, parsing one item at a time from a
+# buffer of the text read so far (starting with text), which holds at most one item
+# and one chunk of chunkSize characters.
+def ReadJSONArrayItems(textFile, text = '', chunkSize = 1 << 16):
+    decoder = json.JSONDecoder()
+    buffer = text
+    position = 0
+    inArray = False
+    while True:
+        while ((position < len(buffer)) and (buffer[position] in ' \t\r\n')):
+            position += 1
+        if (position == len(buffer)):
+            chunk = textFile.read(chunkSize)
+            if (not chunk):
+                raise ValueError('Unexpected end of JSON array')
+            buffer = chunk
+            position = 0
+            continue
+        char = buffer[position]
+        if (not inArray):
+            if (char != '['):
+                raise ValueError('Expected JSON array')
+            inArray = True
+            position += 1
+        elif (char == ']'):
+            return
+        elif (char == ','):
+            position += 1
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                item, end = None, len(buffer) # assume incomplete; error raised if nothing more to read
+            if (end == len(buffer)):
+                # Item may continue in the next chunk
+                chunk = textFile.read(chunkSize)
+                if chunk:
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    continue
+                if (item is None):
+                    decoder.raw_decode(buffer, position) # raises the error
+            yield item
+            position = end
+
+# Return list of (start, end) byte offsets splitting an uncompressed JSON Lines file
+# into about numChunks chunks of whole lines, so that the chunks can be read in
+# parallel with ReadJSONLines
+def JSONLinesChunks(fileName, numChunks):
+    fileSize = os.path.getsize(fileName)
+    offsets = [0]
+    with open(fileName, 'rb') as linesFile:
+        for chunkNum in range(1, numChunks):
+            offset = max(offsets[-1], (fileSize * chunkNum) // numChunks)
+            if (offset > 0):
+                linesFile.seek(offset - 1)
+                linesFile.readline() # move to start of next line
+                offset = linesFile.tell()
+            if ((offset < fileSize) and (offset > offsets[-1])):
+                offsets.append(offset)
+    offsets.append(fileSize)
+    return [(offsets[chunkNum], offsets[chunkNum+1]) for chunkNum in range(len(offsets)-1)]
+
+# Yield the items of an uncompressed JSON Lines file on the lines starting at byte
+# offsets start through end-1 (see JSONLinesChunks). Without end, reads to end of file.
+def ReadJSONLines(fileName, start = 0, end = None):
+    with open(fileName, 'rb') as linesFile:
+        linesFile.seek(start)
+        offset = start
+        for line in linesFile:
+            if ((end is not None) and (offset >= end)):
+                break
+            offset += len(line)
+            if line.strip():
+                yield json.loads(line)
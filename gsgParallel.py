@@ -0,0 +1,273 @@
+# gsgParallel.py
+#
+# Graph Stream Generator v1.0
+#
+# Parallel generation over a process pool.
+#
+# Patterns are split into a fixed number of shards, independent of the number of
+# worker processes, so the output depends only on the seed and number of shards.
+#
+# Phase 1: Patterns whose vertices are all new never depend on other patterns. They
+# are assigned round-robin to shards, and each shard is generated by a worker with its
+# own random number generator seeded from (seed, shard number). Vertex and edge ids are
+# numbered from 1 within each shard, and are later shifted by the total number of ids
+# used by earlier shards, so each shard gets a contiguous id range.
+#
+# Phase 2: Patterns with old vertices draw from the vertices already written to a
+# stream by all patterns, so they cannot be split up. They are generated together by
+# one generator with its own seed, whose ids follow all phase 1 ids. It is given the
+# phase 1 vertices in time order (see GraphStreamGenerator.setExternalVertices), so at
+# each time unit its old vertex pools hold exactly the vertices written earlier by any
+# pattern, as in sequential generation.
+#
+# Finally, the vertices and edges of each stream are merged from all shards in time
+# order (ties by shard number, phase 2 last) and written to the usual stream files,
+# one worker per stream. Instances are merged by trigger time and pattern order.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import os
+import io
+import random
+import shutil
+import heapq
+import tempfile
+import logging
+import contextlib
+import multiprocessing
+from gsgClasses import *
+from gsgGenerator import *
+from gsgOutput import OUTPUT_BUFFER_SIZE, Sink, OpenSinks, CloseAll
+from gsgMetrics import logger
+
+
+# ----- Shards -----
+
+# Return seed of random number generator for shard shardNum of a run with seed
+def ShardSeed(seed, shardNum):
+    return str(seed) + '/' + str(shardNum)
+
+# Generator for one shard that writes its vertices, edges and tracked instances to
+# tab-separated temporary files in shardDir, with pattern vertices and edges referred
+# to by (pattern number, element index) instead of rendered as JSON.
+class ShardGenerator(GraphStreamGenerator):
+    def __init__(self, parameters, patterns, patternNums, seed, shardDir, firstVertexId = 0, firstEdgeId = 0):
+        self.shardDir = shardDir
+        self.firstVertexId = firstVertexId
+        self.firstEdgeId = firstEdgeId
+        self.patternNums = {} # {Pattern object: pattern number in input}
+        self.elementKeys = {} # {Vertex or Edge object: (pattern number, index in pattern)}
+        for pattern,patternNum in zip(patterns, patternNums):
+            self.patternNums[pattern] = patternNum
+            for index in range(len(pattern.vertices)):
+                self.elementKeys[pattern.vertices[index]] = str(patternNum) + '\t' + str(index)
+            for index in range(len(pattern.edges)):
+                self.elementKeys[pattern.edges[index]] = str(patternNum) + '\t' + str(index)
+        self.currentTrigger = '' # time unit and pattern number of instance being added
+        GraphStreamGenerator.__init__(self, parameters, patterns, seed)
+        self.checkpointInterval = 0 # parallel runs are not checkpointed
+        self.progressInterval = 0 # nor their shards' progress logged
+        self.logLevel = logging.DEBUG
+
+    def reset(self):
+        GraphStreamGenerator.reset(self)
+        self.numVertices = self.firstVertexId
+        self.numEdges = self.firstEdgeId
+
+    def addPatternInstance(self, pattern, timeUnit):
+        self.currentTrigger = str(timeUnit) + '\t' + str(self.patternNums[pattern])
+        GraphStreamGenerator.addPatternInstance(self, pattern, timeUnit)
+
+    def openFiles(self):
+        self.sinks = [ShardSink(self.parameters, self.shardDir, self.elementKeys, self)]
+
+# Sink of a ShardGenerator, writing tab-separated temporary files in shardDir
+class ShardSink(Sink):
+    def __init__(self, parameters, shardDir, elementKeys, generator):
+        Sink.__init__(self, parameters)
+        self.elementKeys = elementKeys
+        self.generator = generator # for the trigger of the instance being written
+        self.streamFiles = {} # {streamNum: file}
+        for streamNum in self.streamNums:
+            self.streamFiles[streamNum] = open(os.path.join(shardDir, 's' + str(streamNum)), 'w', buffering=OUTPUT_BUFFER_SIZE)
+        self.instancesFile = open(os.path.join(shardDir, 'insts'), 'w', buffering=OUTPUT_BUFFER_SIZE)
+
+    # Line: triggerTime, patternNum, comma-separated vertex ids, comma-separated edge ids
+    def writeInstance(self, patternId, vertexIds, edgeIds):
+        self.instancesFile.write(self.generator.currentTrigger + '\t'
+                                 + ','.join([str(vertexId) for vertexId in vertexIds]) + '\t'
+                                 + ','.join([str(edgeId) for edgeId in edgeIds]) + '\n')
+
+    # Line: timeUnit, "v", id, patternNum, vertex index
+    def writeVertex(self, streamNum, timeUnit, timestamp, vertexId, vertex):
+        self.streamFiles[streamNum].write(str(timeUnit) + '\tv\t' + str(vertexId) + '\t' + self.elementKeys[vertex] + '\n')
+
+    # Line: timeUnit, "e", id, patternNum, edge index, source id, target id
+    def writeEdge(self, streamNum, timeUnit, timestamp, edgeId, source, target, edge):
+        self.streamFiles[streamNum].write(str(timeUnit) + '\te\t' + str(edgeId) + '\t' + self.elementKeys[edge] + '\t'
+                                          + str(source) + '\t' + str(target) + '\n')
+
+    def close(self):
+        CloseAll(list(self.streamFiles.values()) + [self.instancesFile])
+
+# Shard description passed to workers
+class Shard:
+    def __init__(self, shardNum, patternNums, seed, shardDir):
+        self.shardNum = shardNum
+        self.patternNums = patternNums # numbers (indices in input) of the shard's patterns
+        self.seed = seed
+        self.shardDir = shardDir
+        self.firstVertexId = 0
+        self.firstEdgeId = 0
+        self.vertexOffset = 0 # added to the shard's vertex ids when merged
+        self.edgeOffset = 0 # added to the shard's edge ids when merged
+        self.numVertices = 0 # number of vertex ids used by the shard
+        self.numEdges = 0
+
+# Generate one shard with its patterns parsed from jsonData. Returns the shard with
+# its numbers of vertices and edges filled in.
+def GenerateShard(parameters, jsonPatterns, shard, externalVertices = None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        patterns = ParsePatterns([jsonPatterns[patternNum] for patternNum in shard.patternNums], parameters)
+    os.makedirs(shard.shardDir, exist_ok=True)
+    generator = ShardGenerator(parameters, patterns, shard.patternNums, shard.seed, shard.shardDir,
+                               shard.firstVertexId, shard.firstEdgeId)
+    if externalVertices is not None:
+        generator.setExternalVertices(externalVertices)
+    generator.generate()
+    shard.numVertices = generator.numVertices - shard.firstVertexId
+    shard.numEdges = generator.numEdges - shard.firstEdgeId
+    return shard
+
+def GenerateShardWorker(args):
+    return GenerateShard(*args)
+
+
+# ----- Merging -----
+
+# Yield (timeUnit, line fields) for each vertex and edge of a shard in a stream, with
+# ids shifted by the shard's offsets
+def ShardStreamRecords(shard, streamNum):
+    with open(os.path.join(shard.shardDir, 's' + str(streamNum))) as shardFile:
+        for line in shardFile:
+            fields = line.rstrip('\n').split('\t')
+            fields[2] = int(fields[2]) + ((shard.vertexOffset) if (fields[1] == 'v') else (shard.edgeOffset))
+            if (fields[1] == 'e'):
+                fields[5] = int(fields[5]) + shard.vertexOffset
+                fields[6] = int(fields[6]) + shard.vertexOffset
+            yield int(fields[0]), fields
+
+# Yield (timeUnit, streamNum, vertexId) for each vertex of a shard in a stream
+def ShardStreamVertices(shard, streamNum):
+    for timeUnit,fields in ShardStreamRecords(shard, streamNum):
+        if (fields[1] == 'v'):
+            yield timeUnit, streamNum, fields[2]
+
+# Yield (timeUnit, streamNum, vertexId) for each vertex written by the shards, in time order
+def ShardVertices(shards, numStreams):
+    vertexIterators = []
+    for shard in shards:
+        for streamNum in range(1, numStreams+1):
+            vertexIterators.append(ShardStreamVertices(shard, streamNum))
+    return heapq.merge(*vertexIterators, key=lambda vertex: vertex[0])
+
+# Write stream streamNum to the sinks by merging shards in time order
+def MergeStream(parameters, patterns, shards, streamNum):
+    timeStrCache = (-1, '')
+    sinks = OpenSinks(parameters, [streamNum], False)
+    try:
+        records = heapq.merge(*[ShardStreamRecords(shard, streamNum) for shard in shards], key=lambda record: record[0])
+        for timeUnit,fields in records:
+            if (timeUnit != timeStrCache[0]):
+                timeStrCache = (timeUnit, TimeStr(timeUnit, parameters))
+            pattern = patterns[int(fields[3])]
+            if (fields[1] == 'v'):
+                vertex = pattern.vertices[int(fields[4])]
+                for sink in sinks:
+                    sink.writeVertex(streamNum, timeUnit, timeStrCache[1], fields[2], vertex)
+            else:
+                edge = pattern.edges[int(fields[4])]
+                for sink in sinks:
+                    sink.writeEdge(streamNum, timeUnit, timeStrCache[1], fields[2], fields[5], fields[6], edge)
+    finally:
+        CloseAll(sinks)
+
+def MergeStreamWorker(args):
+    parameters, jsonPatterns, shards, streamNum = args
+    with contextlib.redirect_stdout(io.StringIO()):
+        patterns = ParsePatterns(jsonPatterns, parameters)
+    MergeStream(parameters, patterns, shards, streamNum)
+
+# Yield (triggerTime, patternNum, vertex ids, edge ids) for each tracked instance of a shard
+def ShardInstances(shard):
+    with open(os.path.join(shard.shardDir, 'insts')) as shardFile:
+        for line in shardFile:
+            fields = line.rstrip('\n').split('\t')
+            vertexIds = [str(int(vertexId) + shard.vertexOffset) for vertexId in fields[2].split(',') if vertexId]
+            edgeIds = [str(int(edgeId) + shard.edgeOffset) for edgeId in fields[3].split(',') if edgeId]
+            yield int(fields[0]), int(fields[1]), vertexIds, edgeIds
+
+# Write instances to the sinks by merging shards by trigger time and pattern order
+def MergeInstances(parameters, patterns, shards):
+    sinks = OpenSinks(parameters, [], True)
+    try:
+        for triggerTime,patternNum,vertexIds,edgeIds in heapq.merge(*[ShardInstances(shard) for shard in shards],
+                                                                        key=lambda instance: instance[0:2]):
+            for sink in sinks:
+                sink.writeInstance(patterns[patternNum].id, vertexIds, edgeIds)
+    finally:
+        CloseAll(sinks)
+
+
+# ----- Parallel Generation -----
+
+# Generate the streams for the patterns in jsonPatterns (the input file's "patterns"
+# array, already parsed into patterns) using numShards shards over numWorkers processes
+def GenerateParallel(parameters, jsonPatterns, patterns, numShards, numWorkers):
+    logger.info('Generating streams in parallel (' + str(numShards) + ' shards, ' + str(numWorkers) + ' workers)...')
+    RemoveCheckpoint(parameters)
+    seed = parameters.seed
+    if (seed is None):
+        seed = random.SystemRandom().randrange(1 << 63)
+    newPatternNums = []
+    oldPatternNums = []
+    for patternNum in range(len(patterns)):
+        if all(patterns[patternNum].compiled.vertexNew):
+            newPatternNums.append(patternNum)
+        else:
+            oldPatternNums.append(patternNum)
+    outputDir = os.path.dirname(os.path.abspath(parameters.outputFilePrefix))
+    tempDir = tempfile.mkdtemp(prefix='gsg-shards-', dir=outputDir)
+    try:
+        shards = []
+        for shardNum in range(numShards):
+            shardPatternNums = newPatternNums[shardNum::numShards]
+            if shardPatternNums:
+                shards.append(Shard(shardNum, shardPatternNums, ShardSeed(seed, shardNum),
+                                    os.path.join(tempDir, str(shardNum))))
+        with multiprocessing.Pool(numWorkers) as pool:
+            # Phase 1: shards of patterns having only new vertices
+            shards = pool.map(GenerateShardWorker, [(parameters, jsonPatterns, shard) for shard in shards])
+            vertexOffset = 0
+            edgeOffset = 0
+            for shard in shards:
+                shard.vertexOffset = vertexOffset
+                shard.edgeOffset = edgeOffset
+                vertexOffset += shard.numVertices
+                edgeOffset += shard.numEdges
+            # Phase 2: patterns having old vertices, given the phase 1 vertices in time order
+            if oldPatternNums:
+                oldShard = Shard(numShards, oldPatternNums, ShardSeed(seed, numShards), os.path.join(tempDir, 'old'))
+                oldShard.firstVertexId = vertexOffset
+                oldShard.firstEdgeId = edgeOffset
+                GenerateShard(parameters, jsonPatterns, oldShard, ShardVertices(shards, parameters.numStreams))
+                shards.append(oldShard)
+            # Merge shards into stream and instances files
+            logger.info('Merging shards...')
+            pool.map(MergeStreamWorker, [(parameters, jsonPatterns, shards, streamNum)
+                                         for streamNum in range(1, parameters.numStreams+1)])
+            MergeInstances(parameters, patterns, shards)
+    finally:
+        shutil.rmtree(tempDir, ignore_errors=True)
@@ -0,0 +1,425 @@
+# gsgSharedMemory.py
+#
+# Graph Stream Generator v1.0
+#
+# Shared-memory ring buffers carrying the vertices and edges of each stream to
+# consumers in other processes on the same host, and a reader for them.
+#
+# The "shm" output format writes stream N to a multiprocessing.shared_memory block
+# named <name>-s<N>, where <name> is the last part of outputFilePrefix (e.g.,
+# "out-s1"). The block holds
+#
+#   a header of RING_HEADER_FIELDS unsigned 64-bit integers (see RING_* below),
+#   a table of RING_TABLE_SIZE bytes of JSON lines: first the stream's metadata, then
+#       each type (["type", name]) and attribute set (["attributes", {...}]) when first
+#       used, so each is published once, before any record referring to it, and
+#   ringSize records of RECORD_STRUCT, in native byte order: time unit, id, source and
+#       target (-1 for vertices), type code (index among the published types, or -1),
+#       attributes code (index among the published attribute sets), and kind (as in
+#       gsgBinary.py: 0 = vertex, 1 = undirected edge, 2 = directed edge).
+#
+# Each ring has one writer and one reader. Before writing the first record (or
+# ending an empty stream), the writer waits for a reader to attach, logging a warning
+# if none has after RING_ATTACH_WARNING_SECONDS, and failing with TimeoutError after
+# ringTimeout seconds (unless 0). Record i is at slot i mod ringSize. The writer fills
+# slots up to the reader's position, and then waits for the reader (back-pressure), so
+# generation runs no faster than the slowest consumer. Once written, the writer advances the written count
+# in the header; once done with records, the reader advances the read count. The
+# counters are aligned 64-bit words, each written by one process only. When the
+# stream ends, the writer sets the closed flag and waits for the reader to read all
+# records before removing the block. If the reader detaches early, the rest of the
+# stream is dropped. A block of the same name left by a run that ended without
+# removing it (its writer process no longer running) is replaced, but that of a
+# running writer is not.
+#
+# RingReader maps the block and returns the available records as views of the shared
+# memory (a NumPy structured array if NumPy is installed, or else a memoryview of the
+# record bytes, which RECORD_STRUCT.iter_unpack decodes), so nothing is copied until
+# the consumer reads the fields it needs. For example:
+#
+#   reader = RingReader('out-s1')
+#   while True:
+#       records = reader.records()
+#       if (len(records) == 0):
+#           break # stream ended
+#       ... records['id'], records['time'], ...
+#       reader.release(len(records))
+#   reader.close()
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import os
+import sys
+import json
+import time
+import struct
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory, resource_tracker
+from gsgMetrics import logger
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RING_FORMAT_VERSION = 1
+RING_TABLE_SIZE = 1 << 20 # bytes of each ring's table of metadata, types and attribute sets
+RING_WAIT_SECONDS = 0.0005 # sleep between polls of a full or empty ring
+RING_ATTACH_WARNING_SECONDS = 1.0 # wait for a reader to attach before logging a warning
+
+# Header fields
+RING_HEADER_FIELDS = 8
+RING_WRITTEN = 0 # number of records written
+RING_READ = 1 # number of records read
+RING_CLOSED = 2 # 1 once the writer has written all records
+RING_CAPACITY = 3 # number of record slots
+RING_TABLE_LENGTH = 4 # number of bytes of the table published
+RING_READER = 5 # READER_NONE, READER_ATTACHED or READER_DETACHED
+RING_WRITER_PID = 6 # process id of the writer
+RING_VERSION = 7 # RING_FORMAT_VERSION, set last when the ring is created
+
+READER_NONE = 0
+READER_ATTACHED = 1
+READER_DETACHED = 2
+
+RECORD_FIELDS = [('time', 'q'), ('id', 'q'), ('source', 'q'), ('target', 'q'), ('type', 'i'), ('attributes', 'i'), ('kind', 'b')]
+RECORD_STRUCT = struct.Struct('=qqqqiib7x') # padded to a multiple of 8 bytes
+RECORD_SIZE = RECORD_STRUCT.size
+
+RING_TABLE_OFFSET = RING_HEADER_FIELDS * 8
+RING_RECORDS_OFFSET = RING_TABLE_OFFSET + RING_TABLE_SIZE
+
+VERTEX_KIND = 0
+UNDIRECTED_EDGE_KIND = 1
+DIRECTED_EDGE_KIND = 2
+
+
+# Return NumPy dtype of a record, or None without NumPy
+def RecordDType():
+    if numpy is None:
+        return None
+    offsets = []
+    offset = 0
+    for name,typecode in RECORD_FIELDS:
+        offsets.append(offset)
+        offset += struct.calcsize(typecode)
+    return numpy.dtype({'names': [name for name,typecode in RECORD_FIELDS],
+                        'formats': ['=' + typecode for name,typecode in RECORD_FIELDS],
+                        'offsets': offsets, 'itemsize': RECORD_SIZE})
+
+
+# ----- Writing -----
+
+# Ring buffer of one stream, created by its writer, which waits up to timeout seconds
+# (forever if 0) for a reader to attach. Types and attribute sets are
+# dictionary-encoded as in gsgBinary.BinaryStreamFile, and published in the table.
+class RingWriter:
+    def __init__(self, name, capacity, metadata, timeout = 0):
+        size = RING_RECORDS_OFFSET + capacity * RECORD_SIZE
+        try:
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            RemoveStaleRing(name)
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+        self.name = name
+        self.capacity = capacity
+        self.timeout = timeout
+        self.attached = False # whether a reader has attached
+        self.abandoned = False # whether no longer waiting for a reader to attach (e.g., none did within timeout)
+        self.header = self.memory.buf[:RING_TABLE_OFFSET].cast('Q')
+        self.table = self.memory.buf[RING_TABLE_OFFSET:RING_RECORDS_OFFSET]
+        self.records = self.memory.buf[RING_RECORDS_OFFSET:size]
+        self.tableLength = 0
+        self.numWritten = 0
+        self.numFree = capacity # slots known to be free, without reading the reader's position
+        self.dropping = False # whether the reader detached, so records are dropped
+        self.types = {} # {type: code}
+        self.attributeCodes = {} # {attributes as JSON: code}
+        self.elementCodes = {} # {Vertex or Edge class object: (kind, type code, attributes code)}
+        self.publish(dict(metadata, byteorder=sys.byteorder, recordFields=RECORD_FIELDS, recordSize=RECORD_SIZE))
+        self.header[RING_CAPACITY] = capacity
+        self.header[RING_WRITER_PID] = os.getpid()
+        self.header[RING_VERSION] = RING_FORMAT_VERSION
+
+    # Append entry to the table as a line of JSON
+    def publish(self, entry):
+        line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+        if (self.tableLength + len(line) > RING_TABLE_SIZE):
+            raise ValueError('Table of types and attributes of shared memory ' + self.name + ' is full')
+        self.table[self.tableLength:self.tableLength+len(line)] = line
+        self.tableLength += len(line)
+        self.header[RING_TABLE_LENGTH] = self.tableLength
+
+    def writeVertex(self, timeUnit, vertexId, vertex):
+        codes = self.elementCodes.get(vertex)
+        if (codes is None):
+            codes = self.addElement(vertex, VERTEX_KIND)
+        self.writeRecord(timeUnit, codes, vertexId, -1, -1)
+
+    def writeEdge(self, timeUnit, edgeId, source, target, edge):
+        codes = self.elementCodes.get(edge)
+        if (codes is None):
+            if edge.directed:
+                codes = self.addElement(edge, DIRECTED_EDGE_KIND)
+            else:
+                codes = self.addElement(edge, UNDIRECTED_EDGE_KIND)
+        self.writeRecord(timeUnit, codes, edgeId, source, target)
+
+    def writeRecord(self, timeUnit, codes, itemId, source, target):
+        if (not self.attached):
+            self.waitForAttach()
+        if (self.numFree == 0):
+            self.waitForReader(lambda: self.capacity - (self.numWritten - self.header[RING_READ]) > 0)
+            if self.dropping:
+                return
+            self.numFree = self.capacity - (self.numWritten - self.header[RING_READ])
+        RECORD_STRUCT.pack_into(self.records, (self.numWritten % self.capacity) * RECORD_SIZE,
+                                timeUnit, int(itemId), int(source), int(target), codes[1], codes[2], codes[0])
+        self.numWritten += 1
+        self.numFree -= 1
+        self.header[RING_WRITTEN] = self.numWritten
+
+    # Wait for a reader to attach, raising TimeoutError if none has within self.timeout seconds
+    def waitForAttach(self):
+        startTime = time.monotonic()
+        warned = False
+        while (self.header[RING_READER] == READER_NONE):
+            waited = time.monotonic() - startTime
+            if ((self.timeout > 0) and (waited >= self.timeout)):
+                self.abandoned = True
+                raise TimeoutError('No consumer attached to shared memory ' + self.name + ' within ' + str(self.timeout) + ' seconds')
+            if ((not warned) and (waited >= RING_ATTACH_WARNING_SECONDS)):
+                logger.warning('Waiting for a consumer to attach to shared memory ' + self.name)
+                warned = True
+            time.sleep(RING_WAIT_SECONDS)
+        self.attached = True
+
+    # Wait until ready() or the reader detaches, in which case records are dropped from then on
+    def waitForReader(self, ready):
+        while (not ready()):
+            if (self.header[RING_READER] == READER_DETACHED):
+                self.dropping = True
+                return
+            time.sleep(RING_WAIT_SECONDS)
+
+    # Return and remember (kind, type code, attributes code) of a pattern vertex or edge,
+    # publishing its type and attributes if new
+    def addElement(self, element, kind):
+        typeCode = -1
+        if element.type:
+            typeCode = self.types.get(element.type)
+            if (typeCode is None):
+                typeCode = len(self.types)
+                self.publish(["type", element.type])
+                self.types[element.type] = typeCode
+        attributesKey = json.dumps(element.attributes, sort_keys=True)
+        attributesCode = self.attributeCodes.get(attributesKey)
+        if (attributesCode is None):
+            attributesCode = len(self.attributeCodes)
+            self.publish(["attributes", element.attributes])
+            self.attributeCodes[attributesKey] = attributesCode
+        codes = (kind, typeCode, attributesCode)
+        self.elementCodes[element] = codes
+        return codes
+
+    # Mark the stream ended, wait for the reader to read all records, and remove the ring
+    def close(self):
+        if (self.memory is None):
+            return
+        try:
+            self.header[RING_CLOSED] = 1
+            if ((not self.attached) and (not self.abandoned)):
+                self.waitForAttach()
+            if self.attached:
+                self.waitForReader(lambda: self.header[RING_READ] >= self.numWritten)
+        finally:
+            self.header.release()
+            self.table.release()
+            self.records.release()
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+# Remove the shared memory block name left by a ring writer that is no longer running,
+# raising FileExistsError if it is not such a ring
+def RemoveStaleRing(name):
+    stale = shared_memory.SharedMemory(name)
+    writerPid = 0
+    if (stale.size >= RING_TABLE_OFFSET):
+        header = stale.buf[:RING_TABLE_OFFSET].cast('Q')
+        if (header[RING_VERSION] == RING_FORMAT_VERSION):
+            writerPid = header[RING_WRITER_PID]
+        header.release()
+    stale.close()
+    if ((writerPid > 0) and (not ProcessRunning(writerPid))):
+        stale.unlink()
+        return
+    if (sys.version_info < (3, 13)):
+        # Attaching registered the block for removal when this process ends
+        resource_tracker.unregister(stale._name, 'shared_memory')
+    if (writerPid > 0):
+        raise FileExistsError('Shared memory ' + name + ' is in use by the run of process ' + str(writerPid))
+    raise FileExistsError('Shared memory ' + name + ' exists and is not a ring buffer')
+
+# Return whether process pid is running
+def ProcessRunning(pid):
+    if (pid == os.getpid()):
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass # running as another user
+    return True
+
+
+# ----- Reading -----
+
+# Reader of the ring buffer of one stream, e.g., RingReader("out-s1"). Waits up to
+# timeout seconds (forever if None) for a running writer to create the ring, and
+# raises EOFError if the writer ends without closing the stream.
+class RingReader:
+    def __init__(self, name, timeout = None):
+        deadline = None if (timeout is None) else (time.monotonic() + timeout)
+        self.name = name
+        while True:
+            try:
+                self.memory = shared_memory.SharedMemory(name)
+            except FileNotFoundError:
+                if ((deadline is not None) and (time.monotonic() >= deadline)):
+                    raise
+                time.sleep(0.01)
+                continue
+            if (sys.version_info < (3, 13)):
+                # Attaching registered the block for removal when this process ends, which is the writer's job
+                resource_tracker.unregister(self.memory._name, 'shared_memory')
+            self.header = self.memory.buf[:RING_TABLE_OFFSET].cast('Q')
+            while (self.header[RING_VERSION] == 0):
+                time.sleep(RING_WAIT_SECONDS)
+            if (self.header[RING_VERSION] != RING_FORMAT_VERSION):
+                raise ValueError('Shared memory ' + name + ' has ring format version ' + str(self.header[RING_VERSION]))
+            self.writerPid = self.header[RING_WRITER_PID]
+            if ProcessRunning(self.writerPid):
+                break
+            # Left by a run that ended without removing it, so wait for the next run to replace it
+            self.header.release()
+            self.memory.close()
+            if ((deadline is not None) and (time.monotonic() >= deadline)):
+                raise FileNotFoundError('No running writer of shared memory ' + name)
+            time.sleep(0.01)
+        self.capacity = self.header[RING_CAPACITY]
+        self.table = self.memory.buf[RING_TABLE_OFFSET:RING_RECORDS_OFFSET]
+        self.tableLength = 0
+        self.metadata = None
+        self.startTime = None
+        self.types = [] # list of published types
+        self.attributes = [] # list of published attribute dictionaries
+        self.readTable()
+        self.recordBytes = self.memory.buf[RING_RECORDS_OFFSET:RING_RECORDS_OFFSET + self.capacity * RECORD_SIZE]
+        self.recordArray = None
+        if numpy is not None:
+            self.recordArray = numpy.frombuffer(self.recordBytes, dtype=RecordDType())
+        self.numRead = self.header[RING_READ]
+        self.header[RING_READER] = READER_ATTACHED
+
+    # Read the table entries published since last read
+    def readTable(self):
+        tableLength = self.header[RING_TABLE_LENGTH]
+        if (tableLength == self.tableLength):
+            return
+        for line in bytes(self.table[self.tableLength:tableLength]).decode('utf-8').splitlines():
+            entry = json.loads(line)
+            if (self.metadata is None):
+                self.metadata = entry
+                self.startTime = datetime.strptime(entry['startTime'], '%Y-%m-%d %H:%M:%S')
+            elif (entry[0] == "type"):
+                self.types.append(entry[1])
+            else:
+                self.attributes.append(entry[1])
+        self.tableLength = tableLength
+
+    # Return number of records written but not yet released
+    def available(self):
+        return self.header[RING_WRITTEN] - self.numRead
+
+    # Return view of the next available records, at most maxRecords, waiting for at
+    # least one unless wait is False. Returns no records once the stream has ended.
+    # The records stay valid until released.
+    def records(self, maxRecords = None, wait = True):
+        numAvailable = self.available()
+        while (numAvailable == 0):
+            if (self.header[RING_CLOSED] or (not wait)):
+                numAvailable = self.available() # the last records may have come before closing
+                break
+            if (not ProcessRunning(self.writerPid)):
+                raise EOFError('Writer of shared memory ' + self.name + ' ended without closing the stream')
+            time.sleep(RING_WAIT_SECONDS)
+            numAvailable = self.available()
+        start = self.numRead % self.capacity
+        numRecords = min(numAvailable, self.capacity - start)
+        if (maxRecords is not None):
+            numRecords = min(numRecords, maxRecords)
+        self.readTable() # types and attributes are published before the records using them
+        if self.recordArray is not None:
+            return self.recordArray[start:start+numRecords]
+        return self.recordBytes[start*RECORD_SIZE:(start+numRecords)*RECORD_SIZE]
+
+    # Let the writer reuse the next numRecords slots
+    def release(self, numRecords):
+        self.numRead += numRecords
+        self.header[RING_READ] = self.numRead
+
+    # Convert timeUnit to string according to the stream's output time format (as gsgGenerator.TimeStr)
+    def timeStr(self, timeUnit):
+        if (self.metadata['outputTimeFormat'] == "seconds"):
+            return str(timeUnit * self.metadata['secondsPerUnitTime'])
+        if (self.metadata['outputTimeFormat'] == "datetime"):
+            return (self.startTime + timedelta(seconds=timeUnit * self.metadata['secondsPerUnitTime'])).strftime('%Y-%m-%d %H:%M:%S')
+        return str(timeUnit)
+
+    # Yield each record as an item of a JSON stream file (see README.md), releasing
+    # records as they are yielded
+    def items(self):
+        while True:
+            records = self.records()
+            if (len(records) == 0):
+                return
+            if self.recordArray is not None:
+                fields = records.tolist()
+            else:
+                fields = list(RECORD_STRUCT.iter_unpack(records))
+            del records
+            for timeUnit,itemId,source,target,typeCode,attributesCode,kind in fields:
+                item = {'id': str(itemId)}
+                if (kind != VERTEX_KIND):
+                    item['source'] = str(source)
+                    item['target'] = str(target)
+                if (typeCode >= 0):
+                    item['type'] = self.types[typeCode]
+                item['attributes'] = self.attributes[attributesCode]
+                if (kind == DIRECTED_EDGE_KIND):
+                    item['directed'] = 'true'
+                elif (kind == UNDIRECTED_EDGE_KIND):
+                    item['directed'] = 'false'
+                item['timestamp'] = self.timeStr(timeUnit)
+                yield ({'vertex': item} if (kind == VERTEX_KIND) else {'edge': item})
+            self.release(len(fields))
+
+    # Detach from the ring. Views returned by records() must no longer be used; the
+    # block stays mapped until any still referenced are freed.
+    def close(self):
+        if (self.memory is None):
+            return
+        self.header[RING_READER] = READER_DETACHED
+        self.recordArray = None
+        self.header.release()
+        self.table.release()
+        try:
+            self.recordBytes.release()
+            self.memory.close()
+        except BufferError:
+            self.memory._mmap = None # unmapped by the views still referring to it once they are freed
+        self.memory = None
@@ -0,0 +1,220 @@
+# gsgTruth.py
+#
+# Graph Stream Generator v1.0
+#
+# Indexed ground-truth store of the tracked pattern instances, and scoring of a
+# miner's detections against it.
+#
+# The store is an SQLite database written by the "sqlite" output format to the
+# instances file name plus ".sqlite" (e.g., "out-insts.sqlite"), with tables
+#
+#   instances(id, patternId, numVertices, numEdges, vertexIds, edgeIds): one row per
+#       instance, numbered from 1 in the order written (the order of the instances
+#       file), with its vertex and edge ids as JSON arrays
+#   instanceVertices(vertexId, instanceId), instanceEdges(edgeId, instanceId): one row
+#       per vertex and edge id of each instance
+#
+# indexed by pattern id, vertex id and edge id. Instances are inserted in batches
+# during the run. When it ends, their ids are expanded into instanceVertices and
+# instanceEdges by SQLite itself (with json_each) and the indexes are built, which
+# is several times faster than inserting and indexing a row per id as they come.
+#
+# A detection is a set of vertex and edge ids reported by a miner, optionally with
+# the pattern id it was taken for, in the layout of an instance in the instances file
+# (see README.md). It matches the tracked instance sharing the most of its vertices
+# and edges (of the detection's pattern, if given), if that instance's Jaccard
+# similarity (ids shared over ids in either) is at least a threshold. Candidate
+# instances are those sharing an edge with the detection, or a vertex for detections
+# without edges. Detections are matched in batches, each inserted into temporary
+# tables and joined with the store's indexes, so that scoring is a few queries per
+# batch however many instances the store holds.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import os
+import sqlite3
+from gsgIdSet import IdSet
+
+TRUTH_BATCH_SIZE = 10000 # instances inserted, or detections matched, per batch
+
+TRUTH_TABLES = ('CREATE TABLE IF NOT EXISTS instances (id INTEGER PRIMARY KEY, patternId TEXT NOT NULL, numVertices INTEGER NOT NULL, numEdges INTEGER NOT NULL,'
+                ' vertexIds TEXT NOT NULL, edgeIds TEXT NOT NULL)',
+                'CREATE TABLE IF NOT EXISTS instanceVertices (vertexId INTEGER NOT NULL, instanceId INTEGER NOT NULL)',
+                'CREATE TABLE IF NOT EXISTS instanceEdges (edgeId INTEGER NOT NULL, instanceId INTEGER NOT NULL)')
+
+TRUTH_INDEXES = {'instancesByPattern': 'instances (patternId)',
+                 'instanceVerticesByVertex': 'instanceVertices (vertexId, instanceId)',
+                 'instanceEdgesByEdge': 'instanceEdges (edgeId, instanceId)'}
+
+
+# ----- Writing -----
+
+# Ground-truth store being written. Resumes after the instances written at a
+# checkpoint (see checkpoint()) if state is given; otherwise any earlier store is replaced.
+class TruthStoreFile:
+    def __init__(self, fileName, state = None):
+        self.fileName = fileName
+        if ((state is None) and os.path.exists(fileName)):
+            os.remove(fileName)
+        # Written by at most one thread at a time (a writer thread if outputThreads > 0)
+        self.connection = sqlite3.connect(fileName, check_same_thread=False)
+        self.connection.execute('PRAGMA synchronous = OFF')
+        for statement in TRUTH_TABLES:
+            self.connection.execute(statement)
+        for indexName in TRUTH_INDEXES:
+            self.connection.execute('DROP INDEX IF EXISTS ' + indexName) # rebuilt by close()
+        self.numInstances = 0
+        if (state is not None):
+            self.numInstances = state['numInstances']
+            for table in ('instanceVertices', 'instanceEdges'):
+                self.connection.execute('DELETE FROM ' + table + ' WHERE instanceId > ?', (self.numInstances,))
+            self.connection.execute('DELETE FROM instances WHERE id > ?', (self.numInstances,))
+        self.connection.commit()
+        self.instanceRows = []
+
+    def writeInstance(self, patternId, vertexIds, edgeIds):
+        self.numInstances += 1
+        self.instanceRows.append((self.numInstances, patternId, len(vertexIds), len(edgeIds),
+                                  '[' + ','.join([str(int(vertexId)) for vertexId in vertexIds]) + ']',
+                                  '[' + ','.join([str(int(edgeId)) for edgeId in edgeIds]) + ']'))
+        if (len(self.instanceRows) >= TRUTH_BATCH_SIZE):
+            self.flush()
+
+    def flush(self):
+        self.connection.executemany('INSERT INTO instances VALUES (?, ?, ?, ?, ?, ?)', self.instanceRows)
+        self.instanceRows = []
+
+    # Return state for resuming after the instances written so far, committing them
+    def checkpoint(self):
+        self.flush()
+        self.connection.commit()
+        return {'numInstances': self.numInstances}
+
+    def close(self):
+        if (self.connection is None):
+            return
+        try:
+            self.flush()
+            # Expand the ids of the instances added since the store was last closed
+            numExpanded = self.connection.execute('SELECT MAX(instanceId) FROM instanceVertices').fetchone()[0] or 0
+            self.connection.execute('INSERT INTO instanceVertices SELECT ids.value, instances.id FROM instances, json_each(instances.vertexIds) ids'
+                                    ' WHERE instances.id > ?', (numExpanded,))
+            self.connection.execute('INSERT INTO instanceEdges SELECT ids.value, instances.id FROM instances, json_each(instances.edgeIds) ids'
+                                    ' WHERE instances.id > ?', (numExpanded,))
+            for indexName,indexColumns in TRUTH_INDEXES.items():
+                self.connection.execute('CREATE INDEX IF NOT EXISTS ' + indexName + ' ON ' + indexColumns)
+            self.connection.commit()
+        finally:
+            self.connection.close()
+            self.connection = None
+
+
+# ----- Scoring -----
+
+# Return connection to the ground-truth store fileName, read-only
+def OpenTruthStore(fileName):
+    if (not os.path.exists(fileName)):
+        raise FileNotFoundError('No ground-truth store ' + fileName)
+    return sqlite3.connect('file:' + fileName + '?mode=ro', uri=True)
+
+# Return {pattern id: number of instances} of the store
+def TruthPatternCounts(connection):
+    return dict(connection.execute('SELECT patternId, COUNT(*) FROM instances GROUP BY patternId'))
+
+# Return (pattern id or None, set of vertex ids, set of edge ids, number of other ids)
+# of a detection item, in the layout of an instance in the instances file. Ids that
+# are not integers cannot match any instance, so are only counted.
+def DetectionIds(item):
+    vertexIds = set()
+    edgeIds = set()
+    numOtherIds = 0
+    for itemIds,ids in ((item.get('vertexIds', []), vertexIds), (item.get('edgeIds', []), edgeIds)):
+        for itemId in itemIds:
+            try:
+                ids.add(int(itemId))
+            except ValueError:
+                numOtherIds += 1
+    return item.get('patternId'), vertexIds, edgeIds, numOtherIds
+
+# Yield (detection item, (instance id, pattern id, similarity) of its matching
+# instance or None) for each of detections (see above)
+def MatchDetections(connection, detections, threshold, batchSize = TRUTH_BATCH_SIZE):
+    connection.execute('CREATE TEMP TABLE detectionVertices (detection INTEGER, vertexId INTEGER, PRIMARY KEY (detection, vertexId)) WITHOUT ROWID')
+    connection.execute('CREATE TEMP TABLE detectionEdges (detection INTEGER, edgeId INTEGER, PRIMARY KEY (detection, edgeId)) WITHOUT ROWID')
+    connection.execute('CREATE TEMP TABLE candidates (detection INTEGER, instanceId INTEGER, PRIMARY KEY (detection, instanceId)) WITHOUT ROWID')
+    batch = []
+    for item in detections:
+        batch.append(item)
+        if (len(batch) >= batchSize):
+            yield from MatchBatch(connection, batch, threshold)
+            batch = []
+    if batch:
+        yield from MatchBatch(connection, batch, threshold)
+
+def MatchBatch(connection, batch, threshold):
+    detections = [DetectionIds(item) for item in batch]
+    for table in ('detectionVertices', 'detectionEdges', 'candidates'):
+        connection.execute('DELETE FROM temp.' + table)
+    connection.executemany('INSERT INTO temp.detectionVertices VALUES (?, ?)',
+                           [(detection, vertexId) for detection in range(len(detections)) for vertexId in detections[detection][1]])
+    connection.executemany('INSERT INTO temp.detectionEdges VALUES (?, ?)',
+                           [(detection, edgeId) for detection in range(len(detections)) for edgeId in detections[detection][2]])
+    connection.execute('INSERT INTO temp.candidates SELECT DISTINCT d.detection, e.instanceId FROM temp.detectionEdges d'
+                       ' JOIN instanceEdges e ON e.edgeId = d.edgeId')
+    connection.execute('INSERT INTO temp.candidates SELECT DISTINCT d.detection, v.instanceId FROM temp.detectionVertices d'
+                       ' JOIN instanceVertices v ON v.vertexId = d.vertexId'
+                       ' WHERE NOT EXISTS (SELECT 1 FROM temp.detectionEdges e WHERE e.detection = d.detection)')
+    matches = [None] * len(detections) # matches[d] = (instance id, pattern id, similarity) of best match so far
+    rows = connection.execute('SELECT c.detection, c.instanceId, i.patternId, i.numVertices + i.numEdges,'
+                              ' (SELECT COUNT(*) FROM temp.detectionVertices d JOIN instanceVertices v'
+                              '  ON v.vertexId = d.vertexId AND v.instanceId = c.instanceId WHERE d.detection = c.detection),'
+                              ' (SELECT COUNT(*) FROM temp.detectionEdges d JOIN instanceEdges e'
+                              '  ON e.edgeId = d.edgeId AND e.instanceId = c.instanceId WHERE d.detection = c.detection)'
+                              ' FROM temp.candidates c JOIN instances i ON i.id = c.instanceId')
+    for detection,instanceId,patternId,numInstanceIds,numSharedVertices,numSharedEdges in rows:
+        detectionPatternId, vertexIds, edgeIds, numOtherIds = detections[detection]
+        if ((detectionPatternId is not None) and (patternId != detectionPatternId)):
+            continue
+        numShared = numSharedVertices + numSharedEdges
+        similarity = numShared / (len(vertexIds) + len(edgeIds) + numOtherIds + numInstanceIds - numShared)
+        match = matches[detection]
+        if ((match is None) or (similarity > match[2]) or ((similarity == match[2]) and (instanceId < match[0]))):
+            matches[detection] = (instanceId, patternId, similarity)
+    for detection in range(len(detections)):
+        match = matches[detection]
+        if ((match is not None) and (match[2] < threshold)):
+            match = None
+        yield batch[detection], match
+
+# Return {pattern id: {"instances", "detections", "truePositives", "instancesFound",
+# "precision", "recall", "f1"}} scoring detections against the ground-truth store
+# connection, and the same totals over all patterns under "all". A detection counts
+# for its own pattern id, or that of its match if it has none (or "unknown" if
+# unmatched); it is a true positive if it matches an instance. An instance is found
+# if some detection matches it.
+def ScoreDetections(connection, detections, threshold):
+    patternCounts = TruthPatternCounts(connection)
+    scores = dict([(patternId, {"instances": numInstances, "detections": 0, "truePositives": 0, "instancesFound": 0})
+                   for patternId,numInstances in patternCounts.items()])
+    found = IdSet() # ids of instances found
+    for item,match in MatchDetections(connection, detections, threshold):
+        patternId = item.get('patternId') or (match[1] if match else 'unknown')
+        score = scores.setdefault(patternId, {"instances": 0, "detections": 0, "truePositives": 0, "instancesFound": 0})
+        score["detections"] += 1
+        if match:
+            score["truePositives"] += 1
+            if found.add(match[0]):
+                score["instancesFound"] += 1
+    total = {"instances": 0, "detections": 0, "truePositives": 0, "instancesFound": 0}
+    for score in scores.values():
+        for key in total:
+            total[key] += score[key]
+    scores["all"] = total
+    for score in scores.values():
+        score["precision"] = (score["truePositives"] / score["detections"]) if score["detections"] else 0.0
+        score["recall"] = (score["instancesFound"] / score["instances"]) if score["instances"] else 0.0
+        precisionRecall = score["precision"] + score["recall"]
+        score["f1"] = (2 * score["precision"] * score["recall"] / precisionRecall) if precisionRecall else 0.0
+    return scores
@@ -0,0 +1,400 @@
+# gsgVector.py
+#
+# Graph Stream Generator v1.0
+#
+# Vectorized generation with NumPy (instanceEngine "vector").
+#
+# Patterns whose vertices are all new never depend on other patterns or on what has
+# been written, so all their instances in a run can be computed up front as array
+# operations instead of one instance at a time: trigger times from geometric gaps
+# between triggers, edge offsets, vertex and edge ids, the creation time of each
+# vertex in each stream, and the order of each stream. The other patterns are
+# generated by the usual (scalar) GraphStreamGenerator steps. The vectorized vertices
+# are added to their old vertex pools as they are written, as in gsgParallel.py, and
+# the vectorized vertices and edges are merged into the streams in time order (ties
+# written before the scalar patterns' vertices and edges).
+#
+# The vectorized instances are numbered in trigger order (time unit, then pattern
+# order), as in scalar generation, and are followed by the ids of the scalar
+# patterns' instances. Within a stream, items with the same time are in the same
+# order as in scalar generation. The triggers and offsets are drawn from their own
+# NumPy random number generator, so the output is the same for the same seed, but
+# not the same as that of the scalar engine.
+#
+# Written by Larry Holder (holder@eecs.wsu.edu).
+#
+# Copyright (c) 2017, Washington State University.
+
+import random
+import time
+from gsgClasses import *
+from gsgGenerator import *
+from gsgMetrics import logger, Metrics
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# ----- Vectorized Instances -----
+
+# Return True if all the vertices of pattern are new, so that its instances can be vectorized
+def Vectorizable(pattern):
+    return all(pattern.compiled.vertexNew)
+
+# Return sorted array of the time units in [0, duration) at which a pattern with the
+# given probability is triggered, drawing the gaps between triggers from rng
+def TriggerTimes(probability, duration, rng):
+    if ((probability <= 0.0) or (duration <= 0)):
+        return numpy.zeros(0, dtype=numpy.int64)
+    if (probability >= 1.0):
+        return numpy.arange(duration, dtype=numpy.int64)
+    chunks = []
+    lastTime = -1
+    while (lastTime < duration - 1):
+        numGaps = int((duration - 1 - lastTime) * probability * 1.05) + 64
+        times = lastTime + numpy.cumsum(rng.geometric(probability, numGaps))
+        chunks.append(times[times < duration])
+        lastTime = int(times[-1])
+    return numpy.concatenate(chunks)
+
+# Return {vertex index: position in creation order} of the vertices of a compiled
+# pattern that are used by its edges, in the order an instance creates them
+def VertexPositions(compiled):
+    positions = {}
+    for sourceIndex,targetIndex in zip(compiled.edgeSources, compiled.edgeTargets):
+        positions.setdefault(sourceIndex, len(positions))
+        positions.setdefault(targetIndex, len(positions))
+    return positions
+
+# All instances of the vectorizable patterns (given by index in patterns) in a run.
+# For each stream, the vertices and edges are held in arrays in the order written:
+# streamTimes, streamIds, streamSources and streamTargets (-1 for vertices), and
+# streamCodes, indexing the stream's list of pattern Vertex and Edge objects in
+# streamElements. The distinct times of each stream's items, and the position after
+# the last item at each, are in lists streamUnitTimes and streamUnitEnds. The tracked
+# instances are held in trigger order.
+class VectorInstances:
+    def __init__(self, parameters, patterns, patternIndices, rng):
+        numStreams = parameters.numStreams
+        # Triggers, in trigger order
+        patternTimes = [TriggerTimes(patterns[patternIndex].probability, parameters.duration, rng) for patternIndex in patternIndices]
+        self.patternNumInstances = dict([(patternIndex, len(instanceTimes)) for patternIndex,instanceTimes in zip(patternIndices, patternTimes)])
+        times = numpy.concatenate([numpy.zeros(0, dtype=numpy.int64)] + patternTimes)
+        patternNums = numpy.concatenate([numpy.zeros(0, dtype=numpy.int32)] +
+                                        [numpy.full(len(patternTimes[index]), patternIndices[index], dtype=numpy.int32) for index in range(len(patternIndices))])
+        order = numpy.lexsort((patternNums, times))
+        ranks = numpy.empty(len(order), dtype=numpy.int64) # ranks[i] = position of trigger i in trigger order
+        ranks[order] = numpy.arange(len(order), dtype=numpy.int64)
+        # Ids of each instance's first vertex and edge (less one), numbered in trigger order
+        positions = {} # {patternIndex: VertexPositions of pattern}
+        numPatternVertices = numpy.zeros(len(patterns), dtype=numpy.int64)
+        numPatternEdges = numpy.zeros(len(patterns), dtype=numpy.int64)
+        for patternIndex in patternIndices:
+            positions[patternIndex] = VertexPositions(patterns[patternIndex].compiled)
+            numPatternVertices[patternIndex] = len(positions[patternIndex])
+            numPatternEdges[patternIndex] = len(patterns[patternIndex].compiled.edges)
+        sortedPatternNums = patternNums[order]
+        vertexCounts = numPatternVertices[sortedPatternNums]
+        edgeCounts = numPatternEdges[sortedPatternNums]
+        vertexBases = numpy.cumsum(vertexCounts) - vertexCounts
+        edgeBases = numpy.cumsum(edgeCounts) - edgeCounts
+        self.numVertices = int(vertexCounts.sum())
+        self.numEdges = int(edgeCounts.sum())
+        # Vertices and edges of each stream
+        self.streamElements = [[] for streamIndex in range(numStreams)]
+        columns = [[] for streamIndex in range(numStreams)] # columns[i] = list of (times, ranks, positions, codes, ids, sources, targets) arrays
+        start = 0
+        for patternIndex,instanceTimes in zip(patternIndices, patternTimes):
+            end = start + len(instanceTimes)
+            self.addPattern(patterns[patternIndex].compiled, positions[patternIndex], instanceTimes, ranks[start:end],
+                            vertexBases[ranks[start:end]], edgeBases[ranks[start:end]], rng, columns)
+            start = end
+        self.streamTimes = []
+        self.streamCodes = []
+        self.streamIds = []
+        self.streamSources = []
+        self.streamTargets = []
+        self.streamUnitTimes = []
+        self.streamUnitEnds = []
+        for streamColumns in columns:
+            streamTimes, streamRanks, streamPositions, streamCodes, streamIds, streamSources, streamTargets = [
+                numpy.concatenate([numpy.zeros(0, dtype=numpy.int64)] + [arrays[column] for arrays in streamColumns]) for column in range(7)]
+            streamOrder = numpy.lexsort((streamPositions, streamRanks, streamTimes))
+            self.streamTimes.append(streamTimes[streamOrder])
+            self.streamCodes.append(streamCodes[streamOrder])
+            self.streamIds.append(streamIds[streamOrder])
+            self.streamSources.append(streamSources[streamOrder])
+            self.streamTargets.append(streamTargets[streamOrder])
+            unitEnds = numpy.append(numpy.flatnonzero(numpy.diff(self.streamTimes[-1])) + 1, len(streamOrder))
+            self.streamUnitTimes.append(self.streamTimes[-1][unitEnds - 1].tolist() if len(streamOrder) else [])
+            self.streamUnitEnds.append(unitEnds.tolist() if len(streamOrder) else [])
+        # Tracked instances
+        tracked = numpy.array([patterns[patternIndex].track for patternIndex in range(len(patterns))], dtype=bool)
+        trackedInstances = tracked[sortedPatternNums]
+        self.trackedTimes = times[order][trackedInstances].tolist()
+        self.trackedPatterns = sortedPatternNums[trackedInstances].tolist()
+        self.trackedVertexBases = vertexBases[trackedInstances].tolist()
+        self.trackedVertexCounts = vertexCounts[trackedInstances].tolist()
+        self.trackedEdgeBases = edgeBases[trackedInstances].tolist()
+        self.trackedEdgeCounts = edgeCounts[trackedInstances].tolist()
+
+    # Add the vertices and edges of the instances of a compiled pattern, triggered at
+    # instanceTimes with the given ranks in trigger order and id bases, to columns
+    def addPattern(self, compiled, positions, instanceTimes, instanceRanks, vertexBases, edgeBases, rng, columns):
+        numInstances = len(instanceTimes)
+        edgeTimes = []
+        for minOffset,maxOffset in zip(compiled.edgeMinOffsets, compiled.edgeMaxOffsets):
+            if (minOffset == maxOffset):
+                edgeTimes.append(instanceTimes + minOffset)
+            else:
+                edgeTimes.append(instanceTimes + rng.integers(minOffset, maxOffset, numInstances, endpoint=True))
+        for streamNum in sorted(compiled.streamVertices):
+            streamColumns = columns[streamNum-1]
+            streamEdges = [edgeIndex for edgeIndex in range(len(compiled.edges)) if (compiled.edgeStreamNums[edgeIndex] == streamNum)]
+            noEndpoints = numpy.full(numInstances, -1, dtype=numpy.int64)
+            # A new vertex appears in a stream with its earliest edge in the stream
+            for vertexIndex,position in positions.items():
+                if (vertexIndex in compiled.streamVertices[streamNum]):
+                    vertexTimes = numpy.minimum.reduce([edgeTimes[edgeIndex] for edgeIndex in streamEdges
+                                                        if (vertexIndex in (compiled.edgeSources[edgeIndex], compiled.edgeTargets[edgeIndex]))])
+                    streamColumns.append((vertexTimes, instanceRanks, numpy.full(numInstances, position, dtype=numpy.int64),
+                                          numpy.full(numInstances, self.elementCode(streamNum, compiled.vertices[vertexIndex]), dtype=numpy.int64),
+                                          vertexBases + position + 1, noEndpoints, noEndpoints))
+            # Edges follow the instance's vertices, in pattern order
+            for edgeIndex in streamEdges:
+                streamColumns.append((edgeTimes[edgeIndex], instanceRanks, numpy.full(numInstances, len(positions) + edgeIndex, dtype=numpy.int64),
+                                      numpy.full(numInstances, self.elementCode(streamNum, compiled.edges[edgeIndex]), dtype=numpy.int64),
+                                      edgeBases + edgeIndex + 1,
+                                      vertexBases + positions[compiled.edgeSources[edgeIndex]] + 1,
+                                      vertexBases + positions[compiled.edgeTargets[edgeIndex]] + 1))
+
+    # Return code of a pattern Vertex or Edge object in stream streamNum
+    def elementCode(self, streamNum, element):
+        elements = self.streamElements[streamNum-1]
+        elements.append(element)
+        return len(elements) - 1
+
+    # Return list of (timeUnit, code, id, source, target) of items start to end of a stream
+    def streamItems(self, streamIndex, start, end):
+        return list(zip(self.streamTimes[streamIndex][start:end].tolist(), self.streamCodes[streamIndex][start:end].tolist(),
+                        self.streamIds[streamIndex][start:end].tolist(), self.streamSources[streamIndex][start:end].tolist(),
+                        self.streamTargets[streamIndex][start:end].tolist()))
+
+    # Return iterator over (timeUnit, streamNum, vertexId) of the vertices, in the order written
+    def vertices(self):
+        times = []
+        streamNums = []
+        indices = []
+        ids = []
+        for streamIndex in range(len(self.streamTimes)):
+            isVertex = (self.streamSources[streamIndex] < 0)
+            times.append(self.streamTimes[streamIndex][isVertex])
+            streamNums.append(numpy.full(len(times[-1]), streamIndex+1, dtype=numpy.int64))
+            indices.append(numpy.flatnonzero(isVertex))
+            ids.append(self.streamIds[streamIndex][isVertex])
+        times, streamNums, indices, ids = [numpy.concatenate([numpy.zeros(0, dtype=numpy.int64)] + arrays) for arrays in (times, streamNums, indices, ids)]
+        order = numpy.lexsort((indices, streamNums, times))
+        return zip(times[order].tolist(), streamNums[order].tolist(), ids[order].tolist())
+
+
+# ----- Vector Generator -----
+
+# Return generator for parameters.instanceEngine: a VectorGenerator for "vector",
+# else a GraphStreamGenerator
+def CreateGenerator(parameters, patterns, seed = None):
+    if (parameters.instanceEngine == "vector"):
+        return VectorGenerator(parameters, patterns, seed)
+    return GraphStreamGenerator(parameters, patterns, seed)
+
+# Generator computing the instances of patterns with only new vertices with NumPy (see
+# above), and the other patterns' instances one at a time. Not checkpointed.
+class VectorGenerator(GraphStreamGenerator):
+    BUFFER_SIZE = 65536 # number of a stream's items converted from arrays at a time
+
+    def __init__(self, parameters, patterns, seed = None):
+        if (numpy is None):
+            raise ImportError('The vector instance engine requires NumPy')
+        for pattern in patterns:
+            if (pattern.compiled is None):
+                pattern.compiled = CompilePattern(pattern)
+        self.allPatterns = patterns
+        self.patternIndices = {} # {Pattern object: index in allPatterns}
+        for patternIndex in range(len(patterns)):
+            self.patternIndices[patterns[patternIndex]] = patternIndex
+        self.vectorPatternIndices = [patternIndex for patternIndex in range(len(patterns)) if Vectorizable(patterns[patternIndex])]
+        GraphStreamGenerator.__init__(self, parameters, [pattern for pattern in patterns if (not Vectorizable(pattern))], seed)
+        self.checkpointInterval = 0
+
+    def reset(self):
+        GraphStreamGenerator.reset(self)
+        self.metrics = Metrics(self.parameters, self.allPatterns)
+        self.vector = None # VectorInstances of the run, computed when first needed
+        self.streamPositions = [0] * self.parameters.numStreams # next vectorized item to write to each stream
+        self.streamUnits = [0] * self.parameters.numStreams # index in vector.streamUnitTimes of the time of each stream's next item
+        self.streamBuffers = [(0, [])] * self.parameters.numStreams # (position, list) of each stream's next items as tuples
+        self.instancePosition = 0 # next tracked vectorized instance to write
+
+    # Compute the vectorized instances, whose ids come before the scalar patterns'
+    def startVector(self):
+        if (self.seed is None):
+            rng = numpy.random.default_rng()
+        else:
+            rng = numpy.random.default_rng(random.Random(self.seed).getrandbits(64))
+        self.vector = VectorInstances(self.parameters, self.allPatterns, self.vectorPatternIndices, rng)
+        for patternIndex,numInstances in self.vector.patternNumInstances.items():
+            self.metrics.patternInstances[self.allPatterns[patternIndex]][0] += numInstances
+        self.numVertices += self.vector.numVertices
+        self.numEdges += self.vector.numEdges
+        self.setExternalVertices(self.vector.vertices())
+
+    def steps(self, resuming = False):
+        if resuming:
+            raise ValueError('The vector instance engine cannot resume from a checkpoint')
+        if self.patterns:
+            for timeUnit in GraphStreamGenerator.steps(self):
+                yield timeUnit
+        else:
+            logger.log(self.logLevel, 'Generating streams...')
+            self.reset()
+            self.startMetrics()
+        if (self.vector is None):
+            self.startVector()
+        # Write the vectorized vertices and edges after the scalar patterns' last ones
+        self.writeVectorInstances(self.parameters.duration, 0)
+        remainingTimes = set()
+        for streamIndex in range(self.parameters.numStreams):
+            remainingTimes.update(self.vector.streamUnitTimes[streamIndex][self.streamUnits[streamIndex]:])
+        for timeUnit in sorted(remainingTimes):
+            self.writeVectorItems(timeUnit)
+            yield timeUnit
+            self.progressIfDue(timeUnit)
+        GraphStreamGenerator.stopMetrics(self)
+
+    # Stopped at the end of steps, once the remaining vectorized items are written
+    def stopMetrics(self):
+        pass
+
+    def addPatternInstance(self, pattern, timeUnit):
+        if (self.vector is None):
+            self.startVector()
+        self.writeVectorInstances(timeUnit, self.patternIndices[pattern])
+        GraphStreamGenerator.addPatternInstance(self, pattern, timeUnit)
+
+    # Write vectorized items at or before timeUnit, and add their vertices to the old
+    # vertex pools, before the scalar patterns' items at timeUnit
+    def processStreamSchedules(self, timeUnit):
+        if (self.vector is None):
+            self.startVector()
+        self.writeVectorInstances(timeUnit + 1, 0)
+        written = self.writeVectorItems(timeUnit)
+        if (self.nextExternalVertex is not None):
+            self.addExternalVertices(timeUnit + 1)
+        return (GraphStreamGenerator.processStreamSchedules(self, timeUnit) or written)
+
+    # Write the vectorized items of each stream at or before timeUnit. Returns False if there were none.
+    def writeVectorItems(self, timeUnit):
+        written = False
+        for streamIndex in range(self.parameters.numStreams):
+            unitTimes = self.vector.streamUnitTimes[streamIndex]
+            unit = self.streamUnits[streamIndex]
+            if ((unit < len(unitTimes)) and (unitTimes[unit] <= timeUnit)):
+                while ((unit < len(unitTimes)) and (unitTimes[unit] <= timeUnit)):
+                    unit += 1
+                end = self.vector.streamUnitEnds[streamIndex][unit-1]
+                startTime = time.perf_counter()
+                self.writeVectorStream(streamIndex+1, self.streamPositions[streamIndex], end)
+                self.metrics.outputSeconds += time.perf_counter() - startTime
+                self.metrics.streamItems[streamIndex] += end - self.streamPositions[streamIndex]
+                self.streamUnits[streamIndex] = unit
+                self.streamPositions[streamIndex] = end
+                written = True
+        return written
+
+    # Write items start to end of the vectorized items of stream streamNum
+    def writeVectorStream(self, streamNum, start, end):
+        vector = self.vector
+        streamIndex = streamNum - 1
+        elements = vector.streamElements[streamIndex]
+        # Items are converted from the arrays a block at a time, as converting a few per time unit is slow
+        bufferStart, buffer = self.streamBuffers[streamIndex]
+        if (end > bufferStart + len(buffer)):
+            bufferStart = start
+            buffer = vector.streamItems(streamIndex, start, max(end, start + self.BUFFER_SIZE))
+            self.streamBuffers[streamIndex] = (bufferStart, buffer)
+        items = buffer[start-bufferStart:end-bufferStart]
+        if ((not self.writeBehind) and (self.eventBuffer is None)):
+            # Write straight to the sinks, formatting each time unit's timestamp once
+            sinks = self.sinks
+            if (not sinks):
+                return
+            lastTimeUnit = None
+            for timeUnit,code,itemId,source,target in items:
+                if (timeUnit != lastTimeUnit):
+                    timestamp = self.timeStr(timeUnit)
+                    lastTimeUnit = timeUnit
+                if (source < 0):
+                    for sink in sinks:
+                        sink.writeVertex(streamNum, timeUnit, timestamp, itemId, elements[code])
+                else:
+                    for sink in sinks:
+                        sink.writeEdge(streamNum, timeUnit, timestamp, itemId, source, target, elements[code])
+            return
+        for timeUnit,code,itemId,source,target in items:
+            if (source < 0):
+                self.writeVectorVertex(streamNum, timeUnit, itemId, elements[code])
+            else:
+                self.writeVectorEdge(streamNum, timeUnit, itemId, source, target, elements[code])
+
+    # Write the tracked vectorized instances triggered before (timeUnit, patternIndex)
+    def writeVectorInstances(self, timeUnit, patternIndex):
+        vector = self.vector
+        position = self.instancePosition
+        times = vector.trackedTimes
+        while ((position < len(times)) and ((times[position] < timeUnit) or
+                                            ((times[position] == timeUnit) and (vector.trackedPatterns[position] < patternIndex)))):
+            if self.sinks:
+                vertexBase = vector.trackedVertexBases[position]
+                edgeBase = vector.trackedEdgeBases[position]
+                patternId = self.allPatterns[vector.trackedPatterns[position]].id
+                vertexIds = list(range(vertexBase + 1, vertexBase + vector.trackedVertexCounts[position] + 1))
+                edgeIds = list(range(edgeBase + 1, edgeBase + vector.trackedEdgeCounts[position] + 1))
+                if self.writeBehind:
+                    self.writeBehind.call(0, self.writeInstanceToSinks, patternId, vertexIds, edgeIds)
+                else:
+                    self.writeInstanceToSinks(patternId, vertexIds, edgeIds)
+            position += 1
+        self.instancePosition = position
+
+    def writeVectorVertex(self, streamNum, timeUnit, vertexId, vertex):
+        if self.writeBehind:
+            self.writeBehind.call(streamNum, self.writeVertexToSinks, streamNum, timeUnit, vertexId, vertex)
+        elif self.sinks:
+            self.writeVertexToSinks(streamNum, timeUnit, vertexId, vertex)
+        if (self.eventBuffer is not None):
+            self.eventBuffer.append(Event(timeUnit, self.timeStr(timeUnit), streamNum, "vertex", vertexId,
+                                          None, None, vertex.type, vertex.attributes, None))
+
+    def writeVectorEdge(self, streamNum, timeUnit, edgeId, source, target, edge):
+        if self.writeBehind:
+            self.writeBehind.call(streamNum, self.writeEdgeToSinks, streamNum, timeUnit, edgeId, source, target, edge)
+        elif self.sinks:
+            self.writeEdgeToSinks(streamNum, timeUnit, edgeId, source, target, edge)
+        if (self.eventBuffer is not None):
+            self.eventBuffer.append(Event(timeUnit, self.timeStr(timeUnit), streamNum, "edge", edgeId,
+                                          source, target, edge.type, edge.attributes, edge.directed))
+
+    def writeInstanceToSinks(self, patternId, vertexIds, edgeIds):
+        for sink in self.sinks:
+            sink.writeInstance(patternId, vertexIds, edgeIds)
+
+    def writeVertexToSinks(self, streamNum, timeUnit, vertexId, vertex):
+        timestamp = self.timeStr(timeUnit)
+        for sink in self.sinks:
+            sink.writeVertex(streamNum, timeUnit, timestamp, vertexId, vertex)
+
+    def writeEdgeToSinks(self, streamNum, timeUnit, edgeId, source, target, edge):
+        timestamp = self.timeStr(timeUnit)
+        for sink in self.sinks:
+            sink.writeEdge(streamNum, timeUnit, timestamp, edgeId, source, target, edge)